@@ -0,0 +1,251 @@
+"""
+Versioned binary format for the token-note mapping.
+
+A mapping artifact is an uncompressed .npz file that holds only NumPy arrays and never
+holds Python objects, so loading it never runs code from the file. It is loaded by
+memory-mapping the file and viewing every .npy member where it lies, instead of copying
+each member out of the zip archive as np.load does. The stored embeddings are paged in
+as they are used and shared between processes, like a memory-mapped embedding model.
+The file is replaced, never rewritten in place, so mappings of an older file stay valid.
+The mapping itself loads about as fast as the pickle, as both decode and index every
+token; the artifact is faster once the token embeddings are needed, as they are stored
+row-normalised and not gathered from the model (see benchmarks/bench_artifact.py).
+String tables are stored as one UTF-8 byte array with NUL separators:
+
+    format, version      identify the file (ARTIFACT_FORMAT, ARTIFACT_VERSION)
+    tokens               token string table, in mapping order
+    note_names           interned note string table
+    note_ids             int32 index into note_names for every token
+    volatilities         int8 volatility for every token
+    embedded_tokens      optional: string table of the tokens present in the embedding model
+    embeddings           optional: their row-normalised float32 embeddings
+    embedding_model      optional: fingerprint of the model the embeddings came from
+
+Convert the shipped pickle with:
+
+    python artifact.py token_note_mapping.pkl token_note_mapping.npz [--embeddings]
+"""
+import argparse
+import io
+import mmap
+import os
+import pickle
+import re
+import struct
+import zipfile
+from array import array
+import numpy as np
+from embeddings import model_fingerprint
+from mapping import Mapping
+from similarity import embedding_matrix
+
+ARTIFACT_FORMAT = 'otm-mapping'
+ARTIFACT_VERSION = 1
+# Members loaded for the mapping, and for its stored embeddings
+MAPPING_MEMBERS = ('format', 'version', 'tokens', 'note_names', 'note_ids', 'volatilities')
+EMBEDDING_MEMBERS = ('embedded_tokens', 'embeddings', 'embedding_model')
+# The .npy header numpy writes for an array of a simple dtype, parsed without ast.literal_eval
+PLAIN_HEADER = re.compile(rb"\x93NUMPY\x01\x00..\{'descr': '([<>|=]?[a-zA-Z]\d*)', 'fortran_order': (False|True), "
+                          rb"'shape': \(((?:\d+, ?)*\d*)\), \} *\n$", re.DOTALL)
+
+def encode_strings(strings):
+    """
+        Pack a list of strings into one UTF-8 byte array, separated by NUL characters.
+
+        Args:
+            strings (list): The strings to pack; they must not contain NUL characters.
+
+        Returns:
+            numpy.ndarray: The packed uint8 array.
+
+        Raises:
+            ValueError: If a string contains a NUL character.
+    """
+    joined = '\x00'.join(strings)
+    if joined.count('\x00') != max(len(strings) - 1, 0):
+        raise ValueError("Strings stored in a mapping artifact must not contain NUL characters")
+    return np.frombuffer(joined.encode('utf-8'), dtype=np.uint8)
+
+def decode_strings(packed, count):
+    """
+        Unpack a string table written by encode_strings().
+
+        Args:
+            packed (numpy.ndarray): The packed uint8 array.
+            count (int): The number of strings in the table.
+
+        Returns:
+            list: The strings.
+    """
+    if count == 0:
+        return []
+    return packed.tobytes().decode('utf-8').split('\x00')
+
+def save_artifact(mapping, path, model=None):
+    """
+        Save a mapping as a versioned artifact, optionally with the embeddings of its tokens.
+
+        Args:
+            mapping (Mapping): The mapping to save.
+            path (str): The path of the .npz file to write.
+            model (KeyedVectors): If given, the token embeddings are stored for TokenIndex to reuse.
+    """
+    arrays = {'format': np.array(ARTIFACT_FORMAT), 'version': np.array(ARTIFACT_VERSION, dtype=np.int32),
+              'tokens': encode_strings(mapping.tokens),
+              'note_names': encode_strings(mapping.note_names),
+              'note_ids': np.array(mapping.note_ids, dtype=np.int32),
+              'volatilities': np.array(mapping.volatilities, dtype=np.int8)}
+    if model is not None:
+        embedded_tokens = [token for token in mapping.tokens if token in model.key_to_index]
+        arrays['embedded_tokens'] = encode_strings(embedded_tokens)
+        arrays['embeddings'] = embedding_matrix(embedded_tokens, model)
+        arrays['embedding_model'] = np.array(model_fingerprint(model))
+    # Written next to the file and moved over it, as a loaded artifact may still be memory-mapped
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(path + '.tmp', path)
+
+def read_header(header):
+    """
+        Parse the header of a .npy member, the dictionary numpy writes with np.save().
+
+        Args:
+            header (bytes): The header, from the magic string up to the array data.
+
+        Returns:
+            tuple: The shape, whether the array is in Fortran order, and the dtype.
+    """
+    match = PLAIN_HEADER.match(header)
+    if match is None:
+        stream = io.BytesIO(header)
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            return np.lib.format.read_array_header_1_0(stream)
+        return np.lib.format.read_array_header_2_0(stream)
+    descr, fortran_order, shape = match.groups()
+    return (tuple(int(size) for size in shape.split(b',') if size.strip()), fortran_order == b'True',
+            np.dtype(descr.decode('ascii')))
+
+def read_arrays(path, names):
+    """
+        Memory-map an uncompressed .npz file and view the given members without copying them.
+
+        Args:
+            path (str): The path of the .npz file.
+            names (list): Names of the members to view, without the .npy extension.
+
+        Returns:
+            dict: A read-only array for every member of the file among names.
+
+        Raises:
+            ValueError: If the file is not a zip archive, or a member is compressed or holds Python objects.
+    """
+    with open(path, 'rb') as f:
+        try:
+            members = zipfile.ZipFile(f).infolist()
+        except zipfile.BadZipFile:
+            raise ValueError("%s is not an .npz file" % path)
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    names = set(names)
+    arrays = {}
+    for member in members:
+        name = member.filename[:-4] if member.filename.endswith('.npy') else None
+        if name not in names:
+            continue
+        if member.compress_type != zipfile.ZIP_STORED:
+            raise ValueError("%s of %s is compressed" % (member.filename, path))
+        # The member's data follows its 30-byte local header, its name and its extra field
+        name_length, extra_length = struct.unpack_from('<HH', buffer, member.header_offset + 26)
+        start = member.header_offset + 30 + name_length + extra_length
+        # The .npy header is the magic string and version, its length and the header dictionary
+        length_size = 2 if buffer[start + 6] == 1 else 4
+        offset = start + 8 + length_size + int.from_bytes(buffer[start + 8:start + 8 + length_size], 'little')
+        shape, fortran_order, dtype = read_header(buffer[start:offset])
+        if dtype.hasobject:
+            raise ValueError("%s of %s holds Python objects" % (member.filename, path))
+        values = np.frombuffer(buffer, dtype, int(np.prod(shape)), offset)
+        arrays[name] = values.reshape(shape[::-1]).T if fortran_order else values.reshape(shape)
+    return arrays
+
+def load_artifact(path, model=None):
+    """
+        Load a mapping artifact.
+
+        Args:
+            path (str): The path of the .npz file.
+            model (KeyedVectors): The model the stored embeddings must come from to be returned.
+
+        Returns:
+            tuple: The Mapping, and the (embedded tokens, embeddings) pair or None when the file has no
+                   embeddings for this model.
+
+        Raises:
+            ValueError: If the file is not a mapping artifact or has an unsupported version.
+    """
+    data = read_arrays(path, MAPPING_MEMBERS + (EMBEDDING_MEMBERS if model is not None else ()))
+    if 'format' not in data or str(data['format']) != ARTIFACT_FORMAT:
+        raise ValueError("%s is not a mapping artifact" % path)
+    version = int(data['version'])
+    if version > ARTIFACT_VERSION:
+        raise ValueError("Mapping artifact version %d is newer than the supported version %d" % (version, ARTIFACT_VERSION))
+    note_ids = data['note_ids']
+    # The columns are copied straight from the array buffers, without a round trip through Python ints
+    note_id_column = array('i')
+    note_id_column.frombytes(note_ids.astype(np.int32, copy=False).tobytes())
+    volatility_column = array('b')
+    volatility_column.frombytes(data['volatilities'].astype(np.int8, copy=False).tobytes())
+    mapping = Mapping.from_columns(os.path.splitext(path)[0] + '.pkl', decode_strings(data['tokens'], len(note_ids)),
+                                   decode_strings(data['note_names'], int(note_ids.max()) + 1 if len(note_ids) else 0),
+                                   note_id_column, volatility_column)
+    embeddings = None
+    if model is not None and 'embeddings' in data and str(data['embedding_model']) == model_fingerprint(model):
+        # The embeddings stay a read-only view of the mapped file
+        embeddings = (decode_strings(data['embedded_tokens'], len(data['embeddings'])), data['embeddings'])
+    return mapping, embeddings
+
+def load_mapping(path, model=None):
+    """
+        Load a mapping from either a pickle or an artifact, chosen by the file extension.
+
+        Args:
+            path (str): The path of the .pkl or .npz file.
+            model (KeyedVectors): The model stored embeddings must come from, see load_artifact().
+
+        Returns:
+            tuple: The Mapping and the stored (embedded tokens, embeddings) pair or None.
+    """
+    if path.endswith('.npz'):
+        return load_artifact(path, model)
+    with open(path, 'rb') as f:
+        return pickle.load(f), None
+
+def convert_pickle(pickle_file, artifact_file, model=None):
+    """
+        Convert a mapping pickle into an artifact.
+
+        Args:
+            pickle_file (str): The path of the mapping pickle.
+            artifact_file (str): The path of the .npz file to write.
+            model (KeyedVectors): If given, the token embeddings are stored as well.
+
+        Returns:
+            Mapping: The converted mapping.
+    """
+    with open(pickle_file, 'rb') as f:
+        mapping = pickle.load(f)
+    save_artifact(mapping, artifact_file, model)
+    return mapping
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pickle_file", help="mapping pickle to convert")
+    parser.add_argument("artifact_file", help="path of the .npz artifact to write")
+    parser.add_argument("--embeddings", action="store_true", help="also store the token embeddings of the current model")
+    args = parser.parse_args()
+
+    model = None
+    if args.embeddings:
+        from embeddings import get_model
+        model = get_model()
+    mapping = convert_pickle(args.pickle_file, args.artifact_file, model)
+    print("Converted %d mappings to %s" % (len(mapping), args.artifact_file))
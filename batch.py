@@ -0,0 +1,219 @@
+"""
+Score a file of memory descriptions offline and write one JSON result per line.
+
+    python batch.py memories.jsonl results.jsonl [--text-field text] [--id-field id]
+                    [--chunk-size 256] [--workers 4] [--num-random-notes 3] [--seed 0]
+
+The input (JSONL, or CSV with a header row) is streamed in chunks. Each chunk goes through
+nlp.pipe for keyword extraction, and all of its keywords are resolved with one vectorized
+similarity search before per-row notes are predicted. With --workers N the chunks are spread
+over N processes; at most two chunks per worker are in flight, so memory stays bounded, and
+results are written in input order.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from itertools import islice
+from embeddings import get_model
+from main import is_valid_input
+
+worker_recommender = None
+
+def read_rows(path, text_field='text', id_field=None, file_format=None, encoding='utf-8'):
+    """
+        Stream (row number, id, text) tuples from a JSONL or CSV file.
+
+        Args:
+            path (str): The input file, '-' for standard input (JSONL).
+            text_field (str): The field holding the memory description.
+            id_field (str): An optional field copied to the output to identify rows.
+            file_format (str): 'jsonl' or 'csv', guessed from the extension if None.
+            encoding (str): The file encoding.
+
+        Yields:
+            tuple: The row number, the row id (or None) and the text.
+    """
+    if file_format is None:
+        file_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    f = sys.stdin if path == '-' else open(path, encoding=encoding, newline='')
+    try:
+        if file_format == 'csv':
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for number, record in enumerate(records):
+            yield number, record.get(id_field) if id_field else None, record.get(text_field)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def chunked(rows, chunk_size):
+    """
+        Group an iterable into lists of at most chunk_size items.
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def recommend_chunk(recommender, rows, num_random_notes, batch_size=64, seed=None):
+    """
+        Predict notes for a chunk of rows.
+
+        Args:
+            recommender (Recommender): The loaded recommender.
+            rows (list): (row number, id, text) tuples.
+            num_random_notes (int): The number of random notes to be generated per note category.
+            batch_size (int): Number of descriptions spaCy processes per batch.
+            seed (int): Seed combined with each row number to make the random notes reproducible.
+
+        Returns:
+            list: One result dictionary per row, in the same order.
+    """
+    valid = [row for row in rows if isinstance(row[2], str) and is_valid_input(row[2])]
+    keywords = recommender.ner.extract_keywords_batch([text for _, _, text in valid], batch_size=batch_size)
+    keywords = [recommender.match_phrases(text, row_keywords) for (_, _, text), row_keywords in zip(valid, keywords)]
+    keywords_by_row = {row[0]: row_keywords for row, row_keywords in zip(valid, keywords)}
+    # Resolve every keyword of the chunk in one vectorized search, rows then hit the keyword cache
+    recommender.resolve_keywords(list(dict.fromkeys(keyword for row_keywords in keywords for keyword in row_keywords)))
+
+    results = []
+    for number, row_id, text in rows:
+        result = {'row': number}
+        if row_id is not None:
+            result['id'] = row_id
+        if number in keywords_by_row:
+            result['keywords'] = keywords_by_row[number]
+            row_seed = None if seed is None else [seed, number]
+            result.update(recommender.predict_keywords(keywords_by_row[number], num_random_notes, row_seed))
+        elif isinstance(text, str):
+            result['error'] = 'Please describe your memory in words! (No digits or symbols)'
+        else:
+            result['error'] = 'Missing text.'
+        results.append(result)
+    return results
+
+def init_worker(cache_size):
+    """
+        Load a recommender in a worker process.
+    """
+    global worker_recommender
+    from recommender import Recommender
+    worker_recommender = Recommender(get_model(), cache_size=cache_size)
+
+def worker_recommend_chunk(rows, num_random_notes, batch_size, seed):
+    """
+        Predict notes for a chunk of rows with the worker's recommender.
+    """
+    return recommend_chunk(worker_recommender, rows, num_random_notes, batch_size, seed)
+
+def check_num_random_notes(num_random_notes, recommender=None):
+    """
+        Checks that every note category can give num_random_notes random notes before any row is scored.
+
+        Args:
+            num_random_notes (int): The number of random notes to be generated per note category.
+            recommender (Recommender): The loaded recommender, the default note categories are read if None.
+
+        Raises:
+            ValueError: If num_random_notes is not positive or larger than the smallest note category.
+    """
+    if recommender is not None:
+        limit = recommender.max_random_notes
+    else:
+        from recommender import load_note_categories, max_random_notes
+        limit = max_random_notes(load_note_categories()[1])
+    if num_random_notes < 1:
+        raise ValueError("num_random_notes must be a positive integer.")
+    if num_random_notes > limit:
+        raise ValueError("num_random_notes must be at most %d, the size of the smallest note category." % limit)
+
+def run(rows, output, workers=1, chunk_size=256, num_random_notes=3, batch_size=64, cache_size=100000, recommender=None,
+        seed=None):
+    """
+        Score rows and write JSONL results in input order.
+
+        Args:
+            rows (iterable): (row number, id, text) tuples, e.g. from read_rows().
+            output (file): A text file the JSONL results are written to.
+            workers (int): Number of worker processes, 1 scores in this process.
+            chunk_size (int): Number of rows scored together.
+            num_random_notes (int): The number of random notes to be generated per note category.
+            batch_size (int): Number of descriptions spaCy processes per batch.
+            cache_size (int): Size of each recommender's keyword cache.
+            recommender (Recommender): An already loaded recommender to use when workers is 1.
+            seed (int): Seed making the random notes reproducible, None for a different choice on every run.
+
+        Returns:
+            int: The number of rows written.
+
+        Raises:
+            ValueError: If num_random_notes is not positive or larger than the smallest note category, before any row is written.
+    """
+    written = 0
+    if workers <= 1 and recommender is None:
+        from recommender import Recommender
+        recommender = Recommender(get_model(), cache_size=cache_size)
+    check_num_random_notes(num_random_notes, recommender)
+    if workers <= 1:
+        for chunk in chunked(rows, chunk_size):
+            written += write_results(recommend_chunk(recommender, chunk, num_random_notes, batch_size, seed), output)
+        return written
+
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(cache_size,)) as pool:
+        in_flight = deque()
+        for chunk in chunked(rows, chunk_size):
+            in_flight.append(pool.apply_async(worker_recommend_chunk, (chunk, num_random_notes, batch_size, seed)))
+            # Bound memory: wait for the oldest chunk once every worker has two queued
+            while len(in_flight) >= workers * 2:
+                written += write_results(in_flight.popleft().get(), output)
+        while in_flight:
+            written += write_results(in_flight.popleft().get(), output)
+    return written
+
+def write_results(results, output):
+    """
+        Write result dictionaries as JSON lines.
+
+        Returns:
+            int: The number of results written.
+    """
+    for result in results:
+        output.write(json.dumps(result) + '\n')
+    return len(results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL or CSV file of memories, '-' reads JSONL from standard input")
+    parser.add_argument("output", help="JSONL file the results are written to, '-' for standard output")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="input format, guessed from the extension by default")
+    parser.add_argument("--encoding", default="utf-8", help="input file encoding")
+    parser.add_argument("--text-field", default="text", help="field holding the memory description")
+    parser.add_argument("--id-field", default=None, help="field copied to the output to identify rows")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=256, help="rows scored together")
+    parser.add_argument("--batch-size", type=int, default=64, help="descriptions per spaCy batch")
+    parser.add_argument("--num-random-notes", type=int, default=3, help="random notes per note category")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible random notes")
+    args = parser.parse_args()
+    try:
+        check_num_random_notes(args.num_random_notes)
+    except ValueError as error:
+        parser.error("argument --num-random-notes: %s" % error)
+
+    start = time.perf_counter()
+    rows = read_rows(args.input, args.text_field, args.id_field, args.format, args.encoding)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        count = run(rows, output, args.workers, args.chunk_size, args.num_random_notes, args.batch_size, seed=args.seed)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    seconds = time.perf_counter() - start
+    print("Scored %d rows in %.1f s (%.1f rows/sec)" % (count, seconds, count / seconds if seconds else 0.0), file=sys.stderr)
@@ -0,0 +1,74 @@
+"""
+Load time and file size of the mapping artifact against the mapping pickle, for the
+shipped token_note_mapping.pkl and optionally a synthetic mapping. The "+ embeddings"
+columns also time what the Recommender needs next: the row-normalised embeddings of the
+mapped tokens, computed from the model for the pickle and stored in the artifact. The
+embeddings come from the synthetic model of benchmarks/synthetic.py. Run from the
+repository root:
+
+    python -m benchmarks.bench_artifact [--synthetic-tokens 1000000] [--repeats 5]
+"""
+import argparse
+import os
+import pickle
+import statistics
+import tempfile
+import time
+from artifact import load_artifact, save_artifact
+from benchmarks.synthetic import synthetic_model
+from mapping import Mapping
+from similarity import embedding_matrix
+
+def median_seconds(load, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def load_pickle_with_embeddings(path, model):
+    mapping = load_pickle(path)
+    return mapping, embedding_matrix([token for token in mapping.tokens if token in model.key_to_index], model)
+
+def compare(name, mapping, directory, repeats, model):
+    pickle_file = os.path.join(directory, name + '.pkl')
+    artifact_file = os.path.join(directory, name + '.npz')
+    with open(pickle_file, 'wb') as f:
+        pickle.dump(mapping, f)
+    save_artifact(mapping, artifact_file, model)
+    pickle_seconds = median_seconds(lambda: load_pickle(pickle_file), repeats)
+    artifact_seconds = median_seconds(lambda: load_artifact(artifact_file), repeats)
+    pickle_embedding_seconds = median_seconds(lambda: load_pickle_with_embeddings(pickle_file, model), repeats)
+    artifact_embedding_seconds = median_seconds(lambda: load_artifact(artifact_file, model), repeats)
+    print("%-10s %9d %10.2f MB %10.2f MB %10.2f ms %10.2f ms %14.2f ms %14.2f ms" % (
+        name, len(mapping), os.path.getsize(pickle_file) / 2 ** 20, os.path.getsize(artifact_file) / 2 ** 20,
+        pickle_seconds * 1000, artifact_seconds * 1000, pickle_embedding_seconds * 1000, artifact_embedding_seconds * 1000))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic-tokens', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    shipped = load_pickle('token_note_mapping.pkl')
+    mappings = [('shipped', shipped)]
+    if args.synthetic_tokens:
+        mapping = Mapping('synthetic.pkl')
+        for i in range(args.synthetic_tokens):
+            mapping.add_mapping('token%d' % i, 'note%d' % (i % 1000), i % 3)
+        mappings.append(('synthetic', mapping))
+    model = synthetic_model(sorted({token for _, mapping in mappings for token in mapping.tokens}))
+
+    print("%-10s %9s %13s %13s %13s %13s %17s %17s" % ("mapping", "tokens", "pickle size", "npz size", "pickle load",
+                                                      "npz load", "+ embeddings", "+ embeddings"))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, mapping in mappings:
+            compare(name, mapping, directory, args.repeats, model)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Per-request cost of picking random notes for a note category: the pandas filter and
+sample() predictions used to run, against the load-time category index and a
+per-request numpy Generator. Run from the repository root:
+
+    python -m benchmarks.bench_category_sampling [--requests 2000] [--categories-per-request 3]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--categories-per-request', type=int, default=3)
+    parser.add_argument('--num-random-notes', type=int, default=3)
+    args = parser.parse_args()
+
+    note_class_data = pd.read_csv('note_categories.csv', encoding='latin-1', sep=';', on_bad_lines='warn')
+    categories = note_class_data['Category'].unique()
+    requests = [np.random.default_rng(i).choice(categories, args.categories_per_request) for i in range(args.requests)]
+
+    start = time.perf_counter()
+    for request_categories in requests:
+        for category in request_categories:
+            filtered_notes = note_class_data.loc[note_class_data['Category'] == category, 'Note Name']
+            filtered_notes.sample(args.num_random_notes, random_state=int(time.time())).tolist()
+    pandas_seconds = (time.perf_counter() - start) / args.requests
+
+    start = time.perf_counter()
+    category_notes = {category: notes.to_numpy(dtype=object)
+                      for category, notes in note_class_data.groupby('Category', sort=False)['Note Name']}
+    index_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for request_categories in requests:
+        rng = np.random.default_rng()
+        for category in request_categories:
+            rng.choice(category_notes[category], args.num_random_notes, replace=False).tolist()
+    indexed_seconds = (time.perf_counter() - start) / args.requests
+
+    print("pandas filter + sample:   %8.1f us per request" % (pandas_seconds * 1e6))
+    print("category index + rng:     %8.1f us per request (index built once in %.1f ms)" % (indexed_seconds * 1e6, index_seconds * 1e3))
+    print("Speedup:                  %8.1fx" % (pandas_seconds / indexed_seconds))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Compare the wall-clock time of the original per-pair training loop with the
+matrix-based map_keywords on the shipped training set.
+
+Keywords are extracted once with spaCy and shared by both runs, so the timings
+only cover the similarity and mapping work. Run from the repository root:
+
+    python -m benchmarks.bench_generate_mappings [--rows N]
+"""
+import argparse
+import time
+from sklearn.metrics.pairwise import cosine_similarity
+from embeddings import get_model
+from main import CATEGORIES, load_training_set, map_keywords
+from mapping import Mapping
+from ner import Ner
+from similarity import WordMatrix
+
+def calculate_similarity(word1, word2):
+    # The original sklearn-based word pair similarity
+    pretrained_model = get_model()
+    if word1 in pretrained_model.key_to_index and word2 in pretrained_model.key_to_index:
+        return cosine_similarity([pretrained_model[word1]], [pretrained_model[word2]])[0][0]
+    return None
+
+def legacy_map_keywords(mapping, top_keywords, notes, similarity_upper_threshold):
+    # The training loop as it was before map_keywords, one sklearn call per word pair
+    for top_keyword in top_keywords:
+        max_similarity = 0
+        most_similar_note = None
+        for note in notes:
+            if top_keyword in note.strip():
+                max_similarity = 1
+                most_similar_note = note
+                mapping.add_mapping(top_keyword, note, 0)
+                top_keywords.remove(top_keyword)
+                break
+            similarity = calculate_similarity(top_keyword, note)
+            if similarity is not None and similarity > max_similarity:
+                max_similarity = similarity
+                most_similar_note = note
+
+        if max_similarity < 1:
+            exact_category = None
+            for note_category in CATEGORIES:
+                if top_keyword.upper() in note_category:
+                    exact_category = note_category
+
+            max_category_similarity = 0
+            most_similar_category = None
+            for category in CATEGORIES:
+                category_similarity = calculate_similarity(top_keyword, category.lower())
+                if category_similarity is not None and category_similarity == 1:
+                    max_category_similarity = 1
+                    most_similar_category = category
+                    break
+                if category_similarity is not None and category_similarity > max_category_similarity:
+                    max_category_similarity = category_similarity
+                    most_similar_category = category
+
+            if exact_category is not None and max_similarity < similarity_upper_threshold:
+                mapping.add_mapping(top_keyword, exact_category, 1)
+                top_keywords.remove(top_keyword)
+            elif max_similarity >= max_category_similarity:
+                mapping.add_mapping(top_keyword, most_similar_note, 1)
+                top_keywords.remove(top_keyword)
+            else:
+                mapping.add_mapping(top_keyword, most_similar_category, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=None, help='only use the first N training rows')
+    parser.add_argument('--threshold', type=float, default=0.8)
+    args = parser.parse_args()
+
+    descriptions, fragrance_notes = load_training_set('training_set.csv')
+    rows = range(1, len(descriptions) if args.rows is None else min(args.rows, len(descriptions)))
+    notes_per_row = [[note.lower() for note in fragrance_notes[i]] for i in rows]
+
+    print("Extracting keywords for %d rows..." % len(rows))
+    ner = Ner()
+    keywords_per_row = [ner.extract_keywords(descriptions[i]) for i in rows]
+
+    # Load the embeddings before anything is timed
+    pretrained_model = get_model()
+    legacy = Mapping('legacy_mapping.pkl')
+    start = time.perf_counter()
+    for keywords, notes in zip(keywords_per_row, notes_per_row):
+        legacy_map_keywords(legacy, list(keywords), notes, args.threshold)
+    legacy_seconds = time.perf_counter() - start
+
+    vectorized = Mapping('vectorized_mapping.pkl')
+    start = time.perf_counter()
+    note_matrix = WordMatrix([note for notes in notes_per_row for note in notes], pretrained_model)
+    category_matrix = WordMatrix([category.lower() for category in CATEGORIES], pretrained_model)
+    for keywords, notes in zip(keywords_per_row, notes_per_row):
+        map_keywords(vectorized, list(keywords), notes, note_matrix, category_matrix, args.threshold)
+    vectorized_seconds = time.perf_counter() - start
+
+    legacy_entries = {m['token']: (m['note'], m['volatility']) for m in legacy.get_mappings()}
+    vectorized_entries = {m['token']: (m['note'], m['volatility']) for m in vectorized.get_mappings()}
+    differences = [token for token in legacy_entries.keys() | vectorized_entries.keys()
+                   if legacy_entries.get(token) != vectorized_entries.get(token)]
+
+    print("Per-pair loop:  %.2f s" % legacy_seconds)
+    print("Matrix scoring: %.2f s (%.1fx faster)" % (vectorized_seconds, legacy_seconds / vectorized_seconds))
+    print("Mapped tokens:  %d legacy, %d vectorized, %d differing" % (len(legacy_entries), len(vectorized_entries), len(differences)))
+    for token in sorted(differences)[:20]:
+        print("  %s: %s -> %s" % (token, legacy_entries.get(token), vectorized_entries.get(token)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Time a full training run against an incremental one after rows are appended.
+
+The shipped training set minus its last --appended rows is trained from scratch,
+then the full file is retrained incrementally and the result is checked against
+a full rebuild. Run from the repository root:
+
+    python -m benchmarks.bench_incremental_training [--appended 100] [--stand-in]
+
+--stand-in replaces spaCy and the word embeddings with the offline stand-ins of
+benchmarks/synthetic.py, for machines without en_core_web_sm or the GoogleNews model;
+keyword extraction is then much cheaper than with spaCy, so the full run is understated.
+"""
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+import embeddings
+from benchmarks.synthetic import WordSplitter, synthetic_model
+from main import generate_mappings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appended', type=int, default=100, help='rows appended before the incremental run')
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--stand-in', action='store_true', help='use the offline stand-ins for spaCy and the embeddings')
+    args = parser.parse_args()
+
+    data = pd.read_csv('training_set.csv', encoding='latin-1', on_bad_lines='warn')
+    ner = None
+    if args.stand_in:
+        embeddings.set_model(synthetic_model())
+        ner = WordSplitter()
+
+    with tempfile.TemporaryDirectory() as directory:
+        training_file = os.path.join(directory, 'training_set.csv')
+        pickle_file = os.path.join(directory, 'token_note_mapping.pkl')
+
+        data[:-args.appended].to_csv(training_file, index=False, encoding='latin-1')
+        start = time.perf_counter()
+        generate_mappings(args.threshold, training_file, pickle_file, incremental=False, ner=ner)
+        full_seconds = time.perf_counter() - start
+
+        data.to_csv(training_file, index=False, encoding='latin-1')
+        start = time.perf_counter()
+        incremental = generate_mappings(args.threshold, training_file, pickle_file, ner=ner)
+        incremental_seconds = time.perf_counter() - start
+
+        rebuilt = generate_mappings(args.threshold, training_file, pickle_file, incremental=False, ner=ner)
+
+    print()
+    print("full run on %d rows:     %.2f s" % (len(data) - args.appended, full_seconds))
+    print("incremental, %d appended: %.2f s (%.1fx faster)" % (args.appended, incremental_seconds,
+                                                               full_seconds / incremental_seconds))
+    print("same mapping as a full rebuild: %s" % (incremental.get_mappings() == rebuilt.get_mappings()))
+
+if __name__ == '__main__':
+    main()
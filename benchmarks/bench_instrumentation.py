@@ -0,0 +1,70 @@
+"""
+Measure what instrumentation costs per prediction when it is off, on, and on with cProfile.
+
+A warm Recommender on the shipped mapping predicts the same input repeatedly with the
+keyword cache disabled, so every request runs keyword extraction, the similarity search
+and note sampling. Run from the repository root:
+
+    python -m benchmarks.bench_instrumentation [--requests N] [--rounds N] [--stand-in]
+
+--stand-in replaces spaCy and the word embeddings with the offline stand-ins of
+benchmarks/synthetic.py.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import timeit
+import embeddings
+import instrumentation
+from benchmarks.bench_recommender import EXAMPLE_INPUT
+from recommender import Recommender
+
+def median_latency(recommender, text, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        recommender.predict(text, 3)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='predictions per mode and round')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--text', default=EXAMPLE_INPUT)
+    parser.add_argument('--stand-in', action='store_true', help='use the offline stand-ins for spaCy and the embeddings')
+    args = parser.parse_args()
+
+    ner = None
+    if args.stand_in:
+        from benchmarks.synthetic import WordSplitter, synthetic_model
+        embeddings.set_model(synthetic_model())
+        ner = WordSplitter()
+    recommender = Recommender(embeddings.get_model(), ner=ner, cache_size=0)
+    recommender.predict(args.text, 3)
+
+    # Alternate the modes over several rounds so drift in machine load affects them alike
+    latencies = {'off': [], 'on': [], 'profiled': []}
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(args.rounds):
+            latencies['off'].append(median_latency(recommender, args.text, args.requests))
+            instrumentation.enable()
+            latencies['on'].append(median_latency(recommender, args.text, args.requests))
+            report = instrumentation.last_report()
+            instrumentation.enable(os.path.join(directory, 'predict.prof'))
+            latencies['profiled'].append(median_latency(recommender, args.text, args.requests))
+            instrumentation.disable()
+    off, on, profiled = (statistics.median(latencies[mode]) for mode in ('off', 'on', 'profiled'))
+    print(instrumentation.format_report(report))
+    stage_off = timeit.timeit(lambda: instrumentation.stage('extract_keywords'), number=100000) / 100000
+
+    print()
+    print("off:          %8.1f us per prediction" % (off * 1e6))
+    print("on:           %8.1f us per prediction (%+.1f%%)" % (on * 1e6, (on / off - 1) * 100))
+    print("on + profile: %8.1f us per prediction (%+.1f%%)" % (profiled * 1e6, (profiled / off - 1) * 100))
+    print("stage() while off: %.0f ns per call" % (stage_off * 1e9))
+
+if __name__ == '__main__':
+    main()
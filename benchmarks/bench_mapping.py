@@ -0,0 +1,87 @@
+"""
+Micro-benchmark of the indexed Mapping store against the original list-of-dicts
+layout at 10k, 100k and 1M tokens. Run from the repository root:
+
+    python -m benchmarks.bench_mapping [--sizes 10000 100000 1000000]
+
+Building the list-based store through add_mapping is quadratic, so it is only
+timed up to --legacy-limit tokens; its lookups are timed on a directly built list.
+"""
+import argparse
+import random
+import time
+from mapping import Mapping
+
+class ListMapping():
+    # The list-of-dicts store that Mapping replaced, kept for comparison
+    def __init__(self):
+        self.mappings = []
+
+    def add_mapping(self, token, note, volatility):
+        if note is not None:
+            existing_mapping = self.get_mapping(token)
+            if existing_mapping:
+                if volatility < existing_mapping['volatility']:
+                    existing_mapping['note'] = note
+                    existing_mapping['volatility'] = volatility
+            else:
+                self.mappings.append({'token': token, 'note': note, 'volatility': volatility})
+
+    def get_mapping(self, token):
+        for mapping in self.mappings:
+            if mapping['token'] == token:
+                return mapping
+        return None
+
+    def get_note_for_token(self, token):
+        for mapping in self.mappings:
+            if mapping['token'] == token:
+                return mapping['note']
+        raise ValueError("Token not found")
+
+def synthetic_rows(size, seed=0):
+    rng = random.Random(seed)
+    return [('token%d' % i, 'note%d' % rng.randrange(1000), rng.randrange(3)) for i in range(size)]
+
+def time_lookups(store, tokens):
+    start = time.perf_counter()
+    for token in tokens:
+        store.get_note_for_token(token)
+    return (time.perf_counter() - start) / len(tokens)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--lookups', type=int, default=1000)
+    parser.add_argument('--legacy-limit', type=int, default=10000)
+    args = parser.parse_args()
+
+    print("%10s %14s %14s %16s %16s" % ("tokens", "indexed add", "list add", "indexed lookup", "list lookup"))
+    for size in args.sizes:
+        rows = synthetic_rows(size)
+        lookup_tokens = [rows[i][0] for i in random.Random(1).sample(range(size), min(args.lookups, size))]
+
+        indexed = Mapping('bench_mapping.pkl')
+        start = time.perf_counter()
+        for token, note, volatility in rows:
+            indexed.add_mapping(token, note, volatility)
+        indexed_add = time.perf_counter() - start
+        indexed_lookup = time_lookups(indexed, lookup_tokens)
+
+        listed = ListMapping()
+        list_add = None
+        if size <= args.legacy_limit:
+            start = time.perf_counter()
+            for token, note, volatility in rows:
+                listed.add_mapping(token, note, volatility)
+            list_add = time.perf_counter() - start
+        else:
+            listed.mappings = [{'token': t, 'note': n, 'volatility': v} for t, n, v in rows]
+        list_lookup = time_lookups(listed, lookup_tokens[:100])
+
+        print("%10d %13.3fs %14s %14.2fus %14.2fus" % (
+            size, indexed_add, "%.3fs" % list_add if list_add is not None else "skipped",
+            indexed_lookup * 1e6, list_lookup * 1e6))
+
+if __name__ == '__main__':
+    main()
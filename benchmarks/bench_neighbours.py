@@ -0,0 +1,56 @@
+"""
+Recall@1 and queries per second of the IVF nearest-token search against exact
+search on synthetic clustered embeddings. Run from the repository root:
+
+    python -m benchmarks.bench_neighbours [--sizes 10000 100000 1000000] [--n-probe 1 4 8 16]
+"""
+import argparse
+import time
+import numpy as np
+from neighbours import ExactSearch, IVFSearch
+from similarity import normalise_rows
+
+def synthetic_embeddings(size, dim, queries, seed=0):
+    # Tokens scattered around topic centres, queries are perturbed tokens
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(10, size // 100), dim)).astype(np.float32)
+    matrix = np.empty((size, dim), dtype=np.float32)
+    for start in range(0, size, 100000):
+        stop = min(size, start + 100000)
+        matrix[start:stop] = centers[rng.integers(0, len(centers), stop - start)] \
+                             + 0.5 * rng.standard_normal((stop - start, dim)).astype(np.float32)
+    matrix = normalise_rows(matrix)
+    picked = matrix[rng.integers(0, size, queries)]
+    query_matrix = normalise_rows(picked + 0.6 * rng.standard_normal(picked.shape).astype(np.float32) / np.sqrt(dim))
+    return matrix, query_matrix
+
+def queries_per_second(backend, queries, batch_size):
+    start = time.perf_counter()
+    results = [backend.search(queries[i:i + batch_size])[0] for i in range(0, len(queries), batch_size)]
+    return np.concatenate(results), len(queries) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--dim', type=int, default=300)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=1, help='keywords resolved per search call')
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    print("%10s %8s %10s %12s %10s" % ("tokens", "backend", "build", "queries/s", "recall@1"))
+    for size in args.sizes:
+        matrix, queries = synthetic_embeddings(size, args.dim, args.queries)
+        exact_best, exact_qps = queries_per_second(ExactSearch(matrix), queries, args.batch_size)
+        print("%10d %8s %10s %12.1f %10.3f" % (size, "exact", "-", exact_qps, 1.0))
+
+        start = time.perf_counter()
+        ivf = IVFSearch.build(matrix)
+        build_seconds = time.perf_counter() - start
+        for n_probe in args.n_probe:
+            ivf.n_probe = n_probe
+            best, qps = queries_per_second(ivf, queries, args.batch_size)
+            print("%10d %8s %9.1fs %12.1f %10.3f" % (size, "ivf/%d" % n_probe, build_seconds, qps, np.mean(best == exact_best)))
+
+if __name__ == '__main__':
+    main()
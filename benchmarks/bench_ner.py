@@ -0,0 +1,88 @@
+"""
+Measure keyword extraction throughput before and after the lean Ner pipeline.
+
+'before' runs the full en_core_web_sm pipeline and the previous keyword filter, which
+rebuilt the stop-word set and scanned a list of entity tokens for every document.
+'after' is Ner(), which leaves out the lemmatizer and filters with precomputed sets;
+the parser stays, as the entity recognizer reads its sentence boundaries. Both run over
+the training descriptions, one document at a time like extract_keywords and through
+nlp.pipe like extract_keywords_batch, and every keyword list of the two is compared.
+Run from the repository root:
+
+    python -m benchmarks.bench_ner [--rounds 3] [--limit 2000] [--blank]
+
+The docs/sec of the pipeline need en_core_web_sm. --blank tokenises with
+spacy.blank('en') for machines without the model: it only times the keyword filter, as
+there are no tags or entities, and says nothing about the pipeline.
+"""
+import argparse
+from collections import Counter
+import time
+import spacy
+import main as otm
+from ner import Ner
+
+def keywords_before(doc):
+    # Ner.keywords_from_doc as it was before the stop words and entity filter became sets
+    ner_categories = ["PERSON", "LOCATION", "DATE", "ORG"]
+    token_labels = [(token.text, token.ent_type_) for token in doc]
+    remove_entities = [token for token, label in token_labels if label in ner_categories]
+
+    stop_words = spacy.lang.en.stop_words.STOP_WORDS | \
+                 {"like", "note", "notes", "scent", "scents", "fragrance", "perfume", "\x96", "\r", "©", "le"}
+    filtered_words = [token.text.lower().split("-")[0] for token in doc
+                      if token.pos_ not in {"VERB", "ADV"} and token.text not in remove_entities
+                      and token.text.lower() not in stop_words and not token.is_punct
+                      and not token.is_digit and len(token.text)>1]
+    return [word for word, _ in Counter(filtered_words).most_common(15)]
+
+def docs_per_second(extract, texts):
+    start = time.perf_counter()
+    keywords = extract(texts)
+    return len(texts) / (time.perf_counter() - start), keywords
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=3, help='runs per variant, the fastest is reported')
+    parser.add_argument('--limit', type=int, default=None, help='number of training descriptions to use')
+    parser.add_argument('--batch-size', type=int, default=64, help='descriptions per nlp.pipe batch')
+    parser.add_argument('--blank', action='store_true', help="tokenise with spacy.blank('en') instead of en_core_web_sm")
+    args = parser.parse_args()
+
+    descriptions, _ = otm.load_training_set('training_set.csv')
+    texts = [str(description) for description in descriptions[:args.limit]]
+    if args.blank:
+        # A Ner around the blank pipeline, skipping the model load of __init__
+        ner = Ner.__new__(Ner)
+        full_nlp = ner.nlp = spacy.blank('en')
+    else:
+        full_nlp = spacy.load('en_core_web_sm')
+        ner = Ner()
+    print("before: %s" % ', '.join(full_nlp.pipe_names))
+    print("after:  %s" % ', '.join(ner.nlp.pipe_names))
+    if args.blank:
+        print("blank pipeline: only the keyword filter is timed")
+
+    variants = {
+        'before.single': lambda texts: [keywords_before(full_nlp(text)) for text in texts],
+        'after.single': lambda texts: [ner.keywords_from_doc(ner.nlp(text)) for text in texts],
+        'before.batch': lambda texts: [keywords_before(doc) for doc in full_nlp.pipe(texts, batch_size=args.batch_size)],
+        'after.batch': lambda texts: ner.extract_keywords_batch(texts, batch_size=args.batch_size),
+    }
+    best = dict.fromkeys(variants, 0.0)
+    keywords = {}
+    # Alternate the variants over the rounds so drift in machine load affects them alike
+    for _ in range(args.rounds):
+        for name, extract in variants.items():
+            rate, keywords[name] = docs_per_second(extract, texts)
+            best[name] = max(best[name], rate)
+
+    print('%-14s %12s %9s' % ('variant', 'docs/sec', 'speedup'))
+    for name in variants:
+        print('%-14s %12.1f %8.2fx' % (name, best[name], best[name] / best[name.replace('after', 'before')]))
+    for mode in ('single', 'batch'):
+        differences = sum(before != after for before, after in zip(keywords['before.' + mode], keywords['after.' + mode]))
+        print('%s: %d of %d descriptions got different keywords' % (mode, differences, len(texts)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Compare the substring note and category checks of training with the whole-word
+PhraseIndex checks, and measure phrase matching at prediction time.
+
+Training: for every keyword of every training row, the direct-note check (a note of
+the row containing the keyword) and the exact-category check (a category containing the
+keyword) are timed both ways, and every decision that differs is counted, e.g. "rose"
+in "primrose" that no longer maps directly. Prediction: Recommender.match_phrases() is
+timed on every training description, counting the multi-word note names and categories
+it finds and the keywords they replace, which skip the embedding search. Run from the
+repository root:
+
+    python -m benchmarks.bench_phrases [--rounds 5] [--ner stand-in]
+
+Keywords come from spaCy when en_core_web_sm is installed and otherwise from the
+WordSplitter stand-in, without stop words.
+"""
+import argparse
+import time
+from collections import Counter
+import embeddings
+import main as otm
+from benchmarks.synthetic import keyword_extractor, synthetic_model
+from main import CATEGORIES, CATEGORY_INDEX
+from ner import STOP_WORDS
+from phrases import PhraseIndex, contains_phrase, phrase_tokens, word_forms
+from recommender import Recommender
+
+def substring_checks(rows):
+    # The checks as keyword_mappings() made them before the index
+    results = []
+    for keywords, notes in rows:
+        for keyword in keywords:
+            exact_note = next((note for note in notes if keyword in note.strip()), None)
+            exact_category = None
+            for note_category in CATEGORIES:
+                if keyword.upper() in note_category:
+                    exact_category = note_category
+            results.append((exact_note, exact_category))
+    return results
+
+def index_checks(rows, note_index):
+    # The checks as keyword_mappings() makes them
+    results = []
+    for keywords, notes in rows:
+        note_tokens = [note_index.tokens(note) for note in notes]
+        first_notes = {}
+        for note, tokens in zip(notes, note_tokens):
+            for token in tokens:
+                for form in word_forms(token):
+                    first_notes.setdefault(form, note)
+        for keyword in keywords:
+            keyword_tokens = tuple(phrase_tokens(keyword))
+            if len(keyword_tokens) == 1:
+                exact_note = first_notes.get(keyword_tokens[0])
+            else:
+                exact_note = next((note for note, tokens in zip(notes, note_tokens)
+                                   if keyword_tokens and contains_phrase(tokens, keyword_tokens)), None)
+            containing_categories = CATEGORY_INDEX.containing(keyword)
+            exact_category = CATEGORY_INDEX.names[containing_categories[-1]] if containing_categories else None
+            results.append((exact_note, exact_category))
+    return results
+
+def best_seconds(function, rounds):
+    seconds = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=5, help='runs per variant, the fastest is reported')
+    parser.add_argument('--ner', choices=['auto', 'spacy', 'stand-in'], default='auto', help='keyword extractor')
+    parser.add_argument('--examples', type=int, default=10, help='differing decisions to print')
+    args = parser.parse_args()
+
+    ner, ner_name = keyword_extractor(args.ner)
+    descriptions, fragrance_notes = otm.load_training_set('training_set.csv')
+    descriptions = [str(description) for description in descriptions[1:]]
+    keywords_per_row = ner.extract_keywords_batch(descriptions)
+    if ner_name == 'stand-in':
+        # Drop what Ner's filter would drop for certain, so "a" and "in" do not swamp the differences
+        keywords_per_row = [[keyword for keyword in row_keywords if keyword not in STOP_WORDS and len(keyword) > 1]
+                            for row_keywords in keywords_per_row]
+    rows = [(keywords, [note.lower() for note in notes]) for keywords, notes in zip(keywords_per_row, fragrance_notes[1:])]
+    keywords = sum(len(row_keywords) for row_keywords, _ in rows)
+    print("%d training rows, %d keywords (%s keywords)" % (len(rows), keywords, ner_name))
+
+    # Training builds the index once per chunk; here it covers the whole training set
+    index_seconds, note_index = best_seconds(lambda: PhraseIndex(note for _, notes in rows for note in notes), args.rounds)
+    substring_seconds, before = best_seconds(lambda: substring_checks(rows), args.rounds)
+    whole_word_seconds, after = best_seconds(lambda: index_checks(rows, note_index), args.rounds)
+    print("substring checks:  %8.1f ms  (%.2f us per keyword)" % (substring_seconds * 1e3, substring_seconds / keywords * 1e6))
+    print("phrase index:      %8.1f ms  (%.2f us per keyword, plus %.1f ms to index %d notes)"
+          % (whole_word_seconds * 1e3, whole_word_seconds / keywords * 1e6, index_seconds * 1e3, len(note_index)))
+
+    flat_keywords = [keyword for row_keywords, _ in rows for keyword in row_keywords]
+    changes = Counter()
+    examples = []
+    for keyword, (note_before, category_before), (note_after, category_after) in zip(flat_keywords, before, after):
+        if note_before != note_after:
+            changes['direct note %s' % ('lost' if note_after is None else 'gained' if note_before is None else 'changed')] += 1
+            examples.append('%s: note %r -> %r' % (keyword, note_before, note_after))
+        if category_before != category_after:
+            changes['exact category %s' % ('lost' if category_after is None else 'gained' if category_before is None
+                                           else 'changed')] += 1
+            examples.append('%s: category %r -> %r' % (keyword, category_before, category_after))
+    print("decisions that differ:")
+    for change, count in sorted(changes.items()):
+        print("  %-24s %6d of %d keywords" % (change, count, keywords))
+    for example in examples[:args.examples]:
+        print("  " + example)
+
+    embeddings.set_model(synthetic_model())
+    recommender = Recommender(embeddings.get_model(), ner=ner)
+    phrase_seconds, phrased = best_seconds(lambda: [recommender.match_phrases(description, row_keywords) for description, row_keywords
+                                                    in zip(descriptions, keywords_per_row)], args.rounds)
+    names = [keyword for row_keywords in phrased for keyword in row_keywords if keyword in recommender.phrase_results]
+    replaced = sum(len(row_keywords) for row_keywords in keywords_per_row) - sum(
+        len([keyword for keyword in row_keywords if keyword not in recommender.phrase_results]) for row_keywords in phrased)
+    print("prediction: %d multi-word names indexed; match_phrases takes %.1f us per description"
+          % (len(recommender.phrase_results), phrase_seconds / len(descriptions) * 1e6))
+    print("  %d names found in %d of %d descriptions, replacing %d keywords that skip the embedding search"
+          % (len(names), sum(any(keyword in recommender.phrase_results for keyword in row_keywords) for row_keywords in phrased),
+             len(descriptions), replaced))
+    print("  most frequent: %s" % ', '.join('%s (%d)' % item for item in Counter(names).most_common(8)))
+
+if __name__ == '__main__':
+    main()
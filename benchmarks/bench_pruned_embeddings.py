@@ -0,0 +1,60 @@
+"""
+Report RSS, load time and recommendation agreement of a pruned embedding file
+(see build_embeddings.py) against the full model. Run from the repository root:
+
+    python -m benchmarks.bench_pruned_embeddings domain_embeddings.kv [--full PATH] [--rows 200]
+
+Load time and RSS are measured in a fresh process per file. Agreement is the share
+of keywords, extracted from training descriptions, that resolve to the same
+(note, volatility) with both files.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from embeddings import default_model_path, load_model
+from main import load_training_set
+from ner import Ner
+from recommender import Recommender
+
+MEASURE_CODE = """
+import json, resource, sys, time
+from embeddings import load_model
+start = time.perf_counter()
+model = load_model(sys.argv[1])
+load_seconds = time.perf_counter() - start
+rss_loaded = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+model.vectors.sum()
+rss_touched = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'words': len(model.key_to_index), 'dtype': str(model.vectors.dtype), 'load_seconds': load_seconds,
+                  'rss_loaded_mb': rss_loaded / 1024, 'rss_touched_mb': rss_touched / 1024}))
+"""
+
+def measure(path):
+    output = subprocess.run([sys.executable, '-c', MEASURE_CODE, path], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pruned', help='pruned KeyedVectors file')
+    parser.add_argument('--full', default=None, help='full KeyedVectors file, defaults to the converted GoogleNews model')
+    parser.add_argument('--rows', type=int, default=200, help='training descriptions to draw keywords from')
+    args = parser.parse_args()
+    full_path = args.full or default_model_path()
+
+    print("%-8s %10s %8s %10s %14s %15s" % ("model", "words", "dtype", "load", "RSS after load", "RSS all pages"))
+    for name, path in (('full', full_path), ('pruned', args.pruned)):
+        stats = measure(path)
+        print("%-8s %10d %8s %9.2fs %12.0f MB %13.0f MB" % (name, stats['words'], stats['dtype'], stats['load_seconds'],
+                                                          stats['rss_loaded_mb'], stats['rss_touched_mb']))
+
+    descriptions, _ = load_training_set('training_set.csv')
+    ner = Ner()
+    keywords = [keyword for keywords in ner.extract_keywords_batch(descriptions[1:args.rows + 1]) for keyword in keywords]
+    full = Recommender(load_model(full_path), ner=ner).resolve_keywords(keywords)
+    pruned = Recommender(load_model(args.pruned), ner=ner).resolve_keywords(keywords)
+    agreeing = sum(a == b for a, b in zip(full, pruned))
+    print("Agreement: %d of %d keywords (%.2f%%)" % (agreeing, len(keywords), 100.0 * agreeing / max(len(keywords), 1)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Compare float16 and int8 embedding matrices with float32 for memory, scoring time and
+top-1 agreement.
+
+Prediction: the token matrix of the shipped token_note_mapping.pkl is built at every
+precision. Every vocabulary word the mapping does not hold is resolved to its nearest
+mapped token, once as one batch and once a keyword at a time. The report counts the words
+whose nearest token, and so the note they resolve to, matches float32.
+
+Training: generate_mappings() is run on the shipped training set with the note and
+category matrices at every precision. Every token of the resulting mapping is compared
+with the float32 run. The embeddings are the synthetic model of benchmarks/synthetic.py.
+Run from the repository root:
+
+    python -m benchmarks.bench_quantized [--rounds 3] [--ner stand-in] [--skip-training]
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import embeddings
+import instrumentation
+import main as otm
+from artifact import load_mapping
+from benchmarks.synthetic import keyword_extractor, synthetic_model
+from quantized import PRECISIONS
+from similarity import TokenIndex, WordMatrix
+
+KB = 2 ** 10
+
+def best_seconds(function, rounds):
+    seconds = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), result
+
+def agreement(results, expected):
+    return np.mean([result == reference for result, reference in zip(results, expected)])
+
+def bench_prediction(model, rounds, single):
+    mapping, _ = load_mapping('token_note_mapping.pkl')
+    keywords = [word for word in model.index_to_key if word not in mapping]
+    print("prediction: %d mapped tokens, %d unmapped vocabulary words resolved by similarity"
+          % (len(mapping.get_tokens()), len(keywords)))
+    print('%-9s %12s %14s %18s %16s %14s' % ('precision', 'token matrix', 'batch', 'single keyword', 'same token', 'same note'))
+    expected = None
+    for precision in PRECISIONS:
+        index = TokenIndex(mapping.get_tokens(), model, precision=precision)
+        batch_seconds, tokens = best_seconds(lambda: index.nearest_batch(keywords), rounds)
+        single_seconds, _ = best_seconds(lambda: [index.nearest(keyword) for keyword in keywords[:single]], rounds)
+        notes = [mapping.get_note_for_token(token) if token is not None else None for token in tokens]
+        if expected is None:
+            expected = (tokens, notes)
+        print('%-9s %9.0f KB %11.1f ms %15.1f us %15.2f%% %13.2f%%'
+              % (precision, index.matrix.nbytes / KB, batch_seconds * 1e3, single_seconds / single * 1e6,
+                 agreement(tokens, expected[0]) * 100, agreement(notes, expected[1]) * 100))
+
+def bench_training(model, ner):
+    descriptions, notes = otm.load_training_set('training_set.csv')
+    training_notes = [note.lower() for row_notes in notes for note in row_notes]
+    print("training: %d rows, %d distinct notes" % (len(descriptions) - 1, len(set(training_notes))))
+    print('%-9s %12s %14s %14s %16s' % ('precision', 'note matrix', 'score_rows', 'training', 'same mapping'))
+    expected = None
+    for precision in PRECISIONS:
+        note_bytes = WordMatrix(training_notes, model, precision).matrix.nbytes
+        with tempfile.TemporaryDirectory() as directory:
+            instrumentation.enable()
+            try:
+                start = time.perf_counter()
+                mapping = otm.generate_mappings(0.8, 'training_set.csv', os.path.join(directory, 'mapping.pkl'), n_process=1,
+                                                incremental=False, ner=ner, precision=precision)
+                seconds = time.perf_counter() - start
+                score_milliseconds = instrumentation.last_report()['stages']['score_rows']
+            finally:
+                instrumentation.disable()
+        mappings = {token: (mapping.get_note_for_token(token), mapping.get_volatility(token)) for token in mapping.get_tokens()}
+        if expected is None:
+            expected = mappings
+        same = sum(mappings.get(token) == result for token, result in expected.items())
+        print('%-9s %9.0f KB %11.0f ms %12.1f s %9d of %d' % (precision, note_bytes / KB, score_milliseconds, seconds,
+                                                             same, len(expected)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=3, help='runs per precision, the fastest is reported')
+    parser.add_argument('--single', type=int, default=500, help='keywords resolved one at a time')
+    parser.add_argument('--ner', choices=['auto', 'spacy', 'stand-in'], default='auto', help='keyword extractor for training')
+    parser.add_argument('--skip-training', action='store_true', help='only compare the prediction token matrix')
+    args = parser.parse_args()
+
+    model = synthetic_model()
+    embeddings.set_model(model)
+    bench_prediction(model, args.rounds, args.single)
+    if not args.skip_training:
+        ner, ner_name = keyword_extractor(args.ner)
+        print("(%s keywords)" % ner_name)
+        bench_training(model, ner)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Compare cold and warm recommendation latency. A cold request loads the mapping,
+the note categories and the spaCy pipeline before predicting, which is what every
+predict_notes call used to do; a warm request reuses a loaded Recommender.
+Run from the repository root:
+
+    python -m benchmarks.bench_recommender [--requests N]
+"""
+import argparse
+import statistics
+import time
+from embeddings import get_model
+from recommender import Recommender
+
+EXAMPLE_INPUT = ("It is a happy Christmas dinner. I can hear people having pleasant conversation. "
+                 "The dinning room is warm and I can smell a sweet pie topped with walnuts.")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--text', default=EXAMPLE_INPUT)
+    args = parser.parse_args()
+
+    # Load the embeddings before anything is timed
+    get_model()
+    cold = []
+    for _ in range(3):
+        start = time.perf_counter()
+        Recommender(get_model()).predict(args.text, 3)
+        cold.append(time.perf_counter() - start)
+
+    recommender = Recommender(get_model())
+    warm = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        recommender.predict(args.text, 3)
+        warm.append(time.perf_counter() - start)
+
+    print("Cold request: median %.1f ms" % (statistics.median(cold) * 1000))
+    print("Warm request: median %.1f ms over %d requests" % (statistics.median(warm) * 1000, len(warm)))
+    print("Speedup:      %.1fx" % (statistics.median(cold) / statistics.median(warm)))
+
+if __name__ == '__main__':
+    main()
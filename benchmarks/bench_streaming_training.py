@@ -0,0 +1,86 @@
+"""
+Measure training time and peak memory on synthetically enlarged training sets.
+
+Every synthetic row is a row of the shipped training set with a unique suffix, so all
+rows have distinct fingerprints and are extracted and scored. Each size is trained in
+a fresh process and its peak resident memory is reported next to the peak memory of
+reading the same file whole with pd.read_csv, as training did before it streamed.
+Run from the repository root:
+
+    python -m benchmarks.bench_streaming_training [--rows 10000 100000 1000000] [--stand-in]
+
+--stand-in replaces spaCy and the word embeddings with the offline stand-ins of
+benchmarks/synthetic.py.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import pandas as pd
+
+def write_synthetic_training_set(path, rows):
+    # Repeat the shipped rows with a unique suffix until the file holds the requested number of rows
+    data = pd.read_csv('training_set.csv', encoding='latin-1', on_bad_lines='skip')
+    with open(path, 'w', encoding='latin-1', errors='replace', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Description', 'Notes'])
+        for number in range(rows):
+            description, notes = data.iloc[number % len(data)]
+            writer.writerow(['%s Edition %d.' % (description, number), notes])
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def train(training_file, stand_in, chunk_size, results):
+    import embeddings
+    from main import generate_mappings
+    ner = None
+    if stand_in:
+        from benchmarks.synthetic import WordSplitter, synthetic_model
+        embeddings.set_model(synthetic_model())
+        ner = WordSplitter()
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    mapping = generate_mappings(0.8, training_file, os.path.join(os.path.dirname(training_file), 'mapping.pkl'),
+                                incremental=False, ner=ner, chunk_size=chunk_size)
+    results.put((time.perf_counter() - start, baseline, peak_rss_mb(), len(mapping)))
+
+def read_whole(training_file, results):
+    baseline = peak_rss_mb()
+    data = pd.read_csv(training_file, encoding='latin-1', on_bad_lines='skip')
+    descriptions, notes = data['Description'].tolist(), data['Notes'].tolist()
+    results.put((baseline, peak_rss_mb(), len(descriptions) + len(notes)))
+
+def in_fresh_process(target, *args):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=target, args=args + (results,))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000], help='synthetic training set sizes')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='training rows processed together')
+    parser.add_argument('--stand-in', action='store_true', help='use the offline stand-ins for spaCy and the embeddings')
+    args = parser.parse_args()
+
+    print('%10s %10s %12s %12s %16s %16s' % ('rows', 'file', 'train time', 'rows/sec', 'train peak RSS', 'whole-read RSS'))
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as directory:
+            training_file = os.path.join(directory, 'training_set.csv')
+            write_synthetic_training_set(training_file, rows)
+            size = os.path.getsize(training_file) / 2 ** 20
+            seconds, baseline, peak, _ = in_fresh_process(train, training_file, args.stand_in, args.chunk_size)
+            read_baseline, read_peak, _ = in_fresh_process(read_whole, training_file)
+        print('%10d %7.0f MB %10.1f s %12.0f %+13.0f MB %+13.0f MB' % (rows, size, seconds, rows / seconds,
+                                                                    peak - baseline, read_peak - read_baseline))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Measure per-worker memory and total throughput of the pre-forked worker pool.
+
+Two modes are timed at every worker count on the same stream of memory descriptions:
+
+    shared    workers.WorkerPool: the parent loads the recommender once, shares its
+              arrays and forks the workers
+    private   every worker is a fresh process that loads its own recommender, as
+              batch.py --workers does
+
+Per worker, RSS counts every resident page including shared ones. PSS charges each
+shared page to its sharers in equal parts, and private counts pages only that worker
+holds. The total is the PSS of the workers plus, in shared mode, the parent that holds
+the loaded models. The embeddings are the synthetic model of benchmarks/synthetic.py,
+padded with filler words to --vocabulary words so the vectors dominate memory like a
+real model does. Run from the repository root (Linux only, memory is read from /proc):
+
+    python -m benchmarks.bench_workers [--workers 1 4 8] [--vocabulary 200000] [--requests 400]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+import numpy as np
+import embeddings
+import main as otm
+import workers
+from benchmarks.synthetic import default_vocabulary, keyword_extractor, synthetic_model
+from recommender import Recommender
+from workers import WorkerPool, memory_usage
+
+MB = 2 ** 20
+
+def vocabulary(size):
+    words = default_vocabulary()
+    return words + ['filler%d' % number for number in range(max(0, size - len(words)))]
+
+def load_recommender(words, ner_kind):
+    model = synthetic_model(words)
+    embeddings.set_model(model)
+    return Recommender(model, mapping_file='token_note_mapping.pkl', ner=keyword_extractor(ner_kind)[0])
+
+def private_worker(words, ner_kind, jobs, results):
+    # Load a recommender of its own, then serve jobs like a pool worker
+    workers.worker_recommender = load_recommender(words, ner_kind)
+    results.put(('ready', os.getpid(), None))
+    workers.worker_loop(jobs, results)
+
+class PrivatePool():
+    "Class that starts worker processes which each load their own recommender"
+    def __init__(self, words, ner_kind, processes):
+        context = multiprocessing.get_context('spawn')
+        self.jobs = context.Queue()
+        self.results = context.Queue()
+        self.processes = [context.Process(target=private_worker, args=(words, ner_kind, self.jobs, self.results), daemon=True)
+                          for _ in range(processes)]
+        for process in self.processes:
+            process.start()
+        for _ in self.processes:
+            self.results.get()
+
+    def pids(self):
+        return [process.pid for process in self.processes]
+
+    def predict_all(self, texts, num_random_notes):
+        for job_id, text in enumerate(texts):
+            self.jobs.put((job_id, text, num_random_notes, job_id))
+        for _ in texts:
+            _, _, error = self.results.get()
+            if error is not None:
+                raise error
+
+    def close(self):
+        for _ in self.processes:
+            self.jobs.put(None)
+        for process in self.processes:
+            process.join()
+
+def predict_all(pool, texts, num_random_notes):
+    futures = [pool.submit(text, num_random_notes, job_id) for job_id, text in enumerate(texts)]
+    for future in futures:
+        future.result()
+
+def measure(pool, run, texts, parent_pid=None):
+    # Warm every worker's caches, then time the stream and read memory once it has been served
+    run(pool, texts[:len(pool.processes) * 4])
+    start = time.perf_counter()
+    run(pool, texts)
+    seconds = time.perf_counter() - start
+    usage = [memory_usage(pid) for pid in pool.pids()]
+    total = sum(worker['pss'] for worker in usage) + (memory_usage(parent_pid)['pss'] if parent_pid else 0)
+    return {key: np.mean([worker[key] for worker in usage]) for key in ('rss', 'pss', 'private')}, total, len(texts) / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8], help='worker counts to measure')
+    parser.add_argument('--vocabulary', type=int, default=200000, help='words in the synthetic embedding model')
+    parser.add_argument('--requests', type=int, default=400, help='descriptions predicted per measurement')
+    parser.add_argument('--ner', choices=['auto', 'spacy', 'stand-in'], default='auto', help='keyword extractor')
+    parser.add_argument('--modes', nargs='+', choices=['shared', 'private'], default=['shared', 'private'], help='modes to measure')
+    args = parser.parse_args()
+
+    words = vocabulary(args.vocabulary)
+    descriptions, _ = otm.load_training_set('training_set.csv')
+    texts = [str(description) for description in descriptions if otm.is_valid_input(str(description))]
+    texts = [texts[i % len(texts)] for i in range(args.requests)]
+    print("%d words x 300 dimensions, %.0f MB of float32 vectors, %d CPUs"
+          % (len(words), len(words) * 300 * 4 / MB, os.cpu_count()))
+
+    rows = []
+    if 'shared' in args.modes:
+        recommender = load_recommender(words, args.ner)
+        for processes in args.workers:
+            with WorkerPool(recommender, processes) as pool:
+                rows.append(('shared', processes) + measure(pool, lambda pool, texts: predict_all(pool, texts, 3), texts,
+                                                            os.getpid()))
+    if 'private' in args.modes:
+        for processes in args.workers:
+            pool = PrivatePool(words, args.ner, processes)
+            try:
+                rows.append(('private', processes) + measure(pool, lambda pool, texts: pool.predict_all(texts, 3), texts))
+            finally:
+                pool.close()
+
+    print('%-8s %8s %14s %14s %14s %12s %12s' % ('mode', 'workers', 'worker RSS', 'worker PSS', 'worker private',
+                                                 'total PSS', 'requests/s'))
+    for mode, processes, worker, total, throughput in rows:
+        print('%-8s %8d %11.0f MB %11.0f MB %11.0f MB %9.0f MB %12.1f' % (mode, processes, worker['rss'] / MB, worker['pss'] / MB,
+                                                                        worker['private'] / MB, total / MB, throughput))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Reproducible offline benchmark suite for the recommender.
+
+Every benchmark runs against the deterministic synthetic embedding model of
+benchmarks/synthetic.py, so no download is needed and runs on the same machine are
+comparable. Keyword extraction uses spaCy when en_core_web_sm is installed and the
+WordSplitter stand-in otherwise; the choice is recorded with the results. Run from the
+repository root:
+
+    python -m benchmarks.suite [--output results.json] [--compare baseline.json] [--threshold 0.2]
+
+Each benchmark is repeated --repeat times and reports the median and minimum seconds
+per operation. --compare reads an earlier results file and exits with status 1 when a
+benchmark's fastest run got slower by more than --threshold (0.1 is 10%); the fastest
+run is the one least disturbed by other load on the machine.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import embeddings
+import main as otm
+from artifact import load_mapping
+from benchmarks.synthetic import keyword_extractor, synthetic_model
+from recommender import Recommender
+
+EXAMPLE_INPUT = ("It is a happy Christmas dinner. I can hear people having pleasant conversation. "
+                 "The dinning room is warm and I can smell a sweet pie topped with walnuts.")
+
+def measure(function, operations, repeat, min_seconds=0.2):
+    """
+        Time a function that performs a number of operations.
+
+        Fast functions are called several times per run, so every run lasts at least min_seconds
+        and timer resolution and short hiccups do not dominate. Garbage collection is paused while timing.
+
+        Args:
+            function (callable): Runs the operations once.
+            operations (int): Number of operations per call.
+            repeat (int): Number of runs.
+            min_seconds (float): Shortest duration of a run.
+
+        Returns:
+            dict: The median and minimum seconds per operation and the number of operations per run.
+    """
+    start = time.perf_counter()
+    function()
+    loops = max(1, math.ceil(min_seconds / max(time.perf_counter() - start, 1e-9)))
+    seconds = []
+    # Like timeit, keep garbage collection pauses out of the timings
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(loops):
+                function()
+            seconds.append((time.perf_counter() - start) / (operations * loops))
+    finally:
+        gc.enable()
+    return {'median_s': statistics.median(seconds), 'min_s': min(seconds), 'operations': operations * loops}
+
+def bench_extract_keywords(ner, descriptions, repeat):
+    return measure(lambda: [ner.extract_keywords(description) for description in descriptions], len(descriptions), repeat)
+
+def bench_calculate_similarity(pairs, repeat):
+    def run():
+        for word1, word2 in pairs:
+            otm.calculate_similarity(word1, word2)
+    return measure(run, len(pairs), repeat)
+
+def bench_mapping_lookups(mapping, tokens, repeat):
+    def run():
+        for token in tokens:
+            if token in mapping:
+                mapping.get_note_for_token(token)
+                mapping.get_volatility(token)
+    return measure(run, len(tokens), repeat)
+
+def bench_predict_notes(recommender, texts, repeat):
+    otm.recommender = recommender
+    def run():
+        # predict_notes prints every prediction
+        with contextlib.redirect_stdout(io.StringIO()):
+            for text in texts:
+                otm.predict_notes(text, 3)
+    return measure(run, len(texts), repeat)
+
+def bench_generate_mappings(ner, rows, repeat, directory):
+    training_file = os.path.join(directory, 'training_%d.csv' % rows)
+    # The first row is skipped by training, so rows + 1 rows give rows trained rows
+    pd.read_csv('training_set.csv', encoding='latin-1', on_bad_lines='skip')[:rows + 1].to_csv(training_file, index=False,
+                                                                                               encoding='latin-1')
+    pickle_file = os.path.join(directory, 'mapping_%d.pkl' % rows)
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            otm.generate_mappings(0.8, training_file, pickle_file, n_process=1, incremental=False, ner=ner)
+    return measure(run, rows, repeat)
+
+def run_suite(ner_kind='auto', repeat=7, training_rows=(200, 1000), seed=0):
+    """
+        Run every benchmark.
+
+        Args:
+            ner_kind (str): The keyword extractor, see synthetic.keyword_extractor().
+            repeat (int): Runs per benchmark.
+            training_rows (tuple): Training set subsets generate_mappings is timed on.
+            seed (int): Seed choosing the benchmark inputs.
+
+        Returns:
+            dict: The environment under 'metadata' and the measurements per benchmark under 'results'.
+    """
+    rng = np.random.default_rng(seed)
+    model = synthetic_model()
+    embeddings.set_model(model)
+    ner, ner_name = keyword_extractor(ner_kind)
+    mapping = load_mapping('token_note_mapping.pkl')[0]
+    descriptions, _ = otm.load_training_set('training_set.csv')
+    descriptions = [str(description) for description in descriptions]
+    words = list(model.key_to_index)
+    pairs = [(words[i], words[j]) for i, j in rng.integers(len(words), size=(2000, 2))]
+    lookups = [words[i] for i in rng.integers(len(words), size=20000)]
+    texts = [EXAMPLE_INPUT] + [descriptions[i] for i in rng.choice(len(descriptions), 19, replace=False)]
+
+    results = {}
+    results['ner.extract_keywords'] = bench_extract_keywords(ner, texts, repeat)
+    results['calculate_similarity'] = bench_calculate_similarity(pairs, repeat)
+    results['mapping.lookups'] = bench_mapping_lookups(mapping, lookups, repeat)
+    results['predict_notes.uncached'] = bench_predict_notes(Recommender(model, ner=ner, cache_size=0), texts, repeat)
+    results['predict_notes.cached'] = bench_predict_notes(Recommender(model, ner=ner), texts, repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in training_rows:
+            results['generate_mappings.%d_rows' % rows] = bench_generate_mappings(ner, rows, max(1, repeat // 2), directory)
+
+    metadata = {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                'processor': platform.processor(), 'ner': ner_name, 'model_words': len(words),
+                'model_size': model.vector_size, 'repeat': repeat, 'seed': seed,
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    return {'metadata': metadata, 'results': results}
+
+def compare(current, baseline, threshold):
+    """
+        Compare two suite results.
+
+        Args:
+            current (dict): The results of this run.
+            baseline (dict): Earlier results.
+            threshold (float): Relative slowdown of the fastest run above which a benchmark regressed.
+
+        Returns:
+            list: The names of the benchmarks that regressed.
+    """
+    regressions = []
+    for key in ('ner', 'model_words', 'model_size'):
+        if current['metadata'].get(key) != baseline['metadata'].get(key):
+            print("warning: %s differs from the baseline (%s vs %s)" % (key, current['metadata'].get(key),
+                                                                        baseline['metadata'].get(key)))
+    print('%-34s %14s %14s %9s' % ('benchmark', 'baseline', 'current', 'change'))
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            print('%-34s %14s %11.2f us %9s' % (name, '-', result['min_s'] * 1e6, 'new'))
+            continue
+        before = baseline['results'][name]['min_s']
+        change = result['min_s'] / before - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print('%-34s %11.2f us %11.2f us %+8.1f%%%s' % (name, before * 1e6, result['min_s'] * 1e6, change * 100,
+                                                       '  REGRESSION' if regressed else ''))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=None, help='JSON file the results are written to, printed if omitted')
+    parser.add_argument('--compare', metavar='BASELINE', default=None, help='results file of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown reported as a regression')
+    parser.add_argument('--repeat', type=int, default=7, help='runs per benchmark')
+    parser.add_argument('--training-rows', type=int, nargs='+', default=[200, 1000], help='training subsets to time')
+    parser.add_argument('--ner', choices=['auto', 'spacy', 'stand-in'], default='auto', help='keyword extractor')
+    parser.add_argument('--seed', type=int, default=0, help='seed choosing the benchmark inputs')
+    args = parser.parse_args()
+
+    results = run_suite(args.ner, args.repeat, tuple(args.training_rows), args.seed)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    elif args.compare is None:
+        print(json.dumps(results, indent=2))
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("%d benchmark(s) regressed by more than %.0f%%: %s" % (len(regressions), args.threshold * 100,
+                                                                       ', '.join(regressions)))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Deterministic offline stand-ins for the word embeddings and the spaCy keyword extractor.
+
+synthetic_model() derives every word's vector from a hash of the word alone, so a word
+gets the same vector on every machine and whatever else is in the vocabulary. Words
+sharing their first four letters get similar vectors, so similarity searches find
+plausible neighbours instead of noise. WordSplitter uses every lower-case word of a
+description as a keyword, for machines without en_core_web_sm.
+"""
+import re
+import zlib
+import numpy as np
+import pandas as pd
+from gensim.models import KeyedVectors
+from artifact import load_mapping
+from main import CATEGORIES
+
+WORD = re.compile(r'[a-z]+')
+
+class WordSplitter():
+    "Class that stands in for Ner by using every lower-case word of a description as a keyword"
+    def extract_keywords(self, description):
+        return list(dict.fromkeys(WORD.findall(str(description).lower())))
+
+    def extract_keywords_batch(self, descriptions, batch_size=64, n_process=1):
+        return [self.extract_keywords(description) for description in descriptions]
+
+def keyword_extractor(kind='auto'):
+    """
+        Returns a keyword extractor and its name.
+
+        Args:
+            kind (str): 'spacy' for Ner, 'stand-in' for WordSplitter, 'auto' for Ner when en_core_web_sm is installed.
+
+        Returns:
+            tuple: The extractor and 'spacy' or 'stand-in'.
+    """
+    if kind != 'stand-in':
+        try:
+            from ner import Ner
+            return Ner(), 'spacy'
+        except OSError:
+            if kind == 'spacy':
+                raise
+    return WordSplitter(), 'stand-in'
+
+def default_vocabulary(training_file='training_set.csv', note_categories_file='note_categories.csv',
+                       mapping_file='token_note_mapping.pkl'):
+    """
+        Returns every lower-case word of the training set, the note names, the categories and the mapped tokens.
+    """
+    texts = []
+    data = pd.read_csv(training_file, encoding='latin-1', on_bad_lines='skip')
+    texts.extend(data['Description'])
+    texts.extend(data['Notes'])
+    texts.extend(pd.read_csv(note_categories_file, encoding='latin-1', sep=';', on_bad_lines='skip')['Note Name'])
+    texts.extend(CATEGORIES)
+    words = {word for text in texts for word in WORD.findall(str(text).lower())}
+    words.update(load_mapping(mapping_file)[0].get_tokens())
+    return sorted(words)
+
+def hashed_vector(text, size):
+    # The generator is seeded from the text only, so the vector never depends on other words
+    return np.random.default_rng(zlib.crc32(text.encode('utf-8'))).standard_normal(size)
+
+def synthetic_model(words=None, size=300):
+    """
+        Build a KeyedVectors model with hash-derived vectors.
+
+        Args:
+            words (list): The vocabulary, default_vocabulary() if None.
+            size (int): The vector size.
+
+        Returns:
+            KeyedVectors: The model.
+    """
+    if words is None:
+        words = default_vocabulary()
+    prefixes = {}
+    vectors = np.empty((len(words), size), dtype=np.float32)
+    for row, word in enumerate(words):
+        prefix = word[:4]
+        if prefix not in prefixes:
+            prefixes[prefix] = hashed_vector('prefix:' + prefix, size)
+        vectors[row] = prefixes[prefix] + 0.8 * hashed_vector(word, size)
+    model = KeyedVectors(size)
+    model.add_vectors(list(words), vectors)
+    return model
@@ -0,0 +1,78 @@
+"""
+Export a compact embedding file holding only the vocabulary the recommender can touch:
+the mapped tokens, the note names of note_categories.csv and training_set.csv, the note
+categories and the top-N most frequent lower-case words of the full model for user keywords.
+
+    python build_embeddings.py domain_embeddings.kv [--top-n 50000] [--float16]
+
+Point the application at the result with OTM_EMBEDDINGS=domain_embeddings.kv.
+"""
+import argparse
+import pickle
+import numpy as np
+import pandas as pd
+from embeddings import get_model
+from main import CATEGORIES, load_training_set
+
+def domain_vocabulary(model, top_n, mapping_file='token_note_mapping.pkl', note_categories_file='note_categories.csv',
+                      training_file='training_set.csv'):
+    """
+        Collect every word training and prediction can look up in the embedding model.
+
+        Args:
+            model (KeyedVectors): The full word embedding model.
+            top_n (int): Number of frequent lower-case words to keep for user keywords.
+            mapping_file (str): The path to the token-note mapping pickle.
+            note_categories_file (str): The path to the note category CSV.
+            training_file (str): The path to the training CSV.
+
+        Returns:
+            list: The words of the vocabulary that the model knows, without duplicates.
+    """
+    with open(mapping_file, 'rb') as f:
+        mapping = pickle.load(f)
+    note_class_data = pd.read_csv(note_categories_file, encoding='latin-1', sep=';', on_bad_lines='warn')
+    _, fragrance_notes = load_training_set(training_file)
+
+    words = dict.fromkeys(mapping.get_tokens())
+    words.update(dict.fromkeys(str(note).lower() for note in note_class_data['Note Name']))
+    words.update(dict.fromkeys(note.lower() for notes in fragrance_notes for note in notes))
+    words.update(dict.fromkeys(category.lower() for category in CATEGORIES))
+
+    # GoogleNews keys are sorted by frequency, keywords are always lower case
+    frequent = 0
+    for word in model.index_to_key:
+        if frequent >= top_n:
+            break
+        if word.isalpha() and word.islower():
+            words[word] = None
+            frequent += 1
+    return [word for word in words if word in model.key_to_index]
+
+def export_subset(model, words, destination, float16=False):
+    """
+        Save the embeddings of the given words as a memory-mappable KeyedVectors file.
+
+        Args:
+            model (KeyedVectors): The full word embedding model.
+            words (list): Words of the model's vocabulary to keep.
+            destination (str): The path of the KeyedVectors file to write.
+            float16 (bool): Store the vectors as float16 instead of float32.
+    """
+    from gensim.models import KeyedVectors
+    subset = KeyedVectors(model.vector_size, dtype=np.float16 if float16 else np.float32)
+    subset.add_vectors(words, model.vectors[[model.key_to_index[word] for word in words]])
+    # sep_limit=0 always writes the vectors to their own .npy file so they can be memory-mapped
+    subset.save(destination, sep_limit=0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("destination", help="path of the KeyedVectors file to write")
+    parser.add_argument("--top-n", type=int, default=50000, help="frequent lower-case words kept for user keywords")
+    parser.add_argument("--float16", action="store_true", help="store the vectors as float16")
+    args = parser.parse_args()
+
+    model = get_model()
+    words = domain_vocabulary(model, args.top_n)
+    export_subset(model, words, args.destination, args.float16)
+    print("Exported %d of %d words to %s" % (len(words), len(model.key_to_index), args.destination))
@@ -0,0 +1,139 @@
+import os
+import pickle
+from collections import OrderedDict
+
+def file_fingerprint(path):
+    """
+        Returns a cheap fingerprint that changes whenever the file is rewritten.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            tuple: The file size and modification time in nanoseconds, or None if the file is missing.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+class LRUCache():
+    "Class that keeps the most recently used entries up to a fixed size and counts hits, misses and evictions"
+    def __init__(self, max_size, fingerprint=None):
+        """
+        Initialises the LRUCache object.
+
+        Args:
+            max_size (int): The maximum number of entries, 0 disables caching.
+            fingerprint: Identifies what the entries were computed from, e.g. a file_fingerprint().
+        """
+        self.max_size = max_size
+        self.fingerprint = fingerprint
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for the key and marks it as recently used.
+
+        Args:
+            key: The cache key.
+            default: The value returned on a miss.
+
+        Returns:
+            The cached value, or default if the key is not cached.
+        """
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """
+        Caches a value, evicting the least recently used entry when full.
+
+        Args:
+            key: The cache key.
+            value: The value to cache.
+        """
+        if self.max_size <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def validate(self, fingerprint):
+        """
+        Clears the cache if it was computed from something else than the given fingerprint.
+
+        Args:
+            fingerprint: The fingerprint of the current source.
+
+        Returns:
+            bool: True if the entries were kept, False if they were cleared.
+        """
+        if fingerprint == self.fingerprint:
+            return True
+        self.entries.clear()
+        self.fingerprint = fingerprint
+        return False
+
+    def clear(self):
+        """
+        Removes every entry, keeping the counters.
+        """
+        self.entries.clear()
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: Hits, misses, evictions, current size, maximum size and hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self.entries),
+                'max_size': self.max_size, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def save(self, path):
+        """
+        Saves the entries and their fingerprint to a pickle file.
+
+        Args:
+            path (str): The path of the pickle file.
+        """
+        with open(path, 'wb') as f:
+            pickle.dump({'fingerprint': self.fingerprint, 'entries': list(self.entries.items())}, f)
+
+    def load(self, path):
+        """
+        Loads entries saved with save() if they were computed from the current fingerprint.
+
+        Args:
+            path (str): The path of the pickle file.
+
+        Returns:
+            bool: True if entries were loaded.
+        """
+        if not os.path.exists(path):
+            return False
+        with open(path, 'rb') as f:
+            saved = pickle.load(f)
+        if saved['fingerprint'] != self.fingerprint:
+            return False
+        for key, value in saved['entries'][-self.max_size:] if self.max_size > 0 else []:
+            self.entries[key] = value
+        return True
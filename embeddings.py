@@ -0,0 +1,127 @@
+"""
+Lazily loaded word embeddings shared by training and prediction.
+
+The model is only loaded on the first get_model() call. It is served from a
+gensim KeyedVectors file opened with mmap='r', so processes loading the same
+file share its pages instead of each holding their own copy of the vectors.
+
+The file is chosen in this order:
+    1. the path given to set_model_path(),
+    2. the OTM_EMBEDDINGS environment variable,
+    3. a converted copy of word2vec-google-news-300 in the gensim data directory,
+       which is downloaded and converted on first use.
+
+Tests and benchmarks can skip loading entirely by injecting a model with set_model().
+"""
+import argparse
+import hashlib
+import os
+import numpy as np
+
+DEFAULT_MODEL_NAME = "word2vec-google-news-300"
+MODEL_PATH_ENV = "OTM_EMBEDDINGS"
+
+model = None
+model_path = None
+
+def default_model_path():
+    """
+        Return where the converted default model is kept.
+
+        Returns:
+            str: The path of the memory-mappable copy of the default model.
+    """
+    import gensim.downloader as api
+    return os.path.join(api.BASE_DIR, DEFAULT_MODEL_NAME, DEFAULT_MODEL_NAME + ".kv")
+
+def set_model_path(path):
+    """
+        Configure the embedding file to load and drop any model already loaded.
+
+        Args:
+            path (str): The path to a KeyedVectors file saved with KeyedVectors.save().
+    """
+    global model, model_path
+    model_path = path
+    model = None
+
+def set_model(embedding_model):
+    """
+        Use the given model instead of loading one from disk.
+
+        Args:
+            embedding_model (KeyedVectors): The word embedding model, e.g. a small stand-in for tests.
+    """
+    global model
+    model = embedding_model
+
+def model_fingerprint(embedding_model, sample_rows=16):
+    """
+        Returns a fingerprint of an embedding model, stored to detect data computed with another model.
+        Besides the shape it hashes the words and vectors of a few evenly spaced rows, so two models of
+        the same size do not share a fingerprint; reading them costs next to nothing for a memory-mapped model.
+
+        Args:
+            embedding_model (KeyedVectors): The word embedding model.
+            sample_rows (int): Number of rows hashed.
+
+        Returns:
+            str: The vocabulary size, vector size, vector dtype and the hash of the sampled rows.
+    """
+    size = len(embedding_model.index_to_key)
+    rows = np.unique(np.linspace(0, size - 1, num=min(size, sample_rows)).astype(np.int64))
+    digest = hashlib.sha1()
+    digest.update('\x00'.join(embedding_model.index_to_key[row] for row in rows).encode('utf-8'))
+    digest.update(np.ascontiguousarray(embedding_model.vectors[rows]).tobytes())
+    return '%d:%d:%s:%s' % (size, embedding_model.vector_size, embedding_model.vectors.dtype, digest.hexdigest()[:16])
+
+def get_model():
+    """
+        Return the shared embedding model, loading it on first use.
+
+        Returns:
+            KeyedVectors: The word embedding model.
+    """
+    global model
+    if model is None:
+        model = load_model(model_path or os.environ.get(MODEL_PATH_ENV))
+    return model
+
+def load_model(path=None):
+    """
+        Load a KeyedVectors file memory-mapped, converting the default model first if needed.
+
+        Args:
+            path (str): The path to a KeyedVectors file, or None for the default model.
+
+        Returns:
+            KeyedVectors: The memory-mapped word embedding model.
+    """
+    from gensim.models import KeyedVectors
+    if path is None:
+        path = default_model_path()
+        if not os.path.exists(path):
+            convert_model(path)
+    print("Loading the pre-trained model...")
+    return KeyedVectors.load(path, mmap='r')
+
+def convert_model(destination, name=DEFAULT_MODEL_NAME):
+    """
+        Download a gensim-data model and save it in the memory-mappable KeyedVectors format.
+
+        Args:
+            destination (str): The path of the KeyedVectors file to write.
+            name (str): The gensim-data model name.
+    """
+    import gensim.downloader as api
+    print("Converting %s to a memory-mapped model, this only happens once..." % name)
+    downloaded = api.load(name)
+    os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+    downloaded.save(destination)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a gensim-data model to a memory-mappable KeyedVectors file.")
+    parser.add_argument("destination", nargs="?", default=None, help="output path, defaults to the gensim data directory")
+    parser.add_argument("--name", default=DEFAULT_MODEL_NAME, help="gensim-data model name")
+    args = parser.parse_args()
+    convert_model(args.destination or default_model_path(), args.name)
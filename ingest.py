@@ -0,0 +1,187 @@
+"""
+Streaming ingestion of the training set.
+
+The training CSV is read in chunks of rows whose notes are parsed as each chunk is
+read, so training never holds the whole file. staged() runs one step of the training
+flow in a background thread and hands its results on through a bounded queue, which
+lets reading, keyword extraction and scoring overlap while only a few chunks are in
+memory at once. RowCache keeps the keywords and mappings of every training row in
+an SQLite file, so they can be looked up by row fingerprint without loading them all.
+"""
+import json
+import queue
+import sqlite3
+import threading
+import pandas as pd
+
+def parse_notes(notes):
+    """
+        Split the Notes field of a training row into its stripped notes.
+
+        Args:
+            notes (str): The comma-separated notes, or NaN when the field is empty.
+
+        Returns:
+            list: The notes.
+    """
+    if not isinstance(notes, str):
+        return []
+    return [note.strip() for note in notes.split(',')]
+
+def iter_training_chunks(training_file, chunk_size=10000, skip_rows=0):
+    """
+        Stream the training CSV as lists of (description, notes) rows.
+
+        Args:
+            training_file (str): The path to the training CSV.
+            chunk_size (int): Number of rows read at once.
+            skip_rows (int): Number of leading data rows to leave out.
+
+        Yields:
+            list: Up to chunk_size (description, notes) tuples, in file order.
+    """
+    with pd.read_csv(training_file, encoding='latin-1', on_bad_lines='warn', chunksize=chunk_size) as reader:
+        for data in reader:
+            rows = [(description, parse_notes(notes)) for description, notes in zip(data['Description'], data['Notes'])]
+            if skip_rows:
+                skipped = min(skip_rows, len(rows))
+                rows = rows[skipped:]
+                skip_rows -= skipped
+            if rows:
+                yield rows
+
+# Marks the end of a stage's results in its queue
+DONE = object()
+
+class StageError():
+    "Class that carries an exception raised in a stage's thread to the thread reading its results"
+    def __init__(self, error):
+        self.error = error
+
+def staged(items, function, max_pending=1):
+    """
+        Apply a function to every item in a background thread, yielding the results in order.
+
+        The thread stops working ahead once max_pending results wait to be read, which bounds
+        the memory a stage can hold. Exceptions raised in the thread are raised by the generator.
+        The function runs while other threads do, so it must not fork processes, e.g. with
+        nlp.pipe(n_process=...); a pool of spawned processes such as ner.NerPool is safe.
+
+        Args:
+            items (iterable): The inputs, consumed in the background thread.
+            function (callable): Called with every item.
+            max_pending (int): Number of results that may wait in the queue.
+
+        Yields:
+            The result of function for every item.
+    """
+    results = queue.Queue(max_pending)
+    stopped = threading.Event()
+
+    def put(result):
+        # Give up once the reader has stopped, so the thread never blocks forever
+        while not stopped.is_set():
+            try:
+                results.put(result, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def work():
+        try:
+            for item in items:
+                if not put(function(item)):
+                    return
+            put(DONE)
+        except BaseException as error:
+            put(StageError(error))
+
+    thread = threading.Thread(target=work, daemon=True)
+    thread.start()
+    try:
+        while True:
+            result = results.get()
+            if result is DONE:
+                break
+            if isinstance(result, StageError):
+                raise result.error
+            yield result
+    finally:
+        stopped.set()
+
+class RowCache():
+    "Class that stores the keywords and mappings of training rows by row fingerprint in an SQLite file"
+    def __init__(self, path):
+        """
+        Initialises the RowCache object, creating the file if it does not exist.
+
+        Args:
+            path (str): The path of the SQLite file.
+        """
+        self.path = path
+        # Rows are looked up from a pipeline thread, but every connection is only used by one thread at a time
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS rows (fingerprint TEXT PRIMARY KEY, keywords TEXT, mappings TEXT)')
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+
+    def get_scoring(self):
+        """
+        Returns the scoring settings the stored mappings were computed with.
+
+        Returns:
+            list: The settings stored with set_scoring(), or None.
+        """
+        row = self.connection.execute("SELECT value FROM settings WHERE name = 'scoring'").fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set_scoring(self, scoring):
+        """
+        Stores the scoring settings the mappings are computed with.
+
+        Args:
+            scoring (list): JSON-serialisable settings, e.g. the threshold and a model fingerprint.
+        """
+        self.connection.execute("INSERT OR REPLACE INTO settings VALUES ('scoring', ?)", (json.dumps(scoring),))
+
+    def get_many(self, fingerprints):
+        """
+        Looks up the stored rows with the given fingerprints.
+
+        Args:
+            fingerprints (list): The row fingerprints.
+
+        Returns:
+            dict: The keywords and mappings (None if not scored) of every stored fingerprint.
+        """
+        found = {}
+        fingerprints = list(dict.fromkeys(fingerprints))
+        # Stay below SQLite's limit on query parameters
+        for start in range(0, len(fingerprints), 500):
+            batch = fingerprints[start:start + 500]
+            query = 'SELECT fingerprint, keywords, mappings FROM rows WHERE fingerprint IN (%s)' % ','.join('?' * len(batch))
+            for fingerprint, keywords, mappings in self.connection.execute(query, batch):
+                found[fingerprint] = (json.loads(keywords), None if mappings is None else
+                                      [tuple(mapping) for mapping in json.loads(mappings)])
+        return found
+
+    def put_many(self, entries):
+        """
+        Stores rows, replacing rows with the same fingerprint.
+
+        Args:
+            entries (iterable): (fingerprint, keywords, mappings) tuples.
+        """
+        self.connection.executemany('INSERT OR REPLACE INTO rows VALUES (?, ?, ?)',
+                                    ((fingerprint, json.dumps(keywords), None if mappings is None else json.dumps(mappings))
+                                     for fingerprint, keywords, mappings in entries))
+
+    def close(self):
+        """
+        Commits the stored rows and closes the file.
+        """
+        self.connection.commit()
+        self.connection.close()
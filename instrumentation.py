@@ -0,0 +1,358 @@
+"""
+Opt-in per-stage timings and counters for predictions and training.
+
+Instrumentation is off until enable() is called. Code marks its stages and counts events:
+
+    with instrumentation.call('predict_notes') as report:
+        with instrumentation.stage('extract_keywords'):
+            keywords = ner.extract_keywords(text)
+        instrumentation.count('keywords', len(keywords))
+
+Each call produces a Report of its stage timings and counters; the last reports are kept,
+and every stage and call also feeds a latency histogram. Stages timed outside a call,
+e.g. loading the mapping, only feed the histograms. With a profile file, calls also run
+under cProfile and disable() writes the stats for pstats or snakeviz.
+
+When instrumentation is off, stage() returns one shared no-op context manager and
+count() returns at once, so the instrumented code pays a function call per stage.
+"""
+import cProfile
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds of the latency histogram buckets in milliseconds, the last bucket is unbounded
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# The active Instruments, None while instrumentation is off
+instruments = None
+NO_STAGE = nullcontext()
+# The report of the call running in each thread
+local = threading.local()
+
+class Report():
+    "Class that collects the stage timings and counters of one instrumented call"
+    def __init__(self, name):
+        """
+        Initialises the Report object.
+
+        Args:
+            name (str): The name of the call, e.g. 'predict_notes'.
+        """
+        self.name = name
+        self.seconds = None
+        self.stages = {}
+        self.counters = {}
+        # Training stages run in pipeline threads that share the report
+        self.lock = threading.Lock()
+
+    def add_time(self, stage, seconds):
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_count(self, counter, n):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def as_dict(self):
+        """
+        Returns the report as JSON-serialisable data.
+
+        Returns:
+            dict: The call name, its total and per-stage times in milliseconds, and its counters.
+        """
+        with self.lock:
+            return {'name': self.name, 'total_ms': None if self.seconds is None else self.seconds * 1000,
+                    'stages': {stage: seconds * 1000 for stage, seconds in self.stages.items()},
+                    'counters': dict(self.counters)}
+
+class Histogram():
+    "Class that counts latencies in the BUCKETS_MS buckets"
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """
+        Counts one latency.
+
+        Args:
+            seconds (float): The latency in seconds.
+        """
+        milliseconds = seconds * 1000
+        bucket = 0
+        while bucket < len(BUCKETS_MS) and milliseconds > BUCKETS_MS[bucket]:
+            bucket += 1
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+
+    def as_dict(self):
+        """
+        Returns the histogram as JSON-serialisable data.
+
+        Returns:
+            dict: The number of latencies, their total, mean and maximum in milliseconds, and the
+                  count of every non-empty bucket keyed by its upper bound.
+        """
+        labels = ['<=%gms' % bound for bound in BUCKETS_MS] + ['>%gms' % BUCKETS_MS[-1]]
+        return {'count': self.count, 'total_ms': self.total, 'mean_ms': self.total / self.count if self.count else 0.0,
+                'max_ms': self.max, 'buckets': {label: n for label, n in zip(labels, self.buckets) if n}}
+
+class Instruments():
+    "Class that aggregates stage timings and counters into histograms and totals, optionally under cProfile"
+    def __init__(self, profile_file=None, keep_reports=100):
+        """
+        Initialises the Instruments object.
+
+        Args:
+            profile_file (str): File the cProfile stats of every call are written to by dump_profile(), None to not profile.
+            keep_reports (int): Number of most recent call reports kept.
+        """
+        self.histograms = {}
+        self.counters = {}
+        self.reports = deque(maxlen=keep_reports)
+        self.lock = threading.Lock()
+        self.profile_file = profile_file
+        self.profiler = cProfile.Profile() if profile_file is not None else None
+        # cProfile follows a single thread, so concurrent calls are profiled one at a time
+        self.profiler_lock = threading.Lock()
+
+    def record_time(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def record_count(self, name, n):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        """
+        Returns the aggregate histograms and counter totals.
+
+        Returns:
+            dict: A histogram per call and stage name under 'histograms', and the counter totals under 'counters'.
+        """
+        with self.lock:
+            return {'histograms': {name: histogram.as_dict() for name, histogram in self.histograms.items()},
+                    'counters': dict(self.counters)}
+
+    def dump_profile(self):
+        """
+        Writes the cProfile stats collected so far to the profile file.
+        """
+        if self.profiler is not None:
+            with self.profiler_lock:
+                self.profiler.dump_stats(self.profile_file)
+
+def enable(profile_file=None, keep_reports=100):
+    """
+        Turn instrumentation on with empty histograms.
+
+        Args:
+            profile_file (str): File the cProfile stats of every call are written to, None to not profile.
+            keep_reports (int): Number of most recent call reports kept.
+
+        Returns:
+            Instruments: The active instruments.
+    """
+    global instruments
+    instruments = Instruments(profile_file, keep_reports)
+    return instruments
+
+def disable():
+    """
+        Turn instrumentation off, writing the cProfile stats if a profile file was given.
+
+        Returns:
+            Instruments: The instruments that were active, or None.
+    """
+    global instruments
+    active, instruments = instruments, None
+    if active is not None:
+        active.dump_profile()
+    return active
+
+def is_enabled():
+    return instruments is not None
+
+def current_report():
+    """
+        Returns the report of the call running in this thread, or None.
+    """
+    return getattr(local, 'report', None)
+
+class Stage():
+    "Class that times one stage into the aggregate histograms and a call's report"
+    def __init__(self, name, report):
+        self.name = name
+        self.report = report
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        active = instruments
+        # Stages of a call get their own histograms, e.g. 'predict_notes.extract_keywords'
+        if active is not None:
+            active.record_time(self.name if self.report is None else '%s.%s' % (self.report.name, self.name), seconds)
+        if self.report is not None:
+            self.report.add_time(self.name, seconds)
+        return False
+
+def stage(name, report=None):
+    """
+        Time a stage of the running call.
+
+        Args:
+            name (str): The stage name, e.g. 'extract_keywords'.
+            report (Report): The report to add to, by default the call running in this thread;
+                             pass it explicitly from worker threads.
+
+        Returns:
+            A context manager timing its block, a shared no-op one when instrumentation is off.
+    """
+    if instruments is None:
+        return NO_STAGE
+    return Stage(name, report if report is not None else current_report())
+
+def count(name, n=1, report=None):
+    """
+        Add to a counter of the running call.
+
+        Args:
+            name (str): The counter name, e.g. 'oov_keywords'.
+            n (int): The amount to add.
+            report (Report): The report to add to, by default the call running in this thread.
+    """
+    active = instruments
+    if active is None:
+        return
+    active.record_count(name, n)
+    report = report if report is not None else current_report()
+    if report is not None:
+        report.add_count(name, n)
+
+@contextmanager
+def call(name):
+    """
+        Instrument a top-level call such as predict_notes or generate_mappings.
+
+        Calls nested in an instrumented call are timed as stages of the outer call.
+
+        Args:
+            name (str): The call name.
+
+        Yields:
+            Report: The report of this call, None when instrumentation is off.
+    """
+    active = instruments
+    if active is None:
+        yield None
+        return
+    outer = current_report()
+    if outer is not None:
+        with Stage(name, outer):
+            yield outer
+        return
+
+    report = local.report = Report(name)
+    profiling = active.profiler is not None and active.profiler_lock.acquire(blocking=False)
+    start = time.perf_counter()
+    if profiling:
+        active.profiler.enable()
+    try:
+        yield report
+    finally:
+        if profiling:
+            active.profiler.disable()
+            active.profiler_lock.release()
+        report.seconds = time.perf_counter() - start
+        local.report = None
+        active.record_time(name, report.seconds)
+        with active.lock:
+            active.reports.append(report)
+
+def instrumented(name):
+    """
+        Decorate a function so that every call to it is an instrumented call, see call().
+
+        Args:
+            name (str): The call name.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with call(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# Marks the end of an iterable in timed_items()
+DONE = object()
+
+def timed(name, items, report=None):
+    """
+        Time how long an iterable takes to produce its items as a stage, e.g. reading a file in chunks.
+
+        Args:
+            name (str): The stage name.
+            items (iterable): The iterable.
+            report (Report): The report to add to, by default the call running in the reading thread.
+
+        Returns:
+            iterable: The items, unchanged.
+    """
+    if instruments is None:
+        return items
+    return timed_items(name, iter(items), report)
+
+def timed_items(name, items, report):
+    while True:
+        with stage(name, report):
+            item = next(items, DONE)
+        if item is DONE:
+            return
+        yield item
+
+def last_report():
+    """
+        Returns the report of the most recent finished call as JSON-serialisable data, or None.
+    """
+    active = instruments
+    if active is None or not active.reports:
+        return None
+    return active.reports[-1].as_dict()
+
+def summary():
+    """
+        Returns the aggregate histograms and counter totals, see Instruments.summary(), or None when off.
+    """
+    return None if instruments is None else instruments.summary()
+
+def format_report(report):
+    """
+        Format a report from Report.as_dict() as readable lines.
+
+        Args:
+            report (dict): The report.
+
+        Returns:
+            str: The total time, the time of every stage and every counter.
+    """
+    lines = ['%s: %.1f ms' % (report['name'], report['total_ms'] or 0.0)]
+    for stage_name, milliseconds in sorted(report['stages'].items(), key=lambda item: -item[1]):
+        lines.append('  %-24s %10.2f ms' % (stage_name, milliseconds))
+    for counter, n in sorted(report['counters'].items()):
+        lines.append('  %-24s %10d' % (counter, n))
+    return '\n'.join(lines)
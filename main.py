@@ -1,16 +1,20 @@
 import pandas as pd
-import pickle
-import gensim.downloader as api
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+from artifact import save_artifact
+import instrumentation
+from embeddings import get_model, model_fingerprint
+from ingest import RowCache, iter_training_chunks, parse_notes, staged
 from mapping import Mapping
-from ner import Ner
-import PySimpleGUI as psg
-import time 
+from phrases import PhraseIndex, contains_phrase, phrase_tokens, word_forms
+from similarity import TokenIndex, WordMatrix, embedding_matrix, first_best, index_file_for
+import argparse
+import hashlib
+import json
+import os
 import re
 
-# Load pre-trained Word2Vec embeddings
-print("Loading the pre-trained model...")
-pretrained_model = api.load("word2vec-google-news-300")    
+# The pre-trained Word2Vec embeddings and the spaCy pipeline are loaded on first use,
+# so Ner and Recommender are imported inside the functions that need them
 
 def calculate_similarity(word1, word2):
     """
@@ -23,107 +27,336 @@ def calculate_similarity(word1, word2):
         Returns:
             float: The cosine similarity between the embeddings of the two words.
     """
+    pretrained_model = get_model()
+    instrumentation.count('similarity_calls')
     # Check if both words are present in the vocabulary
     if word1 in pretrained_model.key_to_index and word2 in pretrained_model.key_to_index:
-        # Get the word embeddings for the two words
-        embedding1 = pretrained_model[word1]
-        embedding2 = pretrained_model[word2]
-        # Calculate cosine similarity between the embeddings
-        similarity = cosine_similarity([embedding1],[embedding2])[0][0]
-        return similarity
+        # Calculate cosine similarity between the normalised embeddings of the two words
+        embedding1, embedding2 = embedding_matrix([word1, word2], pretrained_model)
+        similarity = embedding1 @ embedding2
     else:
-        return None
+        similarity = None
+    return similarity
 
-def generate_mappings(similarity_upper_threshold):
+# Memories may only be described with letters, spaces and dots
+INVALID_INPUT = re.compile(r'[^a-zA-Z\s.]')
+
+def is_valid_input(user_input):
     """
-        Generate mappings between keywords and fragrance notes.
+        Check that the user's input only contains letters, spaces and dots.
+
+        Args:
+            user_input (str): The user's input describing a memory related to a scent.
+
+        Returns:
+            bool: True if the input can be used for a prediction.
+    """
+    return INVALID_INPUT.search(user_input) is None
+
+# Note categories used by note_categories.csv, scored when no note of a fragrance fits a keyword
+CATEGORIES = ['CITRUS SMELLS', 'FRUITS, VEGETABLES AND NUTS', 'FLOWERS', 'WHITE FLOWERS', 'GREENS HERBS AND FOUGERES',
+              'SPICES', 'SWEETS AND GOURMAND SMELLS', 'WOODS AND MOSSES', 'RESINS AND BALSAMS', 'MUSK AMBER ANIMALIC SMELLS',
+              'BEVERAGES', 'NATURAL AND SYNTHETIC, POPULAR AND WEIRD']
+CATEGORY_INDEX = PhraseIndex(CATEGORIES)
+# Version of the rules keyword_mappings() applies; changing it makes training rescore every cached row
+MAPPING_RULES = 2
+
+def load_training_set(training_file):
+    """
+        Load fragrance descriptions and their lists of notes from the training CSV.
+
+        Args:
+            training_file (str): The path to the training CSV.
+
+        Returns:
+            tuple: The list of descriptions and the list of note lists.
+    """
+    data = pd.read_csv(training_file, encoding='latin-1', on_bad_lines='warn')
+    return data['Description'].tolist(), [parse_notes(notes) for notes in data['Notes']]
+
+def row_fingerprint(description, notes):
+    """
+        Hash a training row, so rows that were already mapped can be recognised on the next training run.
+
+        Args:
+            description (str): The fragrance description.
+            notes (list): The notes of the fragrance.
+
+        Returns:
+            str: The hex digest of the description and notes.
+    """
+    return hashlib.sha1(('%s\x00%s' % (description, ','.join(notes))).encode('utf-8')).hexdigest()
+
+def rows_file_for(pickle_file):
+    """
+        Returns the path of the per-row training cache stored next to a mapping pickle.
+    """
+    return os.path.splitext(pickle_file)[0] + '.rows.sqlite'
+
+def keyword_mappings(top_keywords, notes, note_matrix, category_matrix, similarity_upper_threshold, note_index=None):
+    """
+        Compute the mappings for the keywords of one fragrance description.
+
+        Args:
+            top_keywords (list): Keywords extracted from the description.
+            notes (list): Lower-case notes of the fragrance.
+            note_matrix (WordMatrix): Embeddings of the notes of the training set.
+            category_matrix (WordMatrix): Embeddings of the lower-case note categories.
+            similarity_upper_threshold (float): The threshold for similarity between keywords and notes.
+            note_index (PhraseIndex): Index of the notes of the training set, which holds their tokens;
+                                      built from notes if None.
+
+        Returns:
+            list: (token, note, volatility) tuples in the order they are added to the mapping.
+    """
+    if note_index is None:
+        note_index = PhraseIndex(notes)
+    mappings = []
+    # Score every keyword against every note and every category up front
+    note_scores = note_matrix.scores(top_keywords, notes)
+    category_scores = category_matrix.scores(top_keywords, [category.lower() for category in CATEGORIES])
+    keyword_rows = {keyword: row for row, keyword in enumerate(top_keywords)}
+    # The first note of the fragrance holding each word or its singular, so keywords find their direct note with one lookup
+    note_tokens = [note_index.tokens(note) for note in notes]
+    first_notes = {}
+    for note, tokens in zip(notes, note_tokens):
+        for token in tokens:
+            for form in word_forms(token):
+                first_notes.setdefault(form, note)
+    if instrumentation.is_enabled():
+        # Every keyword is scored against every note and category, one similarity per pair
+        instrumentation.count('keywords', len(top_keywords))
+        instrumentation.count('similarity_calls', len(top_keywords) * (len(notes) + len(CATEGORIES)))
+        instrumentation.count('oov_keywords', sum(keyword not in note_matrix.model.key_to_index for keyword in top_keywords))
+
+    # top_keywords is shrunk while iterating, exactly as the original per-pair loop did
+    for top_keyword in top_keywords:
+        row = keyword_rows[top_keyword]
+        # A note that contains the keyword as a whole word is a direct mapping
+        keyword_tokens = tuple(phrase_tokens(top_keyword))
+        if len(keyword_tokens) == 1:
+            exact_note = first_notes.get(keyword_tokens[0])
+        else:
+            exact_note = next((note for note, tokens in zip(notes, note_tokens)
+                               if keyword_tokens and contains_phrase(tokens, keyword_tokens)), None)
+        if exact_note is not None:
+            mappings.append((top_keyword, exact_note, 0))
+            top_keywords.remove(top_keyword)
+            continue
+
+        # Find the most similar note
+        max_similarity = 0
+        most_similar_note = None
+        best_note = first_best(note_scores[row])
+        if best_note is not None:
+            max_similarity = note_scores[row, best_note]
+            most_similar_note = notes[best_note]
+
+        if max_similarity < 1:
+            # Find the last note category that contains the keyword as a whole word
+            containing_categories = CATEGORY_INDEX.containing(top_keyword)
+            exact_category = CATEGORY_INDEX.names[containing_categories[-1]] if containing_categories else None
+
+            # Find the most similar note category, an exact match of 1 wins outright
+            max_category_similarity = 0
+            most_similar_category = None
+            exact_matches = np.flatnonzero(category_scores[row] == 1)
+            best_category = exact_matches[0] if len(exact_matches) else first_best(category_scores[row])
+            if best_category is not None:
+                max_category_similarity = category_scores[row, best_category]
+                most_similar_category = CATEGORIES[best_category]
+
+            if exact_category is not None and max_similarity < similarity_upper_threshold:
+                mappings.append((top_keyword, exact_category, 1))
+                top_keywords.remove(top_keyword)
+            elif max_similarity >= max_category_similarity:
+                mappings.append((top_keyword, most_similar_note, 1))
+                top_keywords.remove(top_keyword)
+            else:
+                mappings.append((top_keyword, most_similar_category, 2))
+    if instrumentation.is_enabled():
+        direct_hits = sum(volatility == 0 for _, _, volatility in mappings)
+        instrumentation.count('direct_hits', direct_hits)
+        instrumentation.count('similarity_fallbacks', len(mappings) - direct_hits)
+    return mappings
+
+def map_keywords(mapping, top_keywords, notes, note_matrix, category_matrix, similarity_upper_threshold, note_index=None):
+    """
+        Add the mappings for the keywords of one fragrance description.
 
         Args:
+            mapping (Mapping): The mapping to update.
+            top_keywords (list): Keywords extracted from the description.
+            notes (list): Lower-case notes of the fragrance.
+            note_matrix (WordMatrix): Embeddings of every note of the training set.
+            category_matrix (WordMatrix): Embeddings of the lower-case note categories.
             similarity_upper_threshold (float): The threshold for similarity between keywords and notes.
+            note_index (PhraseIndex): Index of every note of the training set, built from notes if None.
 
         Returns:
             None
     """
+    for token, note, volatility in keyword_mappings(top_keywords, notes, note_matrix, category_matrix,
+                                                    similarity_upper_threshold, note_index):
+        mapping.add_mapping(token, note, volatility)
+
+@instrumentation.instrumented('generate_mappings')
+def generate_mappings(similarity_upper_threshold, training_file='training_set.csv', pickle_file='token_note_mapping.pkl',
+                      batch_size=64, n_process=-1, incremental=True, ner=None, chunk_size=5000, precision='float32'):
+    """
+        Generate mappings between keywords and fragrance notes.
+
+        The training CSV is streamed in chunks through three overlapping stages: reading and
+        fingerprinting rows, extracting keywords, and scoring and merging them into the mapping,
+        so memory stays flat however large the training set is. The keywords and mappings of
+        every row are cached by fingerprint next to the mapping pickle; a rerun only extracts
+        and scores rows that were added or changed and adds the cached mappings of the others
+        in file order, which gives the same result as a full rebuild.
+
+        Args:
+            similarity_upper_threshold (float): The threshold for similarity between keywords and notes.
+            training_file (str): The path to the training CSV.
+            pickle_file (str): The path the mapping pickle is written to.
+            batch_size (int): Number of descriptions spaCy processes per batch.
+            n_process (int): Number of keyword extraction processes spawned for the spaCy model, -1 to use every core.
+            incremental (bool): Reuse the per-row cache of the previous run, False reprocesses every row.
+            ner (Ner): The keyword extractor, run in the pipeline thread with a single process. If None, the spaCy
+                       model is loaded when a row needs its keywords extracted, in a NerPool unless n_process is 1.
+            chunk_size (int): Number of training rows read and processed together.
+            precision (str): Precision of the note and category embeddings scored against,
+                             'float32', or 'float16' or 'int8' for smaller quantized matrices.
+
+        Returns:
+            Mapping: The generated mapping.
+    """
 
     # Direct mapping of token-note when the token equals name of the note (volatility 0)
     #       or the note that is most similar to the token (volatility 1)
     #       or the note category that is most similar to the token (volatility 2)
 
-    mapping = Mapping('token_note_mapping.pkl')
-    categories = ['CITRUS SMELLS', 'FRUITS, VEGETABLES AND NUTS', 'FLOWERS', 'WHITE FLOWERS', 'GREENS HERBS AND FOUGERES',
-                    'SPICES', 'SWEETS AND GOURMAND SMELLS', 'WOODS AND MOSSES', 'RESINS AND BALSAMS', 'MUSK AMBER ANIMALIC SMELLS',
-                    'BEVERAGES', 'NATURAL AND SYNTHETIC, POPULAR AND WEIRD']
-    # Load data from CSV file
-    print("Loading training dataset...")
-    data = pd.read_csv('training_set.csv', encoding='latin-1', on_bad_lines='warn')
-    fragrance_descriptions = data['Description'].tolist()
-
-    fragrance_notes = []
-    for note in data['Notes']:
-        if isinstance(note, str):
-            fragrance_notes.append((note.split(',')))
-        else:
-            fragrance_notes.append([])
-    fragrance_notes = [[str(note).strip() for note in notes] for notes in fragrance_notes]
+    mapping = Mapping(pickle_file)
+    # Pipeline threads add their stage timings to the report of this call
+    report = instrumentation.current_report()
+    with instrumentation.stage('load_model'):
+        pretrained_model = get_model()
+    category_matrix = WordMatrix([category.lower() for category in CATEGORIES], pretrained_model, precision)
 
-    ner = Ner()
-    
-    print("Mapping in progress...")
-    for i in range(1, len(fragrance_descriptions)):
-        description = fragrance_descriptions[i]
-        notes = [note.lower() for note in fragrance_notes[i]]
-        
-        top_keywords = ner.extract_keywords(description)
-
-        for top_keyword in top_keywords:
-            # Find the most similar note
-            max_similarity = 0
-            most_similar_note = None
-            for note in notes:
-                if top_keyword in note.strip():
-                    max_similarity = 1
-                    most_similar_note = note
-                    mapping.add_mapping(top_keyword, note, 0)
-                    top_keywords.remove(top_keyword)
-                    break
-                similarity = calculate_similarity(top_keyword, note)
-                if similarity is not None and similarity > max_similarity:
-                    max_similarity = similarity
-                    most_similar_note = note
-
-            if max_similarity < 1:
-                # Find any note category that contains keyword
-                exact_category = None
-                for note_category in categories:
-                    if top_keyword.upper() in note_category:
-                        exact_category = note_category
-
-                # Find the most similar note category
-                max_category_similarity = 0
-                most_similar_category = None
-                for category in categories:
-                    category_lower = category.lower()
-                    category_similarity = calculate_similarity(top_keyword, category_lower)
-                    if category_similarity is not None and category_similarity == 1:
-                        max_category_similarity = 1
-                        most_similar_category = category
-                        break
-                    if category_similarity is not None and category_similarity > max_category_similarity:
-                        max_category_similarity = category_similarity
-                        most_similar_category = category
-
-                if exact_category is not None and max_similarity < similarity_upper_threshold:
-                    mapping.add_mapping(top_keyword, exact_category, 1)
-                    top_keywords.remove(top_keyword)
-                elif max_similarity >= max_category_similarity:
-                    mapping.add_mapping(top_keyword, most_similar_note, 1)
-                    top_keywords.remove(top_keyword)
+    # Keywords only depend on the description, mappings also on the threshold, the embeddings and the rules
+    scoring = [similarity_upper_threshold, model_fingerprint(pretrained_model), precision, MAPPING_RULES]
+    rows_file = rows_file_for(pickle_file)
+    previous_rows = RowCache(rows_file) if incremental and os.path.exists(rows_file) else None
+    reuse_mappings = previous_rows is not None and previous_rows.get_scoring() == scoring
+    # Rows are written to a new cache, so rows removed from the training set are dropped with the old one
+    if os.path.exists(rows_file + '.new'):
+        os.remove(rows_file + '.new')
+    rows = RowCache(rows_file + '.new')
+    rows.set_scoring(scoring)
+    extracted = 0
+    pool = None
+
+    def look_up(chunk):
+        # Fingerprint the rows of a chunk and fetch what the previous run cached for them
+        with instrumentation.stage('look_up_rows', report):
+            fingerprints = [row_fingerprint(description, notes) for description, notes in chunk]
+            cached = previous_rows.get_many(fingerprints) if previous_rows is not None else {}
+        if not reuse_mappings:
+            cached = {fingerprint: (keywords, None) for fingerprint, (keywords, _) in cached.items()}
+        return chunk, fingerprints, cached
+
+    def extract(looked_up):
+        # Extract the keywords of the rows of a chunk that have none cached
+        nonlocal ner, pool, extracted
+        chunk, fingerprints, cached = looked_up
+        new_rows = {}
+        for row, fingerprint in enumerate(fingerprints):
+            if fingerprint not in cached:
+                new_rows.setdefault(fingerprint, row)
+        if new_rows:
+            if ner is None:
+                # This runs in a pipeline thread, where nlp.pipe must not fork its own workers,
+                # so several processes are spawned once as a pool that serves every chunk
+                from ner import Ner, NerPool
+                if n_process == 1:
+                    ner = Ner()
                 else:
-                    mapping.add_mapping(top_keyword, most_similar_category, 2)
+                    ner = pool = NerPool(n_process)
+            with instrumentation.stage('extract_keywords', report):
+                keywords_per_description = ner.extract_keywords_batch([chunk[row][0] for row in new_rows.values()],
+                                                                      batch_size=batch_size)
+            for fingerprint, keywords in zip(new_rows, keywords_per_description):
+                cached[fingerprint] = (list(keywords), None)
+        extracted += len(new_rows)
+        return chunk, fingerprints, cached
+
+    print("Training in progress...")
+    total_rows = scored = 0
+    # The first row of the training set is left out, as it always has been
+    chunks = instrumentation.timed('read_csv', iter_training_chunks(training_file, chunk_size, skip_rows=1), report)
+    for chunk, fingerprints, cached in staged(staged(chunks, look_up), extract):
+        unscored_rows = {}
+        for row, fingerprint in enumerate(fingerprints):
+            if cached[fingerprint][1] is None:
+                unscored_rows.setdefault(fingerprint, row)
+        with instrumentation.stage('score_rows'):
+            if unscored_rows:
+                # Embed and index the notes of the rows being scored once instead of once per keyword
+                chunk_notes = [note.lower() for row in unscored_rows.values() for note in chunk[row][1]]
+                note_matrix = WordMatrix(chunk_notes, pretrained_model, precision)
+                note_index = PhraseIndex(chunk_notes)
+                for fingerprint, row in unscored_rows.items():
+                    keywords = cached[fingerprint][0]
+                    notes = [note.lower() for note in chunk[row][1]]
+                    # keyword_mappings shrinks its keyword list, so the cached keywords are passed as a copy
+                    cached[fingerprint] = (keywords, keyword_mappings(list(keywords), notes, note_matrix, category_matrix,
+                                                                      similarity_upper_threshold, note_index))
 
-    print("Saving the mappings in pickle file...")
-    # Serialise mapping object and write it on pickle file
-    mapping.save_to_pickle()
+        with instrumentation.stage('merge_rows'):
+            # Merge the rows in file order, the lowest volatility wins and ties keep the first mapping
+            for fingerprint in fingerprints:
+                for token, note, volatility in cached[fingerprint][1]:
+                    mapping.add_mapping(token, note, volatility)
+            rows.put_many((fingerprint, keywords, mappings) for fingerprint, (keywords, mappings) in cached.items())
+        total_rows += len(chunk)
+        scored += len(unscored_rows)
+    if pool is not None:
+        pool.close()
+
+    rows.close()
+    if previous_rows is not None:
+        previous_rows.close()
+    os.replace(rows_file + '.new', rows_file)
+    print("Processed %d rows: extracted keywords of %d and scored %d new or changed rows" %
+          (total_rows, extracted, scored))
+    instrumentation.count('rows', total_rows)
+    instrumentation.count('extracted_rows', extracted)
+    instrumentation.count('scored_rows', scored)
+
+    print("Saving the mappings in pickle and artifact files...")
+    with instrumentation.stage('save_mapping'):
+        # Serialise mapping object and write it on pickle file
+        mapping.save_to_pickle()
+        save_artifact(mapping, os.path.splitext(pickle_file)[0] + '.npz', pretrained_model)
+    with instrumentation.stage('build_token_index'):
+        # Build the approximate nearest-token index alongside the mapping
+        TokenIndex(mapping.get_tokens(), pretrained_model, search='ivf').save_index(index_file_for(pickle_file))
+    return mapping
+
+recommender = None
+
+def get_recommender():
+    """
+        Return the shared Recommender, loading it on first use.
+
+        Returns:
+            Recommender: The long-lived recommender holding every loaded resource.
+    """
+    global recommender
+    if recommender is None:
+        from recommender import Recommender
+        # Prefer the binary mapping artifact when it has been generated
+        mapping_file = 'token_note_mapping.npz' if os.path.exists('token_note_mapping.npz') else 'token_note_mapping.pkl'
+        recommender = Recommender(get_model(), mapping_file=mapping_file)
+    return recommender
 
 def predict_notes(user_input, num_random_notes):
     """
@@ -137,58 +370,14 @@ def predict_notes(user_input, num_random_notes):
             str: A string containing the predicted top, middle, and base notes.
     """
     print("Generating the fragrance notes just like that! Exciting...")    
-    # Load mapping data
-    with open('token_note_mapping.pkl', 'rb') as f:
-        mapping = pickle.load(f)
-    
-    mapped_tokens = mapping.get_tokens()
-    note_class_data = pd.read_csv('note_categories.csv', encoding='latin-1', sep=';', on_bad_lines='warn')
-
-    # Prepare user input data (tokenization, one-hot encoding, etc.)
-    ner = Ner()
-    keywords = ner.extract_keywords(user_input)
+    with instrumentation.call('predict_notes'):
+        with instrumentation.stage('load_recommender'):
+            loaded_recommender = get_recommender()
+        prediction = loaded_recommender.predict(user_input, num_random_notes)
+    if instrumentation.is_enabled():
+        print(instrumentation.format_report(instrumentation.last_report()))
+    top_notes, middle_notes, base_notes = prediction['top_notes'], prediction['middle_notes'], prediction['base_notes']
 
-    base_notes, middle_notes, top_notes = [], [], []
-    for keyword in keywords:
-        max_similarity = 0
-        predicted_class = None
-        volatility = None
-
-        if keyword in mapped_tokens:
-            predicted_class = mapping.get_note_for_token(keyword)
-            volatility = mapping.get_volatility(keyword)
-        else:
-            for token in mapped_tokens:
-                similarity = calculate_similarity(keyword, token)
-                if similarity is not None and similarity > max_similarity:
-                    max_similarity = similarity
-                    predicted_class = mapping.get_note_for_token(token)
-                    volatility = mapping.get_volatility(token)
-
-        if volatility == 0 and predicted_class not in base_notes:
-            base_notes.append(predicted_class)
-        else:
-            if predicted_class is not None and predicted_class.isupper():
-                filtered_notes = note_class_data.loc[note_class_data['Category'] == predicted_class, 'Note Name']
-                if not filtered_notes.empty:
-                    # Use current time as the random seed
-                    random_state = int(time.time())
-                    chosen_notes = filtered_notes.sample(num_random_notes, random_state=random_state).tolist()
-                else:
-                    print("No notes found for the specified category.")
-                    break
-                if volatility==1:
-                    for chosen_note in chosen_notes:
-                        if chosen_note not in base_notes and chosen_note not in middle_notes:
-                            middle_notes.append(chosen_note)
-                else:
-                    for chosen_note in chosen_notes:
-                        if chosen_note not in base_notes and chosen_note not in middle_notes and chosen_note not in top_notes:
-                            top_notes.append(chosen_note)
-            elif predicted_class is not None:
-                if predicted_class not in base_notes and predicted_class not in middle_notes:
-                    middle_notes.append(predicted_class)
-    
     print('Top notes for you: %s'%top_notes)
     print('Middle notes for you: %s'%middle_notes)
     print('Base notes for you: %s'%base_notes)
@@ -197,6 +386,8 @@ def predict_notes(user_input, num_random_notes):
     return ('Top notes for you: %s\n\nMiddle notes for you: %s\n\nBase notes for you: %s'%(top_notes, middle_notes, base_notes))
 
 def main():
+    # The GUI toolkit is only needed for the desktop app, not for headless serving
+    import PySimpleGUI as psg
     # Define the layout of the GUI
     layout = [
         [psg.Text("What memory do you have about this scent you'd like to find?")],
@@ -214,7 +405,7 @@ def main():
             break
         elif event == "Find":
             user_input = values["input_text"]
-            if re.search(r'[^a-zA-Z\s.]', user_input):  # Check if input contains characters other than letters, spaces, and dots
+            if not is_valid_input(user_input):  # Check if input contains characters other than letters, spaces, and dots
                 psg.popup_error("Error: Please describe your memory in words! (No digits or symbols)")
             else:
                 # Display the output in a pop-up window
@@ -226,7 +417,39 @@ def main():
     
 # Ensure the main function is only executed when the script is run directly
 if __name__ == "__main__":
-    # generate_mappings(0.8)          # Uncomment this call only when there is a change in training_set.csv 
-                                        # or you don't have token_note_mapping.pkl locally.
-    # Run note prediction process
-    main()
+    parser = argparse.ArgumentParser(description="Olfactory Time Machine: find the scent that brings your memory back.")
+    parser.add_argument("--train", action="store_true",
+                        help="update token_note_mapping.pkl from the new or changed rows of training_set.csv")
+    parser.add_argument("--full", action="store_true", help="with --train, reprocess every training row")
+    parser.add_argument("--serve", action="store_true", help="run the headless HTTP recommendation service instead of the GUI")
+    parser.add_argument("--host", default="127.0.0.1", help="address the service listens on")
+    parser.add_argument("--port", type=int, default=8000, help="port the service listens on")
+    parser.add_argument("--workers", type=int, default=4, help="threads running keyword extraction and similarity search")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="with --serve, pre-forked worker processes sharing the loaded models instead of the threads")
+    parser.add_argument("--instrument", action="store_true",
+                        help="record per-stage timings and counters, printing them after each call and on exit")
+    parser.add_argument("--profile", metavar="FILE", default=None, help="also run every call under cProfile and write the stats to FILE")
+    args = parser.parse_args()
+    if args.processes > 0 and (args.instrument or args.profile):
+        # Each worker process would record into its own instruments, which /metrics cannot see
+        parser.error("--instrument and --profile cannot be combined with --processes")
+
+    if args.instrument or args.profile:
+        instrumentation.enable(args.profile)
+    try:
+        if args.train:
+            # Run this when training_set.csv changes or token_note_mapping.pkl is missing
+            generate_mappings(0.8, incremental=not args.full)
+            if instrumentation.is_enabled():
+                print(instrumentation.format_report(instrumentation.last_report()))
+        elif args.serve:
+            from server import serve
+            serve(get_recommender(), args.host, args.port, args.workers, args.processes)
+        else:
+            # Run note prediction process
+            main()
+    finally:
+        if instrumentation.is_enabled():
+            print(json.dumps(instrumentation.summary(), indent=2))
+            instrumentation.disable()
@@ -1,4 +1,5 @@
 import pickle
+from array import array
 
 class Mapping():
     "Class that manages list of mappings of word and fragrance note"
@@ -6,12 +7,113 @@ class Mapping():
         """
         Initialises the Mapping object.
 
+        Mappings are stored column-wise: a token list, an array of note IDs into an interned
+        note table and an array of volatilities, all sharing the same row numbers.
+
         Args:
             pickle_file (str): The path to the pickle file for storing mappings.
         """
-        self.mappings = [] 
+        self.tokens = []
+        self.note_ids = array('i')
+        self.volatilities = array('b')
+        self.note_names = []
         self.pickle_file = pickle_file
-    
+        self._build_indexes()
+
+    @classmethod
+    def from_columns(cls, pickle_file, tokens, note_names, note_ids, volatilities):
+        """
+        Creates a Mapping from its column layout, e.g. as stored in a mapping artifact.
+
+        Args:
+            pickle_file (str): The path to the pickle file for storing mappings.
+            tokens (list): The mapped tokens.
+            note_names (list): The interned note names.
+            note_ids (iterable): The note ID of each token, an array('i') is used without copying.
+            volatilities (iterable): The volatility of each token, an array('b') is used without copying.
+
+        Returns:
+            Mapping: The mapping holding those columns.
+        """
+        mapping = cls(pickle_file)
+        mapping.tokens = list(tokens)
+        mapping.note_names = list(note_names)
+        # Columns that already are arrays of the right type are used as they are
+        mapping.note_ids = note_ids if isinstance(note_ids, array) and note_ids.typecode == 'i' else array('i', note_ids)
+        mapping.volatilities = (volatilities if isinstance(volatilities, array) and volatilities.typecode == 'b'
+                                else array('b', volatilities))
+        mapping._build_indexes()
+        return mapping
+
+    def _build_indexes(self):
+        """
+        Rebuilds the token and note indexes from the stored columns.
+        The reverse indexes are only built once they are first used, which keeps loading fast.
+        """
+        self.token_rows = dict(zip(self.tokens, range(len(self.tokens))))
+        self.note_index = dict(zip(self.note_names, range(len(self.note_names))))
+        self.note_tokens = None
+        self.volatility_tokens = None
+
+    def _build_reverse_indexes(self):
+        """
+        Builds the note-to-tokens index and the volatility buckets if they do not exist yet.
+        """
+        if self.note_tokens is not None:
+            return
+        # Ordered sets (dicts with None values) keep tokens in insertion order
+        self.note_tokens = {}
+        self.volatility_tokens = {}
+        for token, note_id, volatility in zip(self.tokens, self.note_ids, self.volatilities):
+            self.note_tokens.setdefault(self.note_names[note_id], {})[token] = None
+            self.volatility_tokens.setdefault(volatility, {})[token] = None
+
+    def __getstate__(self):
+        # Only the columns are pickled, the indexes are rebuilt on load
+        return {'tokens': self.tokens, 'note_ids': self.note_ids, 'volatilities': self.volatilities,
+                'note_names': self.note_names, 'pickle_file': self.pickle_file}
+
+    def __setstate__(self, state):
+        self.pickle_file = state['pickle_file']
+        if 'mappings' in state:
+            # Pickle written by the list-of-dicts Mapping
+            self.tokens = []
+            self.note_ids = array('i')
+            self.volatilities = array('b')
+            self.note_names = []
+            self._build_indexes()
+            for mapping in state['mappings']:
+                self.add_mapping(mapping['token'], mapping['note'], mapping['volatility'])
+        else:
+            self.tokens = state['tokens']
+            self.note_ids = state['note_ids']
+            self.volatilities = state['volatilities']
+            self.note_names = state['note_names']
+            self._build_indexes()
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __contains__(self, token):
+        return token in self.token_rows
+
+    def _note_id(self, note):
+        """
+        Returns the ID of the given note, interning it if it is new.
+
+        Args:
+            note (str): The note name.
+
+        Returns:
+            int: The note ID.
+        """
+        note_id = self.note_index.get(note)
+        if note_id is None:
+            note_id = len(self.note_names)
+            self.note_names.append(note)
+            self.note_index[note] = note_id
+        return note_id
+
     def add_mapping(self, token, note, volatility):
         """
         Adds a new mapping or updates an existing one if a lower volatility is provided.
@@ -23,15 +125,26 @@ class Mapping():
 
         """
         if note is not None:
-            existing_mapping = self.get_mapping(token)
-            if existing_mapping:
-                if volatility < existing_mapping['volatility']:
+            row = self.token_rows.get(token)
+            if row is not None:
+                if volatility < self.volatilities[row]:
                     # Update existing mapping with lower volatility
-                    existing_mapping['note'] = note
-                    existing_mapping['volatility'] = volatility
+                    if self.note_tokens is not None:
+                        del self.note_tokens[self.note_names[self.note_ids[row]]][token]
+                        del self.volatility_tokens[self.volatilities[row]][token]
+                        self.note_tokens.setdefault(note, {})[token] = None
+                        self.volatility_tokens.setdefault(volatility, {})[token] = None
+                    self.note_ids[row] = self._note_id(note)
+                    self.volatilities[row] = volatility
             else:
                 # Add a new mapping
-                self.mappings.append({'token': token, 'note': note, 'volatility': volatility})
+                self.token_rows[token] = len(self.tokens)
+                self.tokens.append(token)
+                self.note_ids.append(self._note_id(note))
+                self.volatilities.append(volatility)
+                if self.note_tokens is not None:
+                    self.note_tokens.setdefault(note, {})[token] = None
+                    self.volatility_tokens.setdefault(volatility, {})[token] = None
 
     def get_mapping(self, token):
         """
@@ -43,10 +156,23 @@ class Mapping():
         Returns:
             dict: The mapping for the token, or None if not found.
         """
-        for mapping in self.mappings:
-            if mapping['token'] == token:
-                return mapping
-        return None
+        row = self.token_rows.get(token)
+        if row is None:
+            return None
+        return self._record(row)
+
+    def _record(self, row):
+        """
+        Returns the mapping stored at the given row as a dictionary.
+
+        Args:
+            row (int): The row number.
+
+        Returns:
+            dict: The mapping with token, note and volatility keys.
+        """
+        return {'token': self.tokens[row], 'note': self.note_names[self.note_ids[row]],
+                'volatility': self.volatilities[row]}
 
     def get_note_for_token(self, token):
         """
@@ -61,10 +187,10 @@ class Mapping():
         Raises:
             ValueError: If the token is not found.
         """
-        for mapping in self.mappings:
-            if mapping['token'] == token:
-                return mapping['note']
-        raise ValueError("Token not found")
+        row = self.token_rows.get(token)
+        if row is None:
+            raise ValueError("Token not found")
+        return self.note_names[self.note_ids[row]]
 
     def get_volatility(self, token):
         """
@@ -76,10 +202,36 @@ class Mapping():
         Returns:
             int: The volatility associated with the token, or None if not found.
         """
-        for mapping in self.mappings:
-            if mapping['token'] == token:
-                return mapping['volatility']
-        return None
+        row = self.token_rows.get(token)
+        if row is None:
+            return None
+        return self.volatilities[row]
+
+    def get_tokens_for_note(self, note):
+        """
+        Returns all tokens mapped to the given note.
+
+        Args:
+            note (str): The note for which to retrieve the tokens.
+
+        Returns:
+            list: The tokens mapped to the note, in insertion order.
+        """
+        self._build_reverse_indexes()
+        return list(self.note_tokens.get(note, ()))
+
+    def get_tokens_with_volatility(self, volatility):
+        """
+        Returns all tokens mapped with the given volatility.
+
+        Args:
+            volatility (int): The volatility for which to retrieve the tokens.
+
+        Returns:
+            list: The tokens with that volatility, in insertion order.
+        """
+        self._build_reverse_indexes()
+        return list(self.volatility_tokens.get(volatility, ()))
 
     def get_mappings(self):
         """
@@ -88,8 +240,8 @@ class Mapping():
         Returns:
             list: A list of all mappings.
         """
-        return self.mappings
-    
+        return [self._record(row) for row in range(len(self.tokens))]
+
     def get_tokens(self):
         """
         Returns all unique tokens.
@@ -97,8 +249,8 @@ class Mapping():
         Returns:
             list: A list of all unique tokens.
         """
-        return list(mapping['token'] for mapping in self.mappings)  
-    
+        return list(self.tokens)
+
     def get_notes(self):
         """
         Returns all unique notes.
@@ -106,11 +258,11 @@ class Mapping():
         Returns:
             list: A list of all unique notes.
         """
-        return list(mapping['note'] for mapping in self.mappings) 
-    
+        return [self.note_names[note_id] for note_id in self.note_ids]
+
     def save_to_pickle(self):
         """
         Saves the Mapping object to a pickle file.
         """
         with open(self.pickle_file, 'wb') as f:
-            pickle.dump(self, f)
\ No newline at end of file
+            pickle.dump(self, f)
@@ -0,0 +1,169 @@
+"""
+Nearest-neighbour search backends over a row-normalised embedding matrix.
+
+Every backend returns, for each query row, the position of the most similar matrix
+row (the earliest one on ties) and its cosine similarity. ExactSearch scans the whole
+matrix; IVFSearch clusters the rows with spherical k-means and only scans the
+n_probe clusters whose centroids are closest to the query, trading recall for speed.
+Both search a float32 matrix or a QuantizedMatrix alike.
+"""
+import numpy as np
+from quantized import similarities
+
+class ExactSearch():
+    "Brute-force search over every row of the matrix"
+    def __init__(self, matrix):
+        """
+        Initialises the ExactSearch object.
+
+        Args:
+            matrix (numpy.ndarray or QuantizedMatrix): The row-normalised matrix to search.
+        """
+        self.matrix = matrix
+
+    def search(self, queries):
+        """
+        Returns the most similar row for each query.
+
+        Args:
+            queries (numpy.ndarray): Row-normalised query vectors.
+
+        Returns:
+            tuple: The best row per query and its similarity, as two arrays.
+        """
+        scores = similarities(queries, self.matrix)
+        best = np.argmax(scores, axis=1)
+        return best, scores[np.arange(len(queries)), best]
+
+class IVFSearch():
+    "Inverted-file search that only scans the clusters closest to each query"
+    def __init__(self, matrix, centroids, list_rows, list_offsets, n_probe=8):
+        """
+        Initialises the IVFSearch object from an already trained clustering.
+
+        Args:
+            matrix (numpy.ndarray or QuantizedMatrix): The row-normalised matrix to search.
+            centroids (numpy.ndarray): The normalised cluster centroids.
+            list_rows (numpy.ndarray): Matrix rows grouped by cluster, ascending within each cluster.
+            list_offsets (numpy.ndarray): Start of each cluster in list_rows, plus the total length.
+            n_probe (int): Number of clusters scanned per query.
+        """
+        self.matrix = matrix
+        self.centroids = centroids
+        self.list_rows = list_rows
+        self.list_offsets = list_offsets
+        self.n_probe = n_probe
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, n_probe=8, iterations=10, seed=0):
+        """
+        Clusters the matrix rows and builds the inverted lists.
+
+        Args:
+            matrix (numpy.ndarray): The row-normalised matrix to search.
+            n_lists (int): Number of clusters, defaults to the square root of the number of rows.
+            n_probe (int): Number of clusters scanned per query.
+            iterations (int): Number of k-means iterations.
+            seed (int): Seed for choosing the training sample and initial centroids.
+
+        Returns:
+            IVFSearch: The trained search backend.
+        """
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(matrix))))
+        n_lists = max(1, min(n_lists, len(matrix)))
+        rng = np.random.default_rng(seed)
+        # Train on a sample of at most 64 rows per cluster, then assign every row
+        sample = matrix[np.sort(rng.choice(len(matrix), min(len(matrix), n_lists * 64), replace=False))]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            centroids = cls._update_centroids(sample, cls._assign(sample, centroids), centroids)
+        assignments = cls._assign(matrix, centroids)
+        list_rows = np.argsort(assignments, kind='stable')
+        list_offsets = np.searchsorted(assignments[list_rows], np.arange(n_lists + 1))
+        return cls(matrix, centroids, list_rows, list_offsets, n_probe)
+
+    @staticmethod
+    def _assign(matrix, centroids, chunk_size=65536):
+        """
+        Returns the closest centroid of each row, computed in chunks to bound memory.
+        """
+        assignments = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), chunk_size):
+            assignments[start:start + chunk_size] = np.argmax(matrix[start:start + chunk_size] @ centroids.T, axis=1)
+        return assignments
+
+    @staticmethod
+    def _update_centroids(sample, assignments, centroids):
+        """
+        Returns the normalised mean of each cluster, keeping the old centroid of empty clusters.
+        """
+        order = np.argsort(assignments, kind='stable')
+        clusters, starts = np.unique(assignments[order], return_index=True)
+        updated = centroids.copy()
+        sums = np.add.reduceat(sample[order], starts, axis=0)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        updated[clusters] = sums / norms
+        return updated
+
+    def search(self, queries):
+        """
+        Returns the most similar row among the probed clusters for each query.
+
+        Args:
+            queries (numpy.ndarray): Row-normalised query vectors.
+
+        Returns:
+            tuple: The best row per query and its similarity, as two arrays.
+                   Rows are -1 with similarity -inf where the probed clusters are empty.
+        """
+        best = np.full(len(queries), -1, dtype=np.int64)
+        best_scores = np.full(len(queries), -np.inf, dtype=np.float32)
+        n_probe = min(self.n_probe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+        for i, query in enumerate(queries):
+            candidates = np.sort(np.concatenate([self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]]
+                                                 for c in probes[i]]))
+            if len(candidates):
+                scores = similarities(query, self.matrix[candidates])
+                position = np.argmax(scores)
+                best[i] = candidates[position]
+                best_scores[i] = scores[position]
+        return best, best_scores
+
+    def save(self, path, tokens, model_fingerprint=''):
+        """
+        Saves the clustering next to the tokens, vector size and model it was built for.
+
+        Args:
+            path (str): The path of the .npz file to write.
+            tokens (list): The tokens of the matrix rows, checked again on load.
+            model_fingerprint (str): The fingerprint of the embedding model, checked again on load.
+        """
+        np.savez(path, centroids=self.centroids, list_rows=self.list_rows, list_offsets=self.list_offsets,
+                 tokens=np.array(tokens, dtype=str), vector_size=self.centroids.shape[1],
+                 model_fingerprint=model_fingerprint)
+
+    @classmethod
+    def load(cls, path, matrix, tokens, n_probe=8, model_fingerprint=''):
+        """
+        Loads a saved clustering if it was built for the same tokens, vector size and model.
+
+        Args:
+            path (str): The path of the .npz file to read.
+            matrix (numpy.ndarray or QuantizedMatrix): The row-normalised matrix to search.
+            tokens (list): The tokens of the matrix rows.
+            n_probe (int): Number of clusters scanned per query.
+            model_fingerprint (str): The fingerprint of the embedding model of the matrix.
+
+        Returns:
+            IVFSearch: The search backend, or None if the file belongs to other tokens or another model.
+        """
+        with np.load(path) as data:
+            # Indexes saved before the vector size and model were recorded are rebuilt as well
+            if 'vector_size' not in data or int(data['vector_size']) != matrix.shape[1]:
+                return None
+            if str(data['model_fingerprint']) != model_fingerprint or data['tokens'].tolist() != list(tokens):
+                return None
+            return cls(matrix, data['centroids'], data['list_rows'], data['list_offsets'], n_probe)
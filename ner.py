@@ -1,15 +1,31 @@
+import multiprocessing
+import os
 from collections import Counter
 import spacy
+from spacy.lang.en.stop_words import STOP_WORDS as ENGLISH_STOP_WORDS
+
+# Entity labels whose tokens are never keywords
+NER_CATEGORIES = frozenset({"PERSON", "LOCATION", "DATE", "ORG"})
+STOP_WORDS = frozenset(ENGLISH_STOP_WORDS |
+                       {"like", "note", "notes", "scent", "scents", "fragrance", "perfume", "\x96", "\r", "©", "le"})
+# Pipeline components nothing downstream reads: the lemmatizer only sets Token.lemma_, which neither the
+# keyword filter nor the entity recognizer uses. The parser is needed, as the entity recognizer does not let
+# entities cross the sentence boundaries it sets.
+UNUSED_COMPONENTS = ("lemmatizer",)
 
 class Ner():
     "A class that manages Named Entity Recognition, especailly keyword extraction"
     
-    def __init__(self):
+    def __init__(self, lean=True):
         """
         Initialise the Ner class.
         Loads the English language model for NER using spaCy.
+
+        Parameters:
+        - lean (bool): Leave out the lemmatizer, whose lemmas nothing reads,
+          which makes extraction faster without changing the keywords.
         """
-        self.nlp = spacy.load("en_core_web_sm")
+        self.nlp = spacy.load("en_core_web_sm", exclude=UNUSED_COMPONENTS if lean else ())
 
     def extract_keywords(self, description):
         """
@@ -22,18 +38,111 @@ class Ner():
         - top_keywords (list): List of top keywords extracted from the description.
         """
         doc = self.nlp(description)
+        return self.keywords_from_doc(doc)
+
+    def extract_keywords_batch(self, descriptions, batch_size=64, n_process=1):
+        """
+        Extract keywords from many descriptions at once, streaming them through nlp.pipe.
+        The lemmatizer is disabled if it is loaded; the parser stays, as the entity recognizer reads
+        its sentence boundaries and the keywords must match extract_keywords.
 
-        ner_categories = ["PERSON", "LOCATION", "DATE", "ORG"]
-        token_labels = [(token.text, token.ent_type_) for token in doc]
-        remove_entities = [token for token, label in token_labels if label in ner_categories]
+        Parameters:
+        - descriptions (iterable): The descriptions from which keywords are to be extracted.
+        - batch_size (int): Number of descriptions spaCy processes per batch.
+        - n_process (int): Number of worker processes, -1 to use every core.
+
+        Returns:
+        - keywords (list): One list of top keywords per description, in input order.
+        """
+        unused_components = [name for name in UNUSED_COMPONENTS if name in self.nlp.pipe_names]
+        docs = self.nlp.pipe(descriptions, batch_size=batch_size, n_process=n_process, disable=unused_components)
+        return [self.keywords_from_doc(doc) for doc in docs]
+
+    def keywords_from_doc(self, doc):
+        """
+        Select the top keywords of an already processed spaCy document.
+
+        Parameters:
+        - doc (Doc): The processed description.
+
+        Returns:
+        - top_keywords (list): List of top keywords extracted from the document.
+        """
+        remove_entities = {token.text for token in doc if token.ent_type_ in NER_CATEGORIES}
 
-        stop_words = spacy.lang.en.stop_words.STOP_WORDS | \
-                     {"like", "note", "notes", "scent", "scents", "fragrance", "perfume", "\x96", "\r", "©", "le"}
         filtered_words = [token.text.lower().split("-")[0] for token in doc 
                           if token.pos_ not in {"VERB", "ADV"} and token.text not in remove_entities
-                          and token.text.lower() not in stop_words and not token.is_punct 
+                          and token.text.lower() not in STOP_WORDS and not token.is_punct 
                           and not token.is_digit and len(token.text)>1]
         word_freq = Counter(filtered_words)
         top_keywords = [word for word, _ in word_freq.most_common(15)]
 
-        return top_keywords
\ No newline at end of file
+        return top_keywords
+
+# The Ner of a NerPool worker process
+worker_ner = None
+
+def init_worker(lean):
+    """
+    Load the spaCy model once in a NerPool worker process.
+    """
+    global worker_ner
+    try:
+        worker_ner = Ner(lean)
+    except Exception as error:
+        # A pool restarts a worker whose initializer fails without end, so the error is raised by its tasks instead
+        worker_ner = error
+
+def worker_extract_keywords(descriptions, batch_size):
+    """
+    Extract the keywords of a slice of descriptions in a NerPool worker process.
+    """
+    if isinstance(worker_ner, Exception):
+        raise worker_ner
+    return worker_ner.extract_keywords_batch(descriptions, batch_size=batch_size)
+
+class NerPool():
+    "A class that extracts keywords in a persistent pool of spawned processes, each holding its own spaCy model"
+
+    def __init__(self, processes=-1, lean=True):
+        """
+        Initialise the NerPool class and start its worker processes.
+        nlp.pipe(n_process=...) forks new workers on every call, which can deadlock when the calling
+        process runs other threads, e.g. the stages of the training pipeline. The workers of a NerPool
+        are spawned once instead, so extract_keywords_batch can be called from any thread.
+
+        Parameters:
+        - processes (int): Number of worker processes, -1 to use every core.
+        - lean (bool): Leave out the lemmatizer in every worker, see Ner.
+        """
+        self.processes = os.cpu_count() if processes == -1 else processes
+        self.pool = multiprocessing.get_context("spawn").Pool(self.processes, initializer=init_worker, initargs=(lean,))
+
+    def extract_keywords_batch(self, descriptions, batch_size=64, n_process=None):
+        """
+        Extract keywords from many descriptions at once, spreading batches of them over the workers.
+
+        Parameters:
+        - descriptions (iterable): The descriptions from which keywords are to be extracted.
+        - batch_size (int): Number of descriptions sent to a worker and processed by spaCy at a time.
+        - n_process (int): Ignored, the number of workers is set when the pool is created.
+
+        Returns:
+        - keywords (list): One list of top keywords per description, in input order.
+        """
+        descriptions = list(descriptions)
+        batches = [(descriptions[start:start + batch_size], batch_size) for start in range(0, len(descriptions), batch_size)]
+        return [keywords for batch in self.pool.starmap(worker_extract_keywords, batches) for keywords in batch]
+
+    def close(self):
+        """
+        Stop the worker processes once they finished their work.
+        """
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,180 @@
+"""
+Whole-word and phrase matching of note names and note categories.
+
+Names are split into lower-case word tokens ("Ylang-Ylang" -> ylang ylang, "FRUITS,
+VEGETABLES AND NUTS" -> fruits vegetables and nuts) and stored in a token trie, so
+"rose" matches the notes "Rose" and "Damask Rose" but not "Primrose", and "fruit"
+matches "FRUITS, VEGETABLES AND NUTS" but "ve" does not. find() scans a
+text once, walking the trie from every token and keeping the longest name that starts
+there, which is how multi-word names such as "Bitter Orange" are recognised in text.
+"""
+import re
+
+# Letters and digits of any script; punctuation, spaces and underscores separate tokens
+TOKEN = re.compile(r'[^\W_]+')
+# Key of a trie node that marks the end of a name; never a token, as tokens are not empty
+END = ''
+
+def phrase_tokens(text):
+    """
+        Split a text into lower-case word tokens.
+
+        Args:
+            text (str): A note name, category, keyword or description.
+
+        Returns:
+            list: The tokens.
+    """
+    if text.isalnum():
+        # A single word, the common case for keywords
+        return [text.lower()]
+    return TOKEN.findall(text.lower())
+
+def word_forms(token):
+    """
+        Returns a token and, if it looks plural, its singular forms, so that "flower" is found in "WHITE FLOWERS".
+
+        Args:
+            token (str): A lower-case token.
+
+        Returns:
+            tuple: The forms, the token first.
+    """
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        if token.endswith('es'):
+            return (token, token[:-1], token[:-2])
+        return (token, token[:-1])
+    return (token,)
+
+def contains_phrase(tokens, phrase):
+    """
+        Returns whether a token sequence contains a phrase, a shorter token sequence, contiguously.
+    """
+    size = len(phrase)
+    return any(tokens[start:start + size] == phrase for start in range(len(tokens) - size + 1))
+
+class PhraseIndex():
+    "Class that indexes names by their word tokens for whole-word containment and phrase search"
+    def __init__(self, names=()):
+        """
+        Initialises the PhraseIndex object.
+
+        Args:
+            names (iterable): The names to index. Names with the same tokens share one entry, the first one added.
+        """
+        self.names = []
+        self.name_tokens = []
+        # Name -> tokens of every name added, including names that share an entry
+        self.tokens_of = {}
+        self.root = {}
+        # Word form -> IDs of the names containing it, in the order the names were added
+        self.token_names = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        """
+        Adds a name to the index.
+
+        Args:
+            name (str): The name.
+
+        Returns:
+            int: The ID of the name, or of the earlier name with the same tokens; None if it has no tokens.
+        """
+        tokens = self.tokens_of[name] = tuple(phrase_tokens(name))
+        if not tokens:
+            return None
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        if END in node:
+            return node[END]
+        name_id = node[END] = len(self.names)
+        self.names.append(name)
+        self.name_tokens.append(tokens)
+        for form in dict.fromkeys(form for token in tokens for form in word_forms(token)):
+            self.token_names.setdefault(form, []).append(name_id)
+        return name_id
+
+    def tokens(self, name):
+        """
+        Returns the tokens of a name, without splitting it again if it was added to the index.
+
+        Args:
+            name (str): The name.
+
+        Returns:
+            tuple: The tokens.
+        """
+        tokens = self.tokens_of.get(name)
+        return tokens if tokens is not None else tuple(phrase_tokens(name))
+
+    def lookup(self, text):
+        """
+        Returns the ID of the name with exactly the tokens of the text, e.g. "bitter orange" for "Bitter Orange".
+
+        Args:
+            text (str): The text to look up.
+
+        Returns:
+            int: The name ID, or None.
+        """
+        node = self.root
+        for token in phrase_tokens(text):
+            node = node.get(token)
+            if node is None:
+                return None
+        return node.get(END)
+
+    def containing(self, text):
+        """
+        Returns the names that contain the tokens of the text as a whole-word phrase.
+        A single word also matches its plural, e.g. "flower" matches "WHITE FLOWERS".
+
+        Args:
+            text (str): A keyword or phrase.
+
+        Returns:
+            list: The IDs of the matching names, in the order they were added.
+        """
+        tokens = phrase_tokens(text)
+        if not tokens:
+            return []
+        name_ids = self.token_names.get(tokens[0], [])
+        if len(tokens) == 1:
+            return list(name_ids)
+        tokens = tuple(tokens)
+        return [name_id for name_id in name_ids if contains_phrase(self.name_tokens[name_id], tokens)]
+
+    def find(self, tokens):
+        """
+        Finds the names occurring in a token sequence, taking the longest name at each position
+        and continuing after it, so matches never overlap.
+
+        Args:
+            tokens (list): Tokens of a text, see phrase_tokens().
+
+        Returns:
+            list: (start, end, name ID) tuples in text order; tokens[start:end] are the name's tokens.
+        """
+        matches = []
+        start = 0
+        while start < len(tokens):
+            node = self.root
+            longest = None
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if END in node:
+                    longest = (start, end + 1, node[END])
+            if longest is not None:
+                matches.append(longest)
+                start = longest[1]
+            else:
+                start += 1
+        return matches
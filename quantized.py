@@ -0,0 +1,136 @@
+"""
+Compact storage of row-normalised embedding matrices for similarity scoring.
+
+A QuantizedMatrix keeps every row as float16, half the size of float32, or as int8
+with one float32 scale per row, about a quarter of the size. An int8 row holds
+round(row / scale) with scale = max(abs(row)) / 127, so every value is within half a
+scale step of the original. Queries stay float32. Scoring converts the matrix to
+float32 one block of rows at a time and multiplies each block with the queries in one
+BLAS product, then applies the int8 scales to the columns of the result. Only one block
+is ever held at full precision. NumPy has no fast float16 or int8 matrix product, as
+both run outside BLAS, so the block conversion is what keeps scoring vectorized.
+"""
+import numpy as np
+
+PRECISIONS = ('float32', 'float16', 'int8')
+
+class QuantizedMatrix():
+    "Class that stores a row-normalised matrix as float16 rows or as int8 rows with one scale per row"
+    def __init__(self, values, scales=None, block_size=4096):
+        """
+        Initialises the QuantizedMatrix object from already quantized rows.
+
+        Args:
+            values (numpy.ndarray): The float16 or int8 rows.
+            scales (numpy.ndarray): The float32 scale of every int8 row, None for float16 rows.
+            block_size (int): Number of rows converted to float32 at a time while scoring.
+        """
+        self.values = values
+        self.scales = scales
+        self.block_size = block_size
+
+    @classmethod
+    def quantize(cls, matrix, precision):
+        """
+        Quantizes the rows of a float32 matrix.
+
+        Args:
+            matrix (numpy.ndarray): The row-normalised matrix.
+            precision (str): 'float16' or 'int8'.
+
+        Returns:
+            QuantizedMatrix: The quantized matrix.
+        """
+        if precision == 'float16':
+            return cls(matrix.astype(np.float16))
+        if precision != 'int8':
+            raise ValueError("Unknown precision: %s" % precision)
+        scales = np.abs(matrix).max(axis=1) / 127 if len(matrix) else np.zeros(0, dtype=np.float32)
+        # All-zero rows stay zeros whatever their scale
+        scales[scales == 0] = 1
+        values = np.rint(matrix / scales[:, None]).astype(np.int8)
+        return cls(values, scales.astype(np.float32))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, rows):
+        """
+        Returns the selected rows, e.g. matrix[[2, 0]], as a QuantizedMatrix.
+        """
+        return QuantizedMatrix(self.values[rows], None if self.scales is None else self.scales[rows], self.block_size)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def precision(self):
+        return 'float16' if self.scales is None else 'int8'
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    def dequantize(self):
+        """
+        Returns the matrix at float32 precision.
+
+        Returns:
+            numpy.ndarray: The (rows, vector_size) float32 matrix.
+        """
+        matrix = self.values.astype(np.float32)
+        if self.scales is not None:
+            matrix *= self.scales[:, None]
+        return matrix
+
+    def scores(self, queries):
+        """
+        Returns the dot product of every query with every row.
+
+        Args:
+            queries (numpy.ndarray): float32 query vectors, one per row, or a single 1-D vector.
+
+        Returns:
+            numpy.ndarray: A (len(queries), len(self)) float32 matrix, or one score per row for a single vector.
+        """
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+        result = np.empty((len(queries), len(self.values)), dtype=np.float32)
+        for start in range(0, len(self.values), self.block_size):
+            stop = start + self.block_size
+            block = result[:, start:stop]
+            np.matmul(queries, self.values[start:stop].astype(np.float32).T, out=block)
+            if self.scales is not None:
+                block *= self.scales[start:stop]
+        return result[0] if single else result
+
+def quantize(matrix, precision='float32'):
+    """
+        Returns a row-normalised matrix at the given precision.
+
+        Args:
+            matrix (numpy.ndarray): The float32 row-normalised matrix.
+            precision (str): 'float32' to keep the matrix as it is, 'float16' or 'int8' to quantize it.
+
+        Returns:
+            numpy.ndarray or QuantizedMatrix: The matrix to score against.
+    """
+    if precision == 'float32':
+        return matrix
+    return QuantizedMatrix.quantize(matrix, precision)
+
+def similarities(queries, matrix):
+    """
+        Returns the cosine similarities of row-normalised queries with the rows of a float32 or quantized matrix.
+
+        Args:
+            queries (numpy.ndarray): Row-normalised float32 queries, or a single 1-D query.
+            matrix (numpy.ndarray or QuantizedMatrix): The row-normalised matrix.
+
+        Returns:
+            numpy.ndarray: A (len(queries), len(matrix)) matrix, or one similarity per row for a single query.
+    """
+    if isinstance(matrix, QuantizedMatrix):
+        return matrix.scores(queries)
+    return matrix @ queries if queries.ndim == 1 else queries @ matrix.T
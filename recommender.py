@@ -0,0 +1,290 @@
+import threading
+import numpy as np
+import pandas as pd
+import instrumentation
+from artifact import load_mapping
+from cache import LRUCache, file_fingerprint
+from embeddings import model_fingerprint
+from ner import Ner
+from phrases import PhraseIndex, phrase_tokens
+from similarity import TokenIndex, index_file_for
+
+def load_note_categories(note_categories_file='note_categories.csv'):
+    """
+        Reads the note category CSV and indexes the note names of every category.
+
+        Args:
+            note_categories_file (str): The path to the note category CSV.
+
+        Returns:
+            tuple: The CSV as a DataFrame, and a dictionary of the note names of every category as arrays.
+    """
+    note_class_data = pd.read_csv(note_categories_file, encoding='latin-1', sep=';', on_bad_lines='warn')
+    category_notes = {category: notes.to_numpy(dtype=object)
+                      for category, notes in note_class_data.groupby('Category', sort=False)['Note Name']}
+    return note_class_data, category_notes
+
+def max_random_notes(category_notes):
+    """
+        Returns the most random notes any category can give, as they are drawn without replacement.
+
+        Args:
+            category_notes (dict): The note names of every category, see load_note_categories().
+
+        Returns:
+            int: The size of the smallest category.
+    """
+    return min((len(notes) for notes in category_notes.values()), default=0)
+
+class Recommender():
+    "Class that keeps the mapping, note categories, spaCy pipeline and embeddings in memory to predict fragrance notes"
+    def __init__(self, model, mapping_file='token_note_mapping.pkl', note_categories_file='note_categories.csv', ner=None,
+                 search='exact', n_probe=8, cache_size=4096, cache_file=None, precision='float32'):
+        """
+        Initialises the Recommender object, loading every resource once.
+
+        Args:
+            model (KeyedVectors): The word embedding model.
+            mapping_file (str): The path to the token-note mapping pickle or .npz artifact.
+            note_categories_file (str): The path to the note category CSV.
+            ner (Ner): The keyword extractor to use, a new Ner is loaded if None.
+            search (str): Nearest-token search backend, 'exact' or the approximate 'ivf'.
+            n_probe (int): Number of clusters scanned per keyword in 'ivf' mode, higher is more accurate.
+            cache_size (int): Number of resolved keywords kept in the LRU cache, 0 disables it.
+            cache_file (str): Pickle file the keyword cache is loaded from and saved to with save_cache().
+            precision (str): Precision of the token matrix, 'float32', or 'float16' or 'int8' for a smaller quantized copy.
+        """
+        self.model = model
+        self.model_fingerprint = model_fingerprint(model)
+        self.mapping_file = mapping_file
+        self.search = search
+        self.n_probe = n_probe
+        self.precision = precision
+        self.cache_file = cache_file
+        self.keyword_cache = LRUCache(cache_size)
+        self.lock = threading.Lock()
+        self.load_mapping()
+        if cache_file is not None:
+            self.keyword_cache.load(cache_file)
+        with instrumentation.stage('load_note_categories'):
+            # Index the note names of every category once so predictions never filter the DataFrame
+            note_class_data, self.category_notes = load_note_categories(note_categories_file)
+            self.max_random_notes = max_random_notes(self.category_notes)
+        with instrumentation.stage('build_phrase_index'):
+            # Multi-word note names resolve to themselves like a direct note (volatility 0) and multi-word
+            # categories like an exact category (volatility 1). A single-word note name, e.g. "vanilla",
+            # resolves to its note directly when it is not a mapped token, instead of by similarity
+            self.phrase_index = PhraseIndex()
+            self.phrase_results = {}
+            self.note_words = {}
+            names = [(name, (name, 0)) for name in note_class_data['Note Name'].dropna().astype(str)]
+            names += [(category, (category, 1)) for category in self.category_notes]
+            for name, result in names:
+                tokens = phrase_tokens(name)
+                if len(tokens) > 1:
+                    name_id = self.phrase_index.add(name)
+                    self.phrase_results.setdefault(self.phrase_index.names[name_id], result)
+                elif tokens and result[1] == 0:
+                    self.note_words.setdefault(tokens[0], result)
+        with instrumentation.stage('load_ner'):
+            self.ner = ner if ner is not None else Ner()
+
+    def cache_fingerprint(self):
+        """
+        Returns what resolved keywords depend on: the mapping file, the search settings, the precision and the embedding model.
+
+        Returns:
+            tuple: The fingerprint of the current mapping and search configuration.
+        """
+        return (self.mapping_fingerprint, self.search, self.n_probe, self.precision, self.model_fingerprint)
+
+    def load_mapping(self):
+        """
+        Loads the mapping pickle or artifact, builds its token index and drops cached keywords resolved against an older mapping.
+        """
+        self.mapping_fingerprint = file_fingerprint(self.mapping_file)
+        with instrumentation.stage('load_mapping'):
+            self.mapping, embeddings = load_mapping(self.mapping_file, self.model)
+        with instrumentation.stage('build_token_index'):
+            self.token_index = TokenIndex(self.mapping.get_tokens(), self.model, search=self.search, n_probe=self.n_probe,
+                                          index_file=index_file_for(self.mapping_file), embeddings=embeddings,
+                                          precision=self.precision)
+        self.keyword_cache.validate(self.cache_fingerprint())
+
+    def refresh(self):
+        """
+        Reloads the mapping if its pickle changed on disk since it was loaded.
+
+        Returns:
+            bool: True if the mapping was reloaded.
+        """
+        if file_fingerprint(self.mapping_file) != self.mapping_fingerprint:
+            self.load_mapping()
+            return True
+        return False
+
+    def save_cache(self):
+        """
+        Saves the keyword cache to cache_file so it survives restarts.
+        """
+        if self.cache_file is not None:
+            self.keyword_cache.save(self.cache_file)
+
+    def cache_stats(self):
+        """
+        Returns the hit, miss and eviction counters of the keyword cache.
+
+        Returns:
+            dict: The keyword cache statistics.
+        """
+        return self.keyword_cache.stats()
+
+    def match_phrases(self, user_input, keywords):
+        """
+        Finds multi-word note names and categories in the input and uses them as keywords
+        in place of the keywords of their words, e.g. "Bitter Orange" for "bitter" and "orange".
+        A keyword is only replaced when all of its occurrences are inside matched names.
+
+        Args:
+            user_input (str): The user's input.
+            keywords (list): Keywords extracted from the input.
+
+        Returns:
+            list: The keywords, with each matched name at the position of the first keyword it replaces,
+                  or at the end if it replaces none.
+        """
+        tokens = phrase_tokens(user_input)
+        matches = self.phrase_index.find(tokens)
+        if not matches:
+            return keywords
+        instrumentation.count('phrase_matches', len(matches))
+        inside = [False] * len(tokens)
+        token_names = {}
+        for start, end, name_id in matches:
+            for position in range(start, end):
+                inside[position] = True
+                token_names.setdefault(tokens[position], []).append(self.phrase_index.names[name_id])
+        outside = {token for token, covered in zip(tokens, inside) if not covered}
+
+        phrased = []
+        added = set()
+        for keyword in keywords:
+            keyword_tokens = phrase_tokens(keyword)
+            if keyword_tokens and all(token in token_names and token not in outside for token in keyword_tokens):
+                names = token_names[keyword_tokens[0]]
+            else:
+                phrased.append(keyword)
+                continue
+            phrased.extend(name for name in dict.fromkeys(names) if name not in added)
+            added.update(names)
+        phrased.extend(name for name in dict.fromkeys(self.phrase_index.names[name_id] for _, _, name_id in matches)
+                       if name not in added)
+        return phrased
+
+    def resolve_keywords(self, keywords):
+        """
+        Resolves each keyword to a note and volatility, directly or through its most similar mapped token.
+
+        Args:
+            keywords (list): Keywords extracted from the user's input.
+
+        Returns:
+            list: One (note, volatility) tuple per keyword, (None, None) when nothing matches.
+        """
+        # The cache and a possible mapping reload are shared between server threads
+        with self.lock:
+            return self._resolve_keywords(keywords)
+
+    def _resolve_keywords(self, keywords):
+        """
+        Resolves keywords like resolve_keywords, without taking the lock.
+        """
+        self.refresh()
+        resolved = {keyword: self.keyword_cache.get(keyword) for keyword in dict.fromkeys(keywords)}
+        # Resolve every uncached unmapped keyword to its most similar mapped token in one matrix product
+        unmapped_keywords = [keyword for keyword, result in resolved.items()
+                             if result is None and keyword not in self.mapping and keyword not in self.phrase_results
+                             and keyword not in self.note_words]
+        nearest_tokens = dict(zip(unmapped_keywords, self.token_index.nearest_batch(unmapped_keywords)))
+        if instrumentation.is_enabled():
+            uncached = sum(result is None for result in resolved.values())
+            instrumentation.count('keywords', len(keywords))
+            instrumentation.count('keyword_cache_hits', len(resolved) - uncached)
+            instrumentation.count('direct_hits', uncached - len(unmapped_keywords))
+            instrumentation.count('similarity_fallbacks', len(unmapped_keywords))
+            instrumentation.count('oov_keywords', sum(keyword not in self.model.key_to_index for keyword in unmapped_keywords))
+
+        for keyword, result in resolved.items():
+            if result is None:
+                token = keyword if keyword in self.mapping else nearest_tokens.get(keyword)
+                if keyword in self.phrase_results:
+                    result = self.phrase_results[keyword]
+                elif token is None:
+                    result = self.note_words.get(keyword, (None, None))
+                else:
+                    result = (self.mapping.get_note_for_token(token), self.mapping.get_volatility(token))
+                resolved[keyword] = result
+                self.keyword_cache.put(keyword, result)
+        return [resolved[keyword] for keyword in keywords]
+
+    @instrumentation.instrumented('predict')
+    def predict(self, user_input, num_random_notes, seed=None):
+        """
+        Predict fragrance notes based on user input.
+
+        Args:
+            user_input (str): The user's input describing a memory related to a scent.
+            num_random_notes (int): The number of random notes to be generated per note category.
+            seed (int): Seed for choosing the random notes, None for a different choice on every call.
+
+        Returns:
+            dict: The predicted notes as lists under 'top_notes', 'middle_notes' and 'base_notes'.
+        """
+        with instrumentation.stage('extract_keywords'):
+            keywords = self.ner.extract_keywords(user_input)
+        with instrumentation.stage('match_phrases'):
+            keywords = self.match_phrases(user_input, keywords)
+        return self.predict_keywords(keywords, num_random_notes, seed)
+
+    def predict_keywords(self, keywords, num_random_notes, seed=None):
+        """
+        Predict fragrance notes from already extracted keywords.
+
+        Args:
+            keywords (list): Keywords extracted from the user's input.
+            num_random_notes (int): The number of random notes to be generated per note category.
+            seed (int): Seed for choosing the random notes, None for a different choice on every call.
+
+        Returns:
+            dict: The predicted notes as lists under 'top_notes', 'middle_notes' and 'base_notes'.
+        """
+        # Every request gets its own generator, so concurrent requests never share random state
+        rng = np.random.default_rng(seed)
+        base_notes, middle_notes, top_notes = [], [], []
+        with instrumentation.stage('resolve_keywords'):
+            resolved = self.resolve_keywords(keywords)
+        with instrumentation.stage('sample_notes'):
+            for predicted_class, volatility in resolved:
+                if volatility == 0 and predicted_class not in base_notes:
+                    base_notes.append(predicted_class)
+                else:
+                    if predicted_class is not None and predicted_class.isupper():
+                        category_notes = self.category_notes.get(predicted_class)
+                        if category_notes is not None:
+                            chosen_notes = rng.choice(category_notes, num_random_notes, replace=False).tolist()
+                        else:
+                            print("No notes found for the specified category.")
+                            break
+                        if volatility==1:
+                            for chosen_note in chosen_notes:
+                                if chosen_note not in base_notes and chosen_note not in middle_notes:
+                                    middle_notes.append(chosen_note)
+                        else:
+                            for chosen_note in chosen_notes:
+                                if chosen_note not in base_notes and chosen_note not in middle_notes and chosen_note not in top_notes:
+                                    top_notes.append(chosen_note)
+                    elif predicted_class is not None:
+                        if predicted_class not in base_notes and predicted_class not in middle_notes:
+                            middle_notes.append(predicted_class)
+
+        return {'top_notes': top_notes, 'middle_notes': middle_notes, 'base_notes': base_notes}
@@ -0,0 +1,214 @@
+"""
+Headless HTTP recommendation service.
+
+    python main.py --serve [--host 127.0.0.1] [--port 8000] [--workers 4] [--processes 0]
+
+Endpoints:
+    GET  /health     -> {"status": "ok", "pending": ..., "cache": {...}}
+    GET  /metrics    -> {"summary": {...}, "last_report": {...}} with --instrument, see instrumentation.py
+    POST /recommend  {"text": "...", "num_random_notes": 3, "seed": null}
+                     -> {"top_notes": [...], "middle_notes": [...], "base_notes": [...]}
+
+The models are loaded once before the server starts listening. Requests are parsed on
+an asyncio event loop and the CPU-bound keyword extraction and similarity search run in
+a bounded thread pool; once max_pending requests are in flight new ones get a 503.
+With --processes N they run in N pre-forked worker processes instead, see workers.py.
+"""
+import asyncio
+import json
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import instrumentation
+from main import is_valid_input
+
+MAX_BODY_BYTES = 64 * 1024
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+class RecommendationServer():
+    "Class that serves recommendations from a loaded Recommender over HTTP"
+    def __init__(self, recommender, workers=4, max_pending=64, num_random_notes=3, pool=None):
+        """
+        Initialises the RecommendationServer object.
+
+        Args:
+            recommender (Recommender): The loaded recommender.
+            workers (int): Number of threads running predictions.
+            max_pending (int): Number of requests accepted at once before answering 503.
+            num_random_notes (int): Default number of random notes per note category.
+            pool (WorkerPool): Worker processes running the predictions instead of the threads.
+        """
+        self.recommender = recommender
+        self.pool = pool
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_pending = max_pending
+        self.pending = 0
+        self.num_random_notes = num_random_notes
+
+    async def recommend(self, body):
+        """
+        Validates a /recommend request body and predicts its notes in the worker pool.
+
+        Args:
+            body (bytes): The JSON request body.
+
+        Returns:
+            tuple: The HTTP status and the JSON-serialisable response.
+        """
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            return 400, {'error': 'Request body must be JSON.'}
+        if not isinstance(request, dict):
+            return 400, {'error': 'Request body must be a JSON object.'}
+        text = request.get('text')
+        num_random_notes = request.get('num_random_notes', self.num_random_notes)
+        if not isinstance(text, str) or not text.strip():
+            return 400, {'error': 'Field "text" must be a non-empty string.'}
+        if not is_valid_input(text):
+            return 400, {'error': 'Please describe your memory in words! (No digits or symbols)'}
+        if not isinstance(num_random_notes, int) or isinstance(num_random_notes, bool) or num_random_notes < 1:
+            return 400, {'error': 'Field "num_random_notes" must be a positive integer.'}
+        if num_random_notes > self.recommender.max_random_notes:
+            return 400, {'error': 'Field "num_random_notes" must be at most %d, the size of the smallest note category.'
+                                  % self.recommender.max_random_notes}
+        seed = request.get('seed')
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+            return 400, {'error': 'Field "seed" must be a non-negative integer.'}
+        if self.pending >= self.max_pending:
+            return 503, {'error': 'Too many pending requests, try again later.'}
+
+        self.pending += 1
+        try:
+            if self.pool is not None:
+                prediction = await asyncio.wrap_future(self.pool.submit(text, num_random_notes, seed))
+            else:
+                loop = asyncio.get_running_loop()
+                prediction = await loop.run_in_executor(self.executor, self.recommender.predict, text, num_random_notes, seed)
+        except Exception:
+            # The request was valid, so any failure, e.g. a worker process exiting, is the service's
+            traceback.print_exc()
+            return 500, {'error': 'The recommendation failed, try again later.'}
+        finally:
+            self.pending -= 1
+        return 200, prediction
+
+    async def dispatch(self, method, path, body):
+        """
+        Routes a request to its endpoint.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path without query string.
+            body (bytes): The request body.
+
+        Returns:
+            tuple: The HTTP status and the JSON-serialisable response.
+        """
+        if path == '/health':
+            if method != 'GET':
+                return 405, {'error': 'Use GET.'}
+            if self.pool is not None:
+                # Every worker process has its own keyword cache
+                return 200, {'status': 'ok', 'pending': self.pending, 'processes': len(self.pool.processes)}
+            return 200, {'status': 'ok', 'pending': self.pending, 'cache': self.recommender.cache_stats()}
+        if path == '/metrics':
+            if method != 'GET':
+                return 405, {'error': 'Use GET.'}
+            if not instrumentation.is_enabled():
+                return 404, {'error': 'Instrumentation is off, start the service with --instrument.'}
+            return 200, {'summary': instrumentation.summary(), 'last_report': instrumentation.last_report()}
+        if path == '/recommend':
+            if method != 'POST':
+                return 405, {'error': 'Use POST.'}
+            return await self.recommend(body)
+        return 404, {'error': 'Not found.'}
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves HTTP/1.1 requests on one connection until the client closes it.
+
+        Args:
+            reader (asyncio.StreamReader): The connection's reader.
+            writer (asyncio.StreamWriter): The connection's writer.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                length = int(headers.get('content-length', 0) or 0)
+                if len(parts) != 3:
+                    status, response, keep_alive = 400, {'error': 'Malformed request line.'}, False
+                elif length > MAX_BODY_BYTES:
+                    status, response, keep_alive = 413, {'error': 'Request body too large.'}, False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, response = await self.dispatch(parts[0].upper(), parts[1].split('?')[0], body)
+
+                payload = json.dumps(response).encode('utf-8')
+                writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n'
+                              'Connection: %s\r\n\r\n' % (status, REASONS[status], len(payload),
+                                                          'keep-alive' if keep_alive else 'close')).encode('latin-1'))
+                writer.write(payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host, port):
+        """
+        Starts listening for connections.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on, 0 picks a free port.
+
+        Returns:
+            asyncio.Server: The listening server.
+        """
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+def serve(recommender, host='127.0.0.1', port=8000, workers=4, processes=0):
+    """
+        Runs the recommendation service until interrupted.
+
+        Args:
+            recommender (Recommender): The loaded recommender.
+            host (str): The address to listen on.
+            port (int): The port to listen on.
+            workers (int): Number of threads running predictions.
+            processes (int): Number of pre-forked worker processes running predictions, 0 uses the threads.
+    """
+    pool = None
+    if processes > 0:
+        from workers import WorkerPool
+        # Fork before the event loop and the thread pool start any threads
+        pool = WorkerPool(recommender, processes)
+
+    async def run():
+        server = await RecommendationServer(recommender, workers=workers, pool=pool).start(host, port)
+        print("Serving recommendations on http://%s:%d" % (host, port))
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if pool is not None:
+            pool.close()
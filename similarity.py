@@ -0,0 +1,205 @@
+import os
+import numpy as np
+from embeddings import model_fingerprint
+from neighbours import ExactSearch, IVFSearch
+from quantized import QuantizedMatrix, quantize, similarities
+
+def normalise_rows(matrix):
+    """
+        L2-normalise every row of a matrix, leaving all-zero rows as zeros.
+
+        Args:
+            matrix (numpy.ndarray): A 2-D array of embeddings.
+
+        Returns:
+            numpy.ndarray: The row-normalised matrix.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def embedding_matrix(words, model):
+    """
+        Stack the embeddings of the given words into a row-normalised matrix.
+
+        Args:
+            words (list): Words that are all present in the model's vocabulary.
+            model (KeyedVectors): The word embedding model.
+
+        Returns:
+            numpy.ndarray: A (len(words), vector_size) float32 matrix.
+    """
+    if not words:
+        return np.zeros((0, model.vector_size), dtype=np.float32)
+    indices = [model.key_to_index[word] for word in words]
+    return normalise_rows(np.asarray(model.vectors[indices], dtype=np.float32))
+
+def index_file_for(pickle_file):
+    """
+        Returns the path of the approximate search index saved next to a mapping pickle.
+
+        Args:
+            pickle_file (str): The path to the mapping pickle.
+
+        Returns:
+            str: The path of the .npz index file.
+    """
+    return os.path.splitext(pickle_file)[0] + '.ivf.npz'
+
+class TokenIndex():
+    "Class that answers nearest mapped token queries with a precomputed embedding matrix"
+    def __init__(self, tokens, model, search='exact', n_probe=8, index_file=None, embeddings=None, precision='float32'):
+        """
+        Initialises the TokenIndex object.
+        Tokens missing from the model's vocabulary are skipped, just like calculate_similarity does.
+
+        Args:
+            tokens (list): The mapped tokens to search, in mapping order.
+            model (KeyedVectors): The word embedding model.
+            search (str): 'exact' to scan every token, 'ivf' to only scan the closest clusters.
+            n_probe (int): Number of clusters scanned per query in 'ivf' mode.
+            index_file (str): A saved 'ivf' index to reuse; it is rebuilt if missing or built for other tokens or another model.
+            embeddings (tuple): Precomputed (in-vocabulary tokens, normalised matrix), e.g. from a mapping artifact.
+            precision (str): 'float32', or 'float16' or 'int8' to keep the matrix quantized, see quantized.py.
+        """
+        self.model = model
+        if embeddings is not None:
+            self.tokens, matrix = list(embeddings[0]), embeddings[1]
+        else:
+            self.tokens = [token for token in tokens if token in model.key_to_index]
+            matrix = embedding_matrix(self.tokens, model)
+        self.matrix = quantize(matrix, precision)
+        self.backend = ExactSearch(self.matrix)
+        if search == 'ivf' and self.tokens:
+            ivf = None
+            if index_file is not None and os.path.exists(index_file):
+                ivf = IVFSearch.load(index_file, self.matrix, self.tokens, n_probe, model_fingerprint(model))
+            if ivf is None:
+                # The clusters are trained on the float32 rows, the inverted lists are scanned at the chosen precision
+                ivf = IVFSearch.build(matrix, n_probe=n_probe)
+                ivf.matrix = self.matrix
+            self.backend = ivf
+        elif search not in ('exact', 'ivf'):
+            raise ValueError("Unknown search backend: %s" % search)
+
+    def save_index(self, index_file):
+        """
+        Saves the 'ivf' clustering so later TokenIndex objects for the same tokens and model can reuse it.
+
+        Args:
+            index_file (str): The path of the .npz index file.
+        """
+        if isinstance(self.backend, IVFSearch):
+            self.backend.save(index_file, self.tokens, model_fingerprint(self.model))
+
+    def scores(self, keywords):
+        """
+        Returns the cosine similarity of every keyword against every indexed token.
+
+        Args:
+            keywords (list): Keywords that are all present in the model's vocabulary.
+
+        Returns:
+            numpy.ndarray: A (len(keywords), len(tokens)) matrix of similarities.
+        """
+        return similarities(embedding_matrix(keywords, self.model), self.matrix)
+
+    def nearest(self, keyword):
+        """
+        Returns the indexed token most similar to the keyword.
+
+        Args:
+            keyword (str): The keyword to resolve.
+
+        Returns:
+            str: The most similar token, or None if nothing scores above zero.
+        """
+        return self.nearest_batch([keyword])[0]
+
+    def nearest_batch(self, keywords):
+        """
+        Returns the most similar indexed token for each keyword.
+        Ties go to the earliest token and only scores strictly above zero count,
+        which matches a running "similarity > max_similarity" loop started at 0.
+
+        Args:
+            keywords (list): The keywords to resolve.
+
+        Returns:
+            list: The most similar token per keyword, or None where no token qualifies.
+        """
+        results = [None] * len(keywords)
+        known = [i for i, keyword in enumerate(keywords) if keyword in self.model.key_to_index]
+        if not known or not self.tokens:
+            return results
+        best, best_scores = self.backend.search(embedding_matrix([keywords[i] for i in known], self.model))
+        for row, i in enumerate(known):
+            if best_scores[row] > 0:
+                results[i] = self.tokens[best[row]]
+        return results
+
+def first_best(scores):
+    """
+        Returns the position of the first strictly greatest score above zero.
+        Missing scores (NaN) are ignored, matching a running "similarity > max_similarity" loop started at 0.
+
+        Args:
+            scores (numpy.ndarray): A 1-D array of similarities.
+
+        Returns:
+            int: The position of the best score, or None if no score is above zero.
+    """
+    if len(scores) == 0:
+        return None
+    filled = np.where(np.isnan(scores), -np.inf, scores)
+    best = int(np.argmax(filled))
+    if filled[best] > 0:
+        return best
+    return None
+
+class WordMatrix():
+    "Class that holds normalised embeddings of a fixed vocabulary, e.g. note names or note categories"
+    def __init__(self, words, model, precision='float32'):
+        """
+        Initialises the WordMatrix object.
+        Duplicates and words missing from the model's vocabulary are dropped.
+
+        Args:
+            words (list): The vocabulary to embed.
+            model (KeyedVectors): The word embedding model.
+            precision (str): 'float32', or 'float16' or 'int8' to keep the matrix quantized, see quantized.py.
+        """
+        self.model = model
+        known = [word for word in dict.fromkeys(words) if word in model.key_to_index]
+        self.rows = {word: row for row, word in enumerate(known)}
+        self.matrix = quantize(embedding_matrix(known, model), precision)
+
+    def scores(self, keywords, words):
+        """
+        Returns the cosine similarity of every keyword against every word.
+
+        Args:
+            keywords (list): The keywords to score.
+            words (list): Words of this matrix's vocabulary, in the order the columns should follow.
+
+        Returns:
+            numpy.ndarray: A (len(keywords), len(words)) matrix, NaN wherever either word has no embedding.
+        """
+        result = np.full((len(keywords), len(words)), np.nan, dtype=np.float32)
+        keyword_positions = [i for i, keyword in enumerate(keywords) if keyword in self.model.key_to_index]
+        word_positions = [j for j, word in enumerate(words) if word in self.rows]
+        if keyword_positions and word_positions:
+            keyword_matrix = embedding_matrix([keywords[i] for i in keyword_positions], self.model)
+            word_matrix = self.matrix[[self.rows[words[j]] for j in word_positions]]
+            scores = similarities(keyword_matrix, word_matrix)
+            if isinstance(word_matrix, QuantizedMatrix):
+                # A word scored against itself keeps its float32 similarity, so the training rules that compare
+                # scores with 1 treat a keyword equal to a note or category as they do at float32
+                word_columns = {}
+                for column, j in enumerate(word_positions):
+                    word_columns.setdefault(words[j], []).append(column)
+                for row, i in enumerate(keyword_positions):
+                    for column in word_columns.get(keywords[i], ()):
+                        scores[row, column] = keyword_matrix[row] @ keyword_matrix[row]
+            result[np.ix_(keyword_positions, word_positions)] = scores
+        return result
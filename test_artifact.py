@@ -0,0 +1,81 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from gensim.models import KeyedVectors
+from artifact import ARTIFACT_VERSION, convert_pickle, load_artifact, load_mapping, save_artifact
+from mapping import Mapping
+
+class TestArtifact(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'mapping.npz')
+        self.mapping = Mapping(os.path.join(self.directory.name, 'mapping.pkl'))
+        self.mapping.add_mapping('warm', 'amber', 1)
+        self.mapping.add_mapping('rose', 'rose', 0)
+        self.mapping.add_mapping('sweet', 'SWEETS AND GOURMAND SMELLS', 2)
+        self.mapping.add_mapping('honey', 'amber', 1)
+        self.model = KeyedVectors(3)
+        self.model.add_vectors(['warm', 'rose', 'honey'], np.array([[1, 0, 0], [0, 2, 0], [0, 0, 3]], dtype=np.float32))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        # Test that every mapping survives saving and loading
+        save_artifact(self.mapping, self.path)
+        loaded, embeddings = load_artifact(self.path)
+        self.assertEqual(loaded.get_mappings(), self.mapping.get_mappings())
+        self.assertEqual(loaded.get_tokens_for_note('amber'), ['warm', 'honey'])
+        self.assertEqual(loaded.pickle_file, os.path.join(self.directory.name, 'mapping.pkl'))
+        self.assertIsNone(embeddings)
+
+    def test_embeddings_for_same_model_only(self):
+        # Test that stored embeddings are returned only for the model they came from
+        save_artifact(self.mapping, self.path, self.model)
+        _, embeddings = load_artifact(self.path, self.model)
+        self.assertEqual(embeddings[0], ['warm', 'rose', 'honey'])
+        np.testing.assert_allclose(embeddings[1], np.eye(3))
+        other_model = KeyedVectors(3)
+        other_model.add_vectors(['warm'], np.ones((1, 3), dtype=np.float32))
+        self.assertIsNone(load_artifact(self.path, other_model)[1])
+        # A model of the same size and dtype with other vectors does not reuse them either
+        same_size_model = KeyedVectors(3)
+        same_size_model.add_vectors(['warm', 'rose', 'honey'], np.eye(3, dtype=np.float32)[::-1].copy())
+        self.assertIsNone(load_artifact(self.path, same_size_model)[1])
+
+    def test_rejects_newer_version_and_other_files(self):
+        # Test that unsupported versions and foreign .npz files are refused
+        np.savez(self.path, format=np.array('otm-mapping'), version=np.array(ARTIFACT_VERSION + 1))
+        with self.assertRaises(ValueError):
+            load_artifact(self.path)
+        np.savez(self.path, data=np.zeros(3))
+        with self.assertRaises(ValueError):
+            load_artifact(self.path)
+        for write in (lambda path: np.savez_compressed(path, format=np.array('otm-mapping')),
+                      lambda path: np.savez(path, format=np.array(['otm-mapping'], dtype=object)),
+                      lambda path: open(path, 'wb').write(b'not a zip file')):
+            write(self.path)
+            with self.assertRaises(ValueError):
+                load_artifact(self.path)
+
+    def test_embeddings_memory_mapped(self):
+        # Test that stored embeddings are a read-only view of the file that survives the file being saved again
+        save_artifact(self.mapping, self.path, self.model)
+        _, (_, matrix) = load_artifact(self.path, self.model)
+        self.assertFalse(matrix.flags.owndata or matrix.flags.writeable)
+        self.mapping.add_mapping('musk', 'musk', 0)
+        save_artifact(self.mapping, self.path, self.model)
+        np.testing.assert_allclose(matrix, np.eye(3))
+        self.assertEqual(len(load_artifact(self.path)[0]), 5)
+
+    def test_convert_pickle(self):
+        # Test converting a pickle and loading either format through load_mapping
+        self.mapping.save_to_pickle()
+        convert_pickle(self.mapping.pickle_file, self.path)
+        from_artifact, _ = load_mapping(self.path)
+        from_pickle, _ = load_mapping(self.mapping.pickle_file)
+        self.assertEqual(from_artifact.get_mappings(), from_pickle.get_mappings())
+
+if __name__ == '__main__':
+    unittest.main()
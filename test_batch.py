@@ -0,0 +1,63 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+from batch import chunked, read_rows, run
+from test_recommender import small_recommender
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_read_jsonl(self):
+        # Test streaming rows from JSONL, skipping blank lines
+        path = self.write_file('memories.jsonl', '{"id": "a", "text": "warm wood"}\n\n{"id": "b", "text": "sweet pie"}\n')
+        self.assertEqual(list(read_rows(path, id_field='id')), [(0, 'a', 'warm wood'), (1, 'b', 'sweet pie')])
+
+    def test_read_csv(self):
+        # Test streaming rows from CSV with a custom text column
+        path = self.write_file('memories.csv', 'memory,user\nwarm wood,1\n"sweet, pie",2\n')
+        self.assertEqual(list(read_rows(path, text_field='memory')), [(0, None, 'warm wood'), (1, None, 'sweet, pie')])
+
+    def test_chunked(self):
+        # Test that chunks keep order and the last chunk may be short
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_run(self):
+        # Test that results are written in order, with errors for invalid rows
+        pickle_file = os.path.join(self.directory.name, 'mappings.pkl')
+        recommender = small_recommender(pickle_file)
+        rows = [(0, None, 'vanilla timber'), (1, None, 'July 2024'), (2, None, 'wood'), (3, None, None)]
+        output = io.StringIO()
+        self.assertEqual(run(rows, output, chunk_size=3, recommender=recommender), 4)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([result['row'] for result in results], [0, 1, 2, 3])
+        self.assertEqual(results[0]['base_notes'], ['vanilla'])
+        self.assertEqual(results[0]['middle_notes'], ['cedar'])
+        self.assertIn('error', results[1])
+        self.assertEqual(results[2]['keywords'], ['wood'])
+        self.assertEqual(results[3]['error'], 'Missing text.')
+
+    def test_too_many_random_notes(self):
+        # Test that more random notes than the smallest category holds are rejected before any row is written
+        pickle_file = os.path.join(self.directory.name, 'mappings.pkl')
+        recommender = small_recommender(pickle_file)
+        output = io.StringIO()
+        with self.assertRaises(ValueError):
+            run([(0, None, 'cold'), (1, None, 'cold')], output, num_random_notes=recommender.max_random_notes + 1,
+                recommender=recommender)
+        self.assertEqual(output.getvalue(), '')
+        self.assertEqual(run([(0, None, 'cold')], output, num_random_notes=recommender.max_random_notes, recommender=recommender), 1)
+
+if __name__ == '__main__':
+    unittest.main()
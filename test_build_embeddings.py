@@ -0,0 +1,41 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from gensim.models import KeyedVectors
+from build_embeddings import domain_vocabulary, export_subset
+from embeddings import load_model
+
+class TestBuildEmbeddings(unittest.TestCase):
+    def setUp(self):
+        # Build a model holding a few domain words and some frequent words
+        self.words = ['the', 'Paris', 'warm', 'sweet', 'vanilla', 'spices', 'rose', 'xylophone']
+        self.model = KeyedVectors(4)
+        self.model.add_vectors(self.words, np.random.default_rng(0).standard_normal((len(self.words), 4)).astype(np.float32))
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_domain_vocabulary(self):
+        # Test that only known domain words and the top lower-case frequent words are kept
+        vocabulary = domain_vocabulary(self.model, top_n=2)
+        self.assertIn('spices', vocabulary)
+        self.assertIn('rose', vocabulary)
+        self.assertIn('the', vocabulary)
+        self.assertIn('warm', vocabulary)
+        self.assertNotIn('Paris', vocabulary)
+        self.assertNotIn('xylophone', vocabulary)
+        self.assertEqual(len(vocabulary), len(set(vocabulary)))
+
+    def test_export_subset_float16(self):
+        # Test that the exported file loads memory-mapped with the chosen precision
+        destination = os.path.join(self.directory.name, 'subset.kv')
+        export_subset(self.model, ['warm', 'rose'], destination, float16=True)
+        subset = load_model(destination)
+        self.assertEqual(subset.index_to_key, ['warm', 'rose'])
+        self.assertEqual(subset.vectors.dtype, np.float16)
+        np.testing.assert_allclose(subset['rose'], self.model['rose'], rtol=1e-3, atol=1e-3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import os
+import tempfile
+from cache import LRUCache, file_fingerprint
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction_order(self):
+        # Test that the least recently used entry is evicted first
+        cache = LRUCache(2)
+        cache.put('warm', 1)
+        cache.put('sweet', 2)
+        cache.get('warm')
+        cache.put('wood', 3)
+        self.assertIn('warm', cache)
+        self.assertNotIn('sweet', cache)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_counters(self):
+        # Test hit, miss and hit rate counting
+        cache = LRUCache(10)
+        cache.put('warm', 1)
+        self.assertEqual(cache.get('warm'), 1)
+        self.assertIsNone(cache.get('christmas'))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_disabled(self):
+        # Test that a size of 0 never stores anything
+        cache = LRUCache(0)
+        cache.put('warm', 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_validate(self):
+        # Test that a new fingerprint clears the entries
+        cache = LRUCache(10, fingerprint='a')
+        cache.put('warm', 1)
+        self.assertTrue(cache.validate('a'))
+        self.assertFalse(cache.validate('b'))
+        self.assertEqual(len(cache), 0)
+
+    def test_save_and_load(self):
+        # Test that saved entries only load for the same fingerprint
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.pkl')
+            cache = LRUCache(10, fingerprint='a')
+            cache.put('warm', ('vanilla', 0))
+            cache.save(path)
+            restored = LRUCache(10, fingerprint='a')
+            self.assertTrue(restored.load(path))
+            self.assertEqual(restored.get('warm'), ('vanilla', 0))
+            self.assertFalse(LRUCache(10, fingerprint='b').load(path))
+
+    def test_file_fingerprint(self):
+        # Test that rewriting a file changes its fingerprint
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.txt')
+            self.assertIsNone(file_fingerprint(path))
+            with open(path, 'w') as f:
+                f.write('a')
+            before = file_fingerprint(path)
+            with open(path, 'w') as f:
+                f.write('ab')
+            self.assertNotEqual(file_fingerprint(path), before)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from gensim.models import KeyedVectors
+import embeddings
+
+class TestEmbeddings(unittest.TestCase):
+    def setUp(self):
+        # Save a small model in the KeyedVectors format
+        self.directory = tempfile.TemporaryDirectory()
+        self.model_file = os.path.join(self.directory.name, 'small.kv')
+        model = KeyedVectors(4)
+        model.add_vectors(['wood', 'rose'], np.array([[1, 0, 0, 0], [0, 1, 0, 0]], dtype=np.float32))
+        model.save(self.model_file, sep_limit=0)
+
+    def tearDown(self):
+        embeddings.set_model_path(None)
+        self.directory.cleanup()
+
+    def test_model_loaded_lazily_from_configured_path(self):
+        # Test that nothing is loaded until the model is first requested
+        embeddings.set_model_path(self.model_file)
+        self.assertIsNone(embeddings.model)
+        model = embeddings.get_model()
+        self.assertIs(embeddings.get_model(), model)
+        self.assertEqual(model.key_to_index, {'wood': 0, 'rose': 1})
+        self.assertIsInstance(model.vectors, np.memmap)
+
+    def test_model_path_from_environment(self):
+        # Test that the environment variable selects the file when no path is set
+        embeddings.set_model_path(None)
+        os.environ[embeddings.MODEL_PATH_ENV] = self.model_file
+        try:
+            self.assertIn('rose', embeddings.get_model().key_to_index)
+        finally:
+            del os.environ[embeddings.MODEL_PATH_ENV]
+
+    def test_injected_model(self):
+        # Test that an injected model is returned without touching disk
+        model = KeyedVectors(2)
+        embeddings.set_model(model)
+        self.assertIs(embeddings.get_model(), model)
+
+if __name__ == '__main__':
+    unittest.main()
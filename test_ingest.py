@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from ingest import RowCache, iter_training_chunks, parse_notes, staged
+
+class TestParseNotes(unittest.TestCase):
+    def test_parse_notes(self):
+        # Test that notes are split on commas and stripped, and empty fields give no notes
+        self.assertEqual(parse_notes('Rose, Amber ,Musk'), ['Rose', 'Amber', 'Musk'])
+        self.assertEqual(parse_notes(float('nan')), [])
+
+class TestIterTrainingChunks(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.training_file = os.path.join(self.directory.name, 'training.csv')
+        with open(self.training_file, 'w', encoding='latin-1') as f:
+            f.write('Description,Notes\n')
+            for number in range(5):
+                f.write('"description %d","Rose,Note %d"\n' % (number, number))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_chunks(self):
+        # Test that rows are streamed in file order and in chunks of at most chunk_size
+        chunks = list(iter_training_chunks(self.training_file, chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(chunks[0][1], ('description 1', ['Rose', 'Note 1']))
+
+    def test_skip_rows(self):
+        # Test that skipped rows may span several chunks
+        chunks = list(iter_training_chunks(self.training_file, chunk_size=2, skip_rows=3))
+        self.assertEqual([[description for description, _ in chunk] for chunk in chunks],
+                         [['description 3'], ['description 4']])
+
+class TestStaged(unittest.TestCase):
+    def test_results_in_order(self):
+        # Test that a stage returns every result in input order
+        self.assertEqual(list(staged(staged(range(10), lambda x: x * 2), lambda x: x + 1, max_pending=1)),
+                         [x * 2 + 1 for x in range(10)])
+
+    def test_error_is_raised(self):
+        # Test that an exception in the stage's thread is raised by the reader
+        def fail(x):
+            if x == 3:
+                raise KeyError(x)
+            return x
+        with self.assertRaises(KeyError):
+            list(staged(range(10), fail))
+
+class TestRowCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'rows.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        # Test that rows and scoring settings survive closing and reopening the file
+        rows = RowCache(self.path)
+        rows.set_scoring([0.8, 'model'])
+        rows.put_many([('a', ['rose', 'wood'], [('rose', 'rose', 0)]), ('b', ['rain'], None)])
+        rows.close()
+
+        rows = RowCache(self.path)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows.get_scoring(), [0.8, 'model'])
+        self.assertEqual(rows.get_many(['a', 'b', 'c']), {'a': (['rose', 'wood'], [('rose', 'rose', 0)]), 'b': (['rain'], None)})
+        rows.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+import instrumentation
+
+class TestInstrumentation(unittest.TestCase):
+    def tearDown(self):
+        instrumentation.disable()
+
+    def test_off_by_default(self):
+        # Test that stages and counters are no-ops while instrumentation is off
+        self.assertFalse(instrumentation.is_enabled())
+        self.assertIs(instrumentation.stage('extract_keywords'), instrumentation.NO_STAGE)
+        with instrumentation.call('predict_notes') as report:
+            instrumentation.count('keywords', 3)
+        self.assertIsNone(report)
+        self.assertIsNone(instrumentation.summary())
+
+    def test_report(self):
+        # Test that a call reports the time of its stages and its counters
+        instrumentation.enable()
+        with instrumentation.call('predict_notes'):
+            with instrumentation.stage('extract_keywords'):
+                pass
+            with instrumentation.stage('extract_keywords'):
+                pass
+            instrumentation.count('keywords', 3)
+            instrumentation.count('oov_keywords')
+        report = instrumentation.last_report()
+        self.assertEqual(report['name'], 'predict_notes')
+        self.assertEqual(set(report['stages']), {'extract_keywords'})
+        self.assertGreaterEqual(report['total_ms'], report['stages']['extract_keywords'])
+        self.assertEqual(report['counters'], {'keywords': 3, 'oov_keywords': 1})
+        self.assertIn('extract_keywords', instrumentation.format_report(report))
+
+    def test_histograms(self):
+        # Test that every call and stage feeds its own histogram and counters are totalled
+        instrumentation.enable()
+        for _ in range(3):
+            with instrumentation.call('predict_notes'):
+                with instrumentation.stage('resolve_keywords'):
+                    instrumentation.count('similarity_calls', 2)
+        with instrumentation.stage('load_mapping'):
+            pass
+        summary = instrumentation.summary()
+        self.assertEqual(summary['histograms']['predict_notes']['count'], 3)
+        self.assertEqual(summary['histograms']['predict_notes.resolve_keywords']['count'], 3)
+        self.assertEqual(sum(summary['histograms']['load_mapping']['buckets'].values()), 1)
+        self.assertEqual(summary['counters'], {'similarity_calls': 6})
+
+    def test_nested_call_is_a_stage(self):
+        # Test that a call inside another call is timed as one of its stages
+        instrumentation.enable()
+        with instrumentation.call('predict_notes'):
+            with instrumentation.call('predict'):
+                pass
+        self.assertEqual(list(instrumentation.last_report()['stages']), ['predict'])
+
+    def test_explicit_report_from_thread(self):
+        # Test that worker threads add to the report they are given
+        instrumentation.enable()
+        with instrumentation.call('generate_mappings') as report:
+            thread = threading.Thread(target=lambda: instrumentation.count('keywords', 5, report))
+            thread.start()
+            thread.join()
+        self.assertEqual(instrumentation.last_report()['counters'], {'keywords': 5})
+
+    def test_profile_dump(self):
+        # Test that calls run under cProfile and the stats are written when instrumentation is turned off
+        with tempfile.TemporaryDirectory() as directory:
+            profile_file = os.path.join(directory, 'calls.prof')
+            instrumentation.enable(profile_file)
+            with instrumentation.call('predict_notes'):
+                sorted(range(1000))
+            instrumentation.disable()
+            self.assertGreater(pstats.Stats(profile_file).total_calls, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,24 @@
+import os
+import tempfile
 import unittest
-from main import calculate_similarity, predict_notes
+import numpy as np
+from gensim.models import KeyedVectors
+import embeddings
+import instrumentation
+from main import CATEGORIES, calculate_similarity, generate_mappings, map_keywords, predict_notes
+from mapping import Mapping
+from similarity import WordMatrix
+
+def setUpModule():
+    # Use a small local stand-in instead of the GoogleNews vectors
+    model = KeyedVectors(4)
+    model.add_vectors(['dog', 'cat', 'wood', 'forest', 'test', 'input'],
+                      np.array([[1, 0.8, 0, 0], [0.9, 1, 0, 0], [0, 0, 1, 0.7], [0, 0.1, 0.8, 1],
+                                [0.5, 0.5, 0.5, 0], [0, 0.5, 0.5, 0.5]], dtype=np.float32))
+    embeddings.set_model(model)
+
+def tearDownModule():
+    embeddings.set_model(None)
 
 class TestCalculateSimilarity(unittest.TestCase):
     def test_calculate_similarity(self):
@@ -24,5 +43,128 @@ class TestPredictNotes(unittest.TestCase):
         result = predict_notes(user_input, num_random_notes)
         self.assertIsInstance(result, str)
 
+class TestMapKeywords(unittest.TestCase):
+    def setUp(self):
+        # Build a tiny embedding model where "amber" is close to "resin"
+        self.model = KeyedVectors(3)
+        self.model.add_vectors(['amber', 'resin', 'flowers', 'petal', 'rain'],
+                               np.array([[1, 0, 0], [0.9, 0.1, 0], [0, 1, 0], [0.1, 1, 0], [0, 0, 1]], dtype=np.float32))
+        self.notes = ['amber', 'rose']
+        self.note_matrix = WordMatrix(self.notes, self.model)
+        self.category_matrix = WordMatrix([category.lower() for category in CATEGORIES], self.model)
+        self.mapping = Mapping('test_mappings.pkl')
+
+    def test_volatility_levels(self):
+        # Test direct note, similar note and similar category mappings
+        map_keywords(self.mapping, ['rose'], self.notes, self.note_matrix, self.category_matrix, 0.8)
+        map_keywords(self.mapping, ['resin'], self.notes, self.note_matrix, self.category_matrix, 0.8)
+        map_keywords(self.mapping, ['petal'], self.notes, self.note_matrix, self.category_matrix, 0.8)
+        self.assertEqual(self.mapping.get_mapping('rose'), {'token': 'rose', 'note': 'rose', 'volatility': 0})
+        self.assertEqual(self.mapping.get_note_for_token('resin'), 'amber')
+        self.assertEqual(self.mapping.get_volatility('resin'), 1)
+        self.assertEqual(self.mapping.get_note_for_token('petal'), 'FLOWERS')
+        self.assertEqual(self.mapping.get_volatility('petal'), 2)
+
+    def test_quantized_matrices(self):
+        # Test that quantized note and category matrices map like float32 and a word keeps its float32 score against itself
+        expected = self.category_matrix.scores(['flowers'], ['flowers'])
+        for precision in ('float16', 'int8'):
+            mapping = Mapping('test_mappings.pkl')
+            note_matrix = WordMatrix(self.notes, self.model, precision)
+            category_matrix = WordMatrix([category.lower() for category in CATEGORIES], self.model, precision)
+            for keyword in ['resin', 'petal']:
+                map_keywords(mapping, [keyword], self.notes, note_matrix, category_matrix, 0.8)
+            self.assertEqual(mapping.get_mapping('resin'), {'token': 'resin', 'note': 'amber', 'volatility': 1})
+            self.assertEqual(mapping.get_mapping('petal'), {'token': 'petal', 'note': 'FLOWERS', 'volatility': 2})
+            self.assertEqual(category_matrix.scores(['flowers'], ['flowers']), expected)
+
+    def test_direct_note_needs_whole_word(self):
+        # Test that a note only maps directly when it contains the keyword as a whole word
+        notes = ['primrose', 'damask rose']
+        map_keywords(self.mapping, ['rose'], notes, WordMatrix(notes, self.model), self.category_matrix, 0.8)
+        self.assertEqual(self.mapping.get_mapping('rose'), {'token': 'rose', 'note': 'damask rose', 'volatility': 0})
+
+    def test_keyword_after_removed_keyword_is_skipped(self):
+        # Test that the keyword following a mapped one is skipped, as in the original training loop
+        map_keywords(self.mapping, ['rose', 'resin'], self.notes, self.note_matrix, self.category_matrix, 0.8)
+        self.assertIsNone(self.mapping.get_mapping('resin'))
+
+class WordNer():
+    "Class that extracts every word of a description as a keyword and records the descriptions it was given"
+    def __init__(self):
+        self.descriptions = []
+        self.n_processes = []
+
+    def extract_keywords_batch(self, descriptions, batch_size=64, n_process=1):
+        self.descriptions.extend(descriptions)
+        self.n_processes.append(n_process)
+        return [description.lower().split() for description in descriptions]
+
+class TestGenerateMappings(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.training_file = os.path.join(self.directory.name, 'training.csv')
+        self.pickle_file = os.path.join(self.directory.name, 'mapping.pkl')
+        self.rows = [('ignored first row', 'Dog'), ('dog wood', 'Dog,Wood'), ('cat', 'Forest')]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_training_set(self, rows):
+        with open(self.training_file, 'w', encoding='latin-1') as f:
+            f.write('Description,Notes\n')
+            for description, notes in rows:
+                f.write('"%s","%s"\n' % (description, notes))
+
+    def train(self, incremental=True, n_process=1):
+        ner = WordNer()
+        mapping = generate_mappings(0.8, self.training_file, self.pickle_file, n_process=n_process, incremental=incremental, ner=ner)
+        return mapping, ner
+
+    def test_only_new_rows_are_extracted(self):
+        # Test that a rerun only extracts the keywords of appended rows and matches a full rebuild
+        self.write_training_set(self.rows)
+        _, ner = self.train()
+        self.assertEqual(ner.descriptions, ['dog wood', 'cat'])
+
+        self.write_training_set(self.rows + [('forest input', 'Wood')])
+        mapping, ner = self.train()
+        self.assertEqual(ner.descriptions, ['forest input'])
+        full_mapping, _ = self.train(incremental=False)
+        self.assertEqual(mapping.get_mappings(), full_mapping.get_mappings())
+        self.assertEqual(mapping.get_note_for_token('forest'), 'wood')
+
+    def test_given_extractor_never_forks(self):
+        # Test that a given keyword extractor runs in one process, as it is called from a pipeline thread
+        self.write_training_set(self.rows)
+        _, ner = self.train(n_process=-1)
+        self.assertEqual(ner.n_processes, [1])
+
+    def test_instrumented_training(self):
+        # Test that an instrumented training run reports its stages and row and keyword counters
+        self.write_training_set(self.rows)
+        instrumentation.enable()
+        try:
+            self.train()
+            report = instrumentation.last_report()
+        finally:
+            instrumentation.disable()
+        self.assertEqual(report['name'], 'generate_mappings')
+        self.assertTrue({'read_csv', 'look_up_rows', 'extract_keywords', 'score_rows', 'merge_rows'} <= set(report['stages']))
+        self.assertEqual(report['counters']['rows'], 2)
+        self.assertEqual(report['counters']['keywords'], 3)
+        # 'wood' follows the direct hit 'dog' and is skipped
+        self.assertEqual((report['counters']['direct_hits'], report['counters']['similarity_fallbacks']), (1, 1))
+
+    def test_changed_row_replaces_its_mappings(self):
+        # Test that the mappings of an edited row are dropped instead of merged with the new ones
+        self.write_training_set(self.rows)
+        self.train()
+        self.write_training_set([self.rows[0], ('dog wood', 'Dog,Wood'), ('input', 'Forest')])
+        mapping, ner = self.train()
+        self.assertEqual(ner.descriptions, ['input'])
+        self.assertNotIn('cat', mapping)
+        self.assertIn('input', mapping)
+
 if __name__ == '__main__':
     unittest.main()
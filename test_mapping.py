@@ -86,5 +86,45 @@ class TestMapping(unittest.TestCase):
         self.assertEqual(saved_mappings.get_mappings()[0]['note'], 'note1')
         self.assertEqual(saved_mappings.get_mappings()[0]['volatility'], 0)
 
+    def test_update_lower_volatility(self):
+        # Test that a lower volatility replaces the note and moves the token between indexes
+        self.mapping.add_mapping('token1', 'note1', 2)
+        self.mapping.add_mapping('token1', 'note2', 1)
+        self.assertEqual(self.mapping.get_mapping('token1'), {'token': 'token1', 'note': 'note2', 'volatility': 1})
+        self.assertEqual(self.mapping.get_tokens_for_note('note1'), [])
+        self.assertEqual(self.mapping.get_tokens_for_note('note2'), ['token1'])
+        self.assertEqual(self.mapping.get_tokens_with_volatility(2), [])
+        self.assertEqual(self.mapping.get_tokens_with_volatility(1), ['token1'])
+
+    def test_reverse_indexes(self):
+        # Test the note-to-tokens index and the volatility buckets
+        self.mapping.add_mapping('token1', 'note1', 0)
+        self.mapping.add_mapping('token2', 'note1', 1)
+        self.mapping.add_mapping('token3', 'note2', 1)
+        self.assertEqual(self.mapping.get_tokens_for_note('note1'), ['token1', 'token2'])
+        self.assertEqual(self.mapping.get_tokens_for_note('non_existing_note'), [])
+        self.assertEqual(self.mapping.get_tokens_with_volatility(1), ['token2', 'token3'])
+        self.assertIn('token3', self.mapping)
+        self.assertEqual(len(self.mapping), 3)
+
+    def test_load_list_based_pickle(self):
+        # Test that the state of the older list-of-dicts Mapping still loads
+        legacy_state = {'mappings': [{'token': 'token1', 'note': 'note1', 'volatility': 1},
+                                     {'token': 'token2', 'note': 'note2', 'volatility': 0}],
+                        'pickle_file': self.test_pickle_file}
+        loaded = Mapping.__new__(Mapping)
+        loaded.__setstate__(legacy_state)
+        self.assertEqual(loaded.get_mappings(), legacy_state['mappings'])
+        self.assertEqual(loaded.get_note_for_token('token2'), 'note2')
+        self.assertEqual(loaded.pickle_file, self.test_pickle_file)
+
+    def test_load_shipped_pickle(self):
+        # Test that the shipped mapping pickle loads into the indexed store
+        with open('token_note_mapping.pkl', 'rb') as f:
+            shipped = pickle.load(f)
+        self.assertGreater(len(shipped), 0)
+        token = shipped.get_tokens()[0]
+        self.assertIn(token, shipped.get_tokens_for_note(shipped.get_note_for_token(token)))
+
 if __name__ == '__main__':
     unittest.main()
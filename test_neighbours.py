@@ -0,0 +1,53 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from neighbours import ExactSearch, IVFSearch
+from similarity import normalise_rows
+
+class TestNeighbours(unittest.TestCase):
+    def setUp(self):
+        # Build clustered unit vectors and noisy queries drawn from them
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((20, 16))
+        self.matrix = normalise_rows((centers[rng.integers(0, 20, 2000)] + 0.3 * rng.standard_normal((2000, 16))).astype(np.float32))
+        self.queries = normalise_rows((self.matrix[:200] + 0.05 * rng.standard_normal((200, 16))).astype(np.float32))
+        self.exact_best, self.exact_scores = ExactSearch(self.matrix).search(self.queries)
+
+    def test_probing_every_cluster_is_exact(self):
+        # Test that scanning all clusters gives the brute-force answer
+        ivf = IVFSearch.build(self.matrix, n_lists=16, n_probe=16)
+        best, scores = ivf.search(self.queries)
+        np.testing.assert_array_equal(best, self.exact_best)
+        np.testing.assert_allclose(scores, self.exact_scores, rtol=1e-5)
+
+    def test_recall(self):
+        # Test that a few probes already find most exact neighbours
+        ivf = IVFSearch.build(self.matrix, n_lists=40, n_probe=4)
+        best, _ = ivf.search(self.queries)
+        self.assertGreater(np.mean(best == self.exact_best), 0.9)
+
+    def test_save_and_load(self):
+        # Test that a saved index is reused for the same tokens only
+        tokens = ['token%d' % i for i in range(len(self.matrix))]
+        ivf = IVFSearch.build(self.matrix, n_lists=16, n_probe=4)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.npz')
+            ivf.save(path, tokens)
+            loaded = IVFSearch.load(path, self.matrix, tokens, n_probe=4)
+            np.testing.assert_array_equal(loaded.search(self.queries)[0], ivf.search(self.queries)[0])
+            self.assertIsNone(IVFSearch.load(path, self.matrix, tokens[:-1] + ['other'], n_probe=4))
+
+    def test_load_checks_model(self):
+        # Test that a saved index is not reused for another vector size or another model
+        tokens = ['token%d' % i for i in range(len(self.matrix))]
+        ivf = IVFSearch.build(self.matrix, n_lists=16, n_probe=4)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.npz')
+            ivf.save(path, tokens, 'model-a')
+            self.assertIsNotNone(IVFSearch.load(path, self.matrix, tokens, 4, 'model-a'))
+            self.assertIsNone(IVFSearch.load(path, self.matrix, tokens, 4, 'model-b'))
+            self.assertIsNone(IVFSearch.load(path, np.hstack([self.matrix, self.matrix[:, :1]]), tokens, 4, 'model-a'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
-from ner import Ner
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from ner import Ner, NerPool
 
 class TestNer(unittest.TestCase):
     def setUp(self):
@@ -18,5 +20,43 @@ class TestNer(unittest.TestCase):
 
         # Add more test cases for edge cases, handling of different parts of speech, etc.
 
+    def test_extract_keywords_batch(self):
+        # Test that batch extraction matches per-description extraction, in input order
+        descriptions = ["This is a test description about fragrance notes and scents.",
+                        "This scent reminds me of beautiful roses I bought in a market in July 2024.",
+                        "Warm vanilla, sweet vanilla and smoky wood by the fire."]
+        expected = [self.ner.extract_keywords(description) for description in descriptions]
+        self.assertEqual(self.ner.extract_keywords_batch(descriptions, batch_size=2), expected)
+        self.assertEqual(self.ner.extract_keywords_batch(descriptions, batch_size=2, n_process=2), expected)
+
+    def test_batch_matches_single_on_training_set(self):
+        # Test that batch extraction gives every training description the keywords extract_keywords gives it
+        descriptions = [str(description) for description in
+                        pd.read_csv("training_set.csv", encoding="latin-1", on_bad_lines="skip")["Description"]]
+        expected = [self.ner.extract_keywords(description) for description in descriptions]
+        self.assertEqual(self.ner.extract_keywords_batch(descriptions), expected)
+        self.assertEqual(self.ner.extract_keywords_batch(descriptions[:200], n_process=2), expected[:200])
+
+    def test_lean_pipeline_keeps_keywords(self):
+        # Test that leaving out the lemmatizer does not change the keywords of any training description
+        self.assertIn("parser", self.ner.nlp.pipe_names)
+        self.assertNotIn("lemmatizer", self.ner.nlp.pipe_names)
+        full = Ner(lean=False)
+        descriptions = [str(description) for description in
+                        pd.read_csv("training_set.csv", encoding="latin-1", on_bad_lines="skip")["Description"]]
+        expected = [full.extract_keywords(description) for description in descriptions]
+        self.assertEqual([self.ner.extract_keywords(description) for description in descriptions], expected)
+        self.assertEqual(self.ner.extract_keywords_batch(descriptions), expected)
+
+    def test_pool_from_thread(self):
+        # Test that a NerPool called from another thread, as the training pipeline does, matches extract_keywords
+        descriptions = [str(description) for description in
+                        pd.read_csv("training_set.csv", encoding="latin-1", on_bad_lines="skip")["Description"]][:200]
+        expected = [self.ner.extract_keywords(description) for description in descriptions]
+        with NerPool(processes=2) as pool:
+            with ThreadPoolExecutor(1) as executor:
+                keywords = executor.submit(pool.extract_keywords_batch, descriptions, 16).result()
+        self.assertEqual(keywords, expected)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from phrases import PhraseIndex, phrase_tokens
+
+class TestPhraseIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = PhraseIndex(['Rose', 'Damask Rose', 'Primrose', 'Bitter Orange', 'Orange', 'Ylang-Ylang',
+                                  'FRUITS, VEGETABLES AND NUTS', 'ylang ylang'])
+
+    def test_tokens(self):
+        # Test that punctuation separates tokens and case is ignored
+        self.assertEqual(phrase_tokens('FRUITS, VEGETABLES AND NUTS'), ['fruits', 'vegetables', 'and', 'nuts'])
+        self.assertEqual(phrase_tokens('Ylang-Ylang'), ['ylang', 'ylang'])
+
+    def test_containing(self):
+        # Test that keywords only match names containing them as whole words
+        names = lambda text: [self.index.names[name_id] for name_id in self.index.containing(text)]
+        self.assertEqual(names('rose'), ['Rose', 'Damask Rose'])
+        self.assertEqual(names('nuts'), ['FRUITS, VEGETABLES AND NUTS'])
+        self.assertEqual(names('bitter orange'), ['Bitter Orange'])
+        self.assertEqual(names('orange bitter'), [])
+        self.assertEqual(names('us'), [])
+        # Singular keywords match plural words
+        self.assertEqual(names('fruit'), ['FRUITS, VEGETABLES AND NUTS'])
+
+    def test_same_tokens_share_an_entry(self):
+        # Test that names with the same tokens are one entry, kept under the first name
+        self.assertEqual(len(self.index), 7)
+        self.assertEqual(self.index.names[self.index.lookup('ylang ylang')], 'Ylang-Ylang')
+
+    def test_find(self):
+        # Test that the longest name wins at each position and matches do not overlap
+        tokens = phrase_tokens('A bitter orange, a rose and primrose ylang-ylang.')
+        self.assertEqual([(tokens[start:end], self.index.names[name_id]) for start, end, name_id in self.index.find(tokens)],
+                         [(['bitter', 'orange'], 'Bitter Orange'), (['rose'], 'Rose'), (['primrose'], 'Primrose'),
+                          (['ylang', 'ylang'], 'Ylang-Ylang')])
+
+if __name__ == '__main__':
+    unittest.main()
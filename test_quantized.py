@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+from quantized import QuantizedMatrix, quantize, similarities
+from similarity import normalise_rows
+
+class TestQuantizedMatrix(unittest.TestCase):
+    def setUp(self):
+        # Build random unit vectors and queries, with a block size that splits the rows unevenly
+        rng = np.random.default_rng(0)
+        self.matrix = normalise_rows(rng.standard_normal((500, 32)).astype(np.float32))
+        self.queries = normalise_rows(rng.standard_normal((20, 32)).astype(np.float32))
+        self.expected = self.queries @ self.matrix.T
+
+    def test_scores_close_to_float32(self):
+        # Test that scores of both precisions stay close to the float32 scores, with and without blocks
+        for precision, tolerance in (('float16', 1e-3), ('int8', 2e-2)):
+            quantized = QuantizedMatrix.quantize(self.matrix, precision)
+            self.assertEqual(quantized.precision, precision)
+            np.testing.assert_allclose(quantized.scores(self.queries), self.expected, atol=tolerance)
+            quantized.block_size = 64
+            np.testing.assert_allclose(quantized.scores(self.queries), self.expected, atol=tolerance)
+            np.testing.assert_allclose(quantized.scores(self.queries[3]), self.expected[3], atol=tolerance)
+
+    def test_size(self):
+        # Test that float16 halves the matrix and int8 quarters it, plus one scale per row
+        self.assertEqual(QuantizedMatrix.quantize(self.matrix, 'float16').nbytes, self.matrix.nbytes // 2)
+        self.assertEqual(QuantizedMatrix.quantize(self.matrix, 'int8').nbytes, self.matrix.nbytes // 4 + 500 * 4)
+
+    def test_int8_rounding(self):
+        # Test that every int8 value is within half a scale step of the original and zero rows stay zeros
+        matrix = np.vstack([self.matrix, np.zeros((1, 32), dtype=np.float32)])
+        quantized = QuantizedMatrix.quantize(matrix, 'int8')
+        self.assertTrue(np.all(np.abs(quantized.dequantize() - matrix) <= quantized.scales[:, None] / 2 + 1e-7))
+        self.assertFalse(quantized.dequantize()[-1].any())
+
+    def test_rows(self):
+        # Test that selecting rows keeps their values and scales
+        quantized = QuantizedMatrix.quantize(self.matrix, 'int8')
+        np.testing.assert_array_equal(quantized[[4, 2]].dequantize(), quantized.dequantize()[[4, 2]])
+
+    def test_float32_unchanged(self):
+        # Test that float32 keeps the matrix and its exact products
+        self.assertIs(quantize(self.matrix), self.matrix)
+        np.testing.assert_array_equal(similarities(self.queries, self.matrix), self.expected)
+        np.testing.assert_array_equal(similarities(self.queries[0], self.matrix), self.matrix @ self.queries[0])
+
+    def test_unknown_precision(self):
+        # Test that an unknown precision is rejected
+        with self.assertRaises(ValueError):
+            quantize(self.matrix, 'int4')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import os
+import numpy as np
+import pandas as pd
+from gensim.models import KeyedVectors
+import instrumentation
+from mapping import Mapping
+from recommender import Recommender
+
+class SplitNer():
+    "Keyword extractor stand-in that splits the input on whitespace"
+    def extract_keywords(self, description):
+        return description.split()
+
+    def extract_keywords_batch(self, descriptions, batch_size=64, n_process=1):
+        return [description.split() for description in descriptions]
+
+def small_recommender(pickle_file, **kwargs):
+    "Build a recommender on a small mapping and an embedding model where \"timber\" is close to \"wood\""
+    mapping = Mapping(pickle_file)
+    mapping.add_mapping('vanilla', 'vanilla', 0)
+    mapping.add_mapping('wood', 'cedar', 1)
+    mapping.add_mapping('sweet', 'SWEETS AND GOURMAND SMELLS', 1)
+    mapping.add_mapping('cold', 'CITRUS SMELLS', 2)
+    mapping.save_to_pickle()
+    model = KeyedVectors(4)
+    model.add_vectors(['vanilla', 'wood', 'sweet', 'cold', 'timber'],
+                      np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1], [0.1, 0.9, 0, 0]], dtype=np.float32))
+    return Recommender(model, mapping_file=pickle_file, ner=SplitNer(), **kwargs)
+
+class TestRecommender(unittest.TestCase):
+    def setUp(self):
+        self.test_pickle_file = 'test_recommender_mappings.pkl'
+        self.recommender = small_recommender(self.test_pickle_file)
+        note_categories = pd.read_csv('note_categories.csv', encoding='latin-1', sep=';')
+        self.sweets = set(note_categories.loc[note_categories['Category'] == 'SWEETS AND GOURMAND SMELLS', 'Note Name'])
+        self.citrus = set(note_categories.loc[note_categories['Category'] == 'CITRUS SMELLS', 'Note Name'])
+
+    def tearDown(self):
+        if os.path.exists(self.test_pickle_file):
+            os.remove(self.test_pickle_file)
+
+    def test_resolve_keywords(self):
+        # Test direct hits, similarity fallbacks and unknown keywords
+        resolved = self.recommender.resolve_keywords(['vanilla', 'timber', 'xyzabc'])
+        self.assertEqual(resolved, [('vanilla', 0), ('cedar', 1), (None, None)])
+
+    def test_predict(self):
+        # Test that notes land in the base, middle and top lists by volatility
+        prediction = self.recommender.predict('vanilla timber sweet cold', 3)
+        self.assertEqual(prediction['base_notes'], ['vanilla'])
+        self.assertEqual(prediction['middle_notes'][0], 'cedar')
+        self.assertTrue(set(prediction['middle_notes'][1:]) <= self.sweets)
+        self.assertTrue(set(prediction['top_notes']) <= self.citrus)
+        self.assertEqual(len(prediction['top_notes']), 3)
+
+    def test_seeded_predictions_repeat(self):
+        # Test that the same seed picks the same random notes and different seeds may not
+        first = self.recommender.predict('sweet cold', 3, seed=7)
+        self.assertEqual(self.recommender.predict('sweet cold', 3, seed=7), first)
+        choices = {tuple(self.recommender.predict('sweet cold', 3, seed=seed)['top_notes']) for seed in range(10)}
+        self.assertGreater(len(choices), 1)
+
+    def test_instrumented_predict(self):
+        # Test that an instrumented prediction reports its stages and keyword counters
+        instrumentation.enable()
+        try:
+            self.recommender.predict('vanilla timber xyzabc vanilla', 3)
+            report = instrumentation.last_report()
+        finally:
+            instrumentation.disable()
+        self.assertEqual(set(report['stages']), {'extract_keywords', 'match_phrases', 'resolve_keywords', 'sample_notes'})
+        self.assertEqual(report['counters'], {'keywords': 4, 'keyword_cache_hits': 0, 'direct_hits': 1,
+                                              'similarity_fallbacks': 2, 'oov_keywords': 1})
+
+    def test_phrases(self):
+        # Test that multi-word note names in the input replace the keywords of their words and resolve directly
+        self.assertEqual(self.recommender.match_phrases('bitter orange with cold wood', ['bitter', 'orange', 'cold', 'wood']),
+                         ['Bitter Orange', 'cold', 'wood'])
+        # "orange" also occurs outside the note name, so it stays a keyword
+        self.assertEqual(self.recommender.match_phrases('orange and bitter orange', ['orange', 'bitter']),
+                         ['orange', 'Bitter Orange'])
+        prediction = self.recommender.predict('bitter orange vanilla', 3)
+        self.assertEqual(prediction['base_notes'], ['Bitter Orange', 'vanilla'])
+
+    def test_single_word_note_names(self):
+        # Test that single-word note names resolve to their note directly unless they are mapped tokens
+        searched = []
+        nearest_batch = self.recommender.token_index.nearest_batch
+        self.recommender.token_index.nearest_batch = lambda keywords: searched.extend(keywords) or nearest_batch(keywords)
+        resolved = self.recommender.resolve_keywords(['oak', 'musk', 'vanilla', 'timber'])
+        self.assertEqual(resolved, [('Oak', 0), ('Musk', 0), ('vanilla', 0), ('cedar', 1)])
+        self.assertEqual(searched, ['timber'])
+
+    def test_keyword_cache(self):
+        # Test that repeated keywords are served from the cache
+        self.recommender.resolve_keywords(['timber', 'vanilla'])
+        self.recommender.resolve_keywords(['timber'])
+        stats = self.recommender.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_cache_invalidated_when_mapping_changes(self):
+        # Test that rewriting the mapping pickle drops cached resolutions
+        self.assertEqual(self.recommender.resolve_keywords(['timber']), [('cedar', 1)])
+        mapping = Mapping(self.test_pickle_file)
+        mapping.add_mapping('wood', 'oakmoss', 0)
+        mapping.save_to_pickle()
+        os.utime(self.test_pickle_file, ns=(0, 0))
+        self.assertEqual(self.recommender.resolve_keywords(['timber']), [('oakmoss', 0)])
+
+    def test_cache_persisted(self):
+        # Test that a saved cache is reused by a new recommender for the same mapping and model
+        cache_file = 'test_recommender_cache.pkl'
+        try:
+            recommender = Recommender(self.recommender.model, mapping_file=self.test_pickle_file, ner=SplitNer(),
+                                      cache_file=cache_file)
+            recommender.resolve_keywords(['timber'])
+            recommender.save_cache()
+            restored = Recommender(self.recommender.model, mapping_file=self.test_pickle_file, ner=SplitNer(),
+                                   cache_file=cache_file)
+            self.assertIn('timber', restored.keyword_cache)
+            # A model with the same vocabulary but other vectors does not reuse it
+            other_model = KeyedVectors(4)
+            other_model.add_vectors(self.recommender.model.index_to_key, self.recommender.model.vectors[::-1].copy())
+            other = Recommender(other_model, mapping_file=self.test_pickle_file, ner=SplitNer(), cache_file=cache_file)
+            self.assertNotIn('timber', other.keyword_cache)
+        finally:
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import asyncio
+import contextlib
+import io
+import json
+import os
+import instrumentation
+from server import RecommendationServer
+from test_recommender import small_recommender
+from workers import WorkerPool
+
+class TestRecommendationServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # Serve a recommender built on a small mapping and embedding model
+        self.test_pickle_file = 'test_server_mappings.pkl'
+        self.recommender = small_recommender(self.test_pickle_file)
+        self.server = await RecommendationServer(self.recommender, workers=2).start('127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        if os.path.exists(self.test_pickle_file):
+            os.remove(self.test_pickle_file)
+
+    async def request(self, method, path, payload=None):
+        # Send one request and return the status and decoded JSON body
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        writer.write(('%s %s HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\nConnection: close\r\n\r\n'
+                      % (method, path, len(body))).encode('latin-1') + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, content = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(content)
+
+    async def test_health(self):
+        # Test the health endpoint
+        status, body = await self.request('GET', '/health')
+        self.assertEqual(status, 200)
+        self.assertEqual(body['status'], 'ok')
+
+    async def test_recommend(self):
+        # Test that notes come back as structured lists
+        status, body = await self.request('POST', '/recommend', {'text': 'vanilla wood', 'num_random_notes': 3})
+        self.assertEqual(status, 200)
+        self.assertEqual(body, {'top_notes': [], 'middle_notes': ['cedar'], 'base_notes': ['vanilla']})
+
+    async def test_recommend_in_worker_processes(self):
+        # Test that predictions can run in pre-forked worker processes
+        self.server.close()
+        await self.server.wait_closed()
+        with WorkerPool(self.recommender, processes=2) as pool:
+            self.server = await RecommendationServer(self.recommender, pool=pool).start('127.0.0.1', 0)
+            self.port = self.server.sockets[0].getsockname()[1]
+            status, body = await self.request('POST', '/recommend', {'text': 'vanilla wood', 'num_random_notes': 3})
+            self.assertEqual((await self.request('GET', '/health'))[1]['processes'], 2)
+        self.assertEqual(status, 200)
+        self.assertEqual(body, {'top_notes': [], 'middle_notes': ['cedar'], 'base_notes': ['vanilla']})
+
+    async def test_invalid_input(self):
+        # Test that digits and symbols are rejected like in the GUI
+        status, body = await self.request('POST', '/recommend', {'text': 'July 2024!'})
+        self.assertEqual(status, 400)
+        self.assertIn('error', body)
+
+    async def test_too_many_random_notes(self):
+        # Test that more random notes than the smallest note category holds are rejected before predicting
+        status, body = await self.request('POST', '/recommend', {'text': 'vanilla wood',
+                                                                 'num_random_notes': self.recommender.max_random_notes + 1})
+        self.assertEqual(status, 400)
+        self.assertIn('num_random_notes', body['error'])
+
+    async def test_prediction_error(self):
+        # Test that a failing prediction is answered with a 500 instead of a dropped connection
+        def fail(*args):
+            raise RuntimeError("A worker process exited unexpectedly")
+        self.recommender.predict = fail
+        with contextlib.redirect_stderr(io.StringIO()):
+            status, body = await self.request('POST', '/recommend', {'text': 'vanilla wood'})
+        self.assertEqual(status, 500)
+        self.assertIn('error', body)
+
+    async def test_unknown_path(self):
+        # Test unknown paths and wrong methods
+        self.assertEqual((await self.request('GET', '/nowhere'))[0], 404)
+        self.assertEqual((await self.request('GET', '/recommend'))[0], 405)
+
+    async def test_metrics(self):
+        # Test that metrics are only served while instrumentation is on and count the predictions
+        self.assertEqual((await self.request('GET', '/metrics'))[0], 404)
+        instrumentation.enable()
+        try:
+            await self.request('POST', '/recommend', {'text': 'vanilla wood'})
+            status, body = await self.request('GET', '/metrics')
+        finally:
+            instrumentation.disable()
+        self.assertEqual(status, 200)
+        self.assertEqual(body['summary']['histograms']['predict']['count'], 1)
+        self.assertEqual(body['last_report']['counters']['direct_hits'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from gensim.models import KeyedVectors
+from sklearn.metrics.pairwise import cosine_similarity
+from similarity import TokenIndex
+
+class TestTokenIndex(unittest.TestCase):
+    def setUp(self):
+        # Build a small deterministic embedding model
+        rng = np.random.default_rng(0)
+        self.words = ['word%d' % i for i in range(200)]
+        self.model = KeyedVectors(16)
+        self.model.add_vectors(self.words, rng.standard_normal((200, 16)).astype(np.float32))
+        self.tokens = self.words[:150] + ['missing_token']
+        self.index = TokenIndex(self.tokens, self.model)
+
+    def nearest_by_loop(self, keyword):
+        # Reference implementation of the per-token similarity loop
+        max_similarity = 0
+        best_token = None
+        for token in self.tokens:
+            if keyword in self.model.key_to_index and token in self.model.key_to_index:
+                similarity = cosine_similarity([self.model[keyword]], [self.model[token]])[0][0]
+                if similarity > max_similarity:
+                    max_similarity = similarity
+                    best_token = token
+        return best_token
+
+    def test_nearest_matches_loop(self):
+        # Test that the matrix search agrees with the loop for every keyword
+        keywords = self.words[150:]
+        self.assertEqual(self.index.nearest_batch(keywords), [self.nearest_by_loop(k) for k in keywords])
+
+    def test_quantized_matrix(self):
+        # Test that float16 and int8 token matrices are smaller and find almost every float32 neighbour
+        keywords = self.words[150:]
+        expected = self.index.nearest_batch(keywords)
+        for precision, size in (('float16', 2), ('int8', 4)):
+            for search in ('exact', 'ivf'):
+                index = TokenIndex(self.tokens, self.model, search=search, n_probe=64, precision=precision)
+                self.assertLessEqual(index.matrix.nbytes, self.index.matrix.nbytes / size + 4 * 150)
+                agreement = np.mean([a == b for a, b in zip(index.nearest_batch(keywords), expected)])
+                self.assertGreaterEqual(agreement, 0.95)
+
+    def test_index_file_of_other_model_rebuilt(self):
+        # Test that an 'ivf' index saved for a 3-d model is rebuilt instead of searched with a 4-d model
+        tokens = ['amber', 'rose', 'cedar']
+        small_model = KeyedVectors(3)
+        small_model.add_vectors(tokens, np.eye(3, dtype=np.float32))
+        large_model = KeyedVectors(4)
+        large_model.add_vectors(tokens + ['resin'], np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0.9, 0.1, 0, 0.1]],
+                                                             dtype=np.float32))
+        with tempfile.TemporaryDirectory() as directory:
+            index_file = os.path.join(directory, 'mapping.ivf.npz')
+            TokenIndex(tokens, small_model, search='ivf').save_index(index_file)
+            index = TokenIndex(tokens, large_model, search='ivf', index_file=index_file)
+            self.assertEqual(index.backend.centroids.shape[1], 4)
+            self.assertEqual(index.nearest('resin'), 'amber')
+
+    def test_missing_tokens_skipped(self):
+        # Test that tokens outside the vocabulary are never indexed
+        self.assertNotIn('missing_token', self.index.tokens)
+        self.assertEqual(len(self.index.tokens), 150)
+
+    def test_unknown_keyword(self):
+        # Test that a keyword outside the vocabulary resolves to None
+        self.assertIsNone(self.index.nearest('xyzabc'))
+
+    def test_tie_goes_to_first_token(self):
+        # Test that the first of several equally similar tokens wins
+        self.model.add_vectors(['dup1', 'dup2', 'query'], np.ones((3, 16), dtype=np.float32))
+        index = TokenIndex(['dup1', 'dup2'], self.model)
+        self.assertEqual(index.nearest('query'), 'dup1')
+
+    def test_non_positive_scores_ignored(self):
+        # Test that a token with negative similarity is never chosen
+        self.model.add_vectors(['up', 'down'], np.array([np.ones(16), -np.ones(16)], dtype=np.float32))
+        index = TokenIndex(['down'], self.model)
+        self.assertIsNone(index.nearest('up'))
+
+if __name__ == '__main__':
+    unittest.main()
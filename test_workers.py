@@ -0,0 +1,53 @@
+import unittest
+import os
+import numpy as np
+from test_recommender import small_recommender
+from workers import WorkerPool, memory_usage, share_array
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.test_pickle_file = 'test_workers_mappings.pkl'
+        self.recommender = small_recommender(self.test_pickle_file)
+
+    def tearDown(self):
+        if os.path.exists(self.test_pickle_file):
+            os.remove(self.test_pickle_file)
+
+    def test_share_array(self):
+        # Test that a shared copy holds the same values
+        block, shared = share_array(np.arange(6, dtype=np.float32).reshape(2, 3))
+        np.testing.assert_array_equal(shared, np.arange(6).reshape(2, 3))
+        block.unlink()
+
+    def test_predictions_match(self):
+        # Test that workers predict what the recommender predicts in this process from arrays in shared memory
+        expected = [self.recommender.predict('vanilla timber cold', 2, seed=seed) for seed in range(6)]
+        with WorkerPool(self.recommender, processes=2) as pool:
+            self.assertEqual(len(pool.blocks), 2)
+            futures = [pool.submit('vanilla timber cold', 2, seed) for seed in range(6)]
+            self.assertEqual([future.result(timeout=30) for future in futures], expected)
+            self.assertGreater(memory_usage(pool.pids()[0])['pss'], 0)
+        # A later pool reuses the shared arrays
+        with WorkerPool(self.recommender, processes=1) as pool:
+            self.assertEqual(pool.blocks, [])
+            self.assertEqual(pool.predict('vanilla timber cold', 2, 0), expected[0])
+
+    def test_quantized_token_matrix(self):
+        # Test that the values and scales of an int8 token matrix are shared and workers predict from them
+        recommender = small_recommender(self.test_pickle_file, precision='int8')
+        expected = recommender.predict('vanilla timber cold', 2, seed=0)
+        with WorkerPool(recommender, processes=1) as pool:
+            # The embedding vectors, the int8 values and their scales
+            self.assertEqual(len(pool.blocks), 3)
+            self.assertEqual(pool.predict('vanilla timber cold', 2, 0), expected)
+
+    def test_errors_are_raised(self):
+        # Test that an exception in a worker is raised to the caller
+        with WorkerPool(self.recommender, processes=1) as pool:
+            with self.assertRaises(ValueError):
+                pool.predict('cold', 1000)
+        with self.assertRaises(RuntimeError):
+            pool.submit('cold', 1)
+
+if __name__ == '__main__':
+    unittest.main()
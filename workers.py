@@ -0,0 +1,259 @@
+"""
+Pre-forked worker processes that serve predictions from one loaded recommender.
+
+    python main.py --serve --processes 4
+
+The parent loads the embeddings, mapping, note categories and spaCy pipeline once. It
+then moves the large NumPy arrays into multiprocessing.shared_memory blocks and forks
+the workers. These arrays are the embedding vectors, unless they are already
+memory-mapped from a file, and the token index matrix, or its values and scales when
+it is quantized.
+
+Workers inherit the recommender and read the shared arrays in place. An extra worker
+therefore costs its interpreter and the Python objects it writes to, not another copy of
+the vectors. gc.freeze() runs before forking, so the garbage collector does not touch the
+inherited objects, which would copy their pages into every worker.
+
+Requests go onto one job queue that idle workers take from. Results come back on a
+result queue and resolve the caller's Future.
+
+Each worker keeps its own keyword cache and instrumentation. A worker that reloads a
+changed mapping holds its own copy of the new token matrix until the pool is restarted.
+Workers are forked, so this needs a platform with os.fork().
+"""
+import gc
+import itertools
+import multiprocessing
+import queue
+import signal
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+import numpy as np
+from quantized import QuantizedMatrix
+
+# The recommender inherited by forked workers
+worker_recommender = None
+# (block, array) pairs of the arrays shared so far; the blocks stay open for the life of the process
+# because the arrays point into them
+shared_arrays = []
+
+def share_array(array):
+    """
+        Copy an array into a new shared memory block.
+
+        Args:
+            array (numpy.ndarray): The array to share.
+
+        Returns:
+            tuple: The SharedMemory block and an array of the same shape and dtype backed by it.
+    """
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    shared[...] = array
+    shared_arrays.append((block, shared))
+    return block, shared
+
+def is_shared(array):
+    """
+        Returns whether an array is backed by a shared memory block or a memory-mapped file.
+    """
+    return isinstance(array, np.memmap) or any(array is shared for _, shared in shared_arrays)
+
+def share_recommender(recommender):
+    """
+        Move the recommender's embedding vectors and token index matrix into shared memory.
+        Arrays that are already shared, e.g. vectors memory-mapped from a file or arrays shared
+        for an earlier pool, stay as they are.
+
+        Args:
+            recommender (Recommender): The loaded recommender, changed in place.
+
+        Returns:
+            list: The new SharedMemory blocks, to be unlinked once the workers are done.
+    """
+    blocks = []
+    model = recommender.model
+    if not is_shared(model.vectors):
+        block, model.vectors = share_array(model.vectors)
+        blocks.append(block)
+    token_index = recommender.token_index
+    if isinstance(token_index.matrix, QuantizedMatrix):
+        # The search backend holds the same object, so its arrays are replaced in place
+        quantized = token_index.matrix
+        for name in ('values', 'scales'):
+            array = getattr(quantized, name)
+            if array is not None and not is_shared(array):
+                block, shared = share_array(array)
+                blocks.append(block)
+                setattr(quantized, name, shared)
+    elif not is_shared(token_index.matrix):
+        block, matrix = share_array(token_index.matrix)
+        blocks.append(block)
+        # The search backend holds the same matrix
+        if token_index.backend.matrix is token_index.matrix:
+            token_index.backend.matrix = matrix
+        token_index.matrix = matrix
+    return blocks
+
+def memory_usage(pid):
+    """
+        Returns the resident memory of a process split into what it shares and what only it holds.
+        Proportional set size (PSS) divides every shared page between the processes mapping it,
+        so the PSS of all processes adds up to their real total.
+
+        Args:
+            pid (int): The process ID.
+
+        Returns:
+            dict: 'rss', 'pss', 'shared' and 'private' in bytes.
+    """
+    fields = {}
+    with open('/proc/%d/smaps_rollup' % pid) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'shared': fields['Shared_Clean'] + fields['Shared_Dirty'],
+            'private': fields['Private_Clean'] + fields['Private_Dirty']}
+
+def worker_loop(jobs, results):
+    """
+        Predict notes for jobs until a None job arrives.
+
+        Args:
+            jobs (multiprocessing.Queue): (job ID, user input, number of random notes, seed) tuples.
+            results (multiprocessing.Queue): Receives (job ID, prediction, exception) tuples.
+    """
+    # Ctrl+C is handled by the parent, which shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        job_id, user_input, num_random_notes, seed = job
+        try:
+            results.put((job_id, worker_recommender.predict(user_input, num_random_notes, seed), None))
+        except Exception as error:
+            results.put((job_id, None, error))
+
+class WorkerPool():
+    "Class that forks worker processes sharing one loaded recommender and hands them predictions through a job queue"
+    def __init__(self, recommender, processes=4):
+        """
+        Initialises the WorkerPool object, sharing the recommender's arrays and forking the workers.
+
+        Args:
+            recommender (Recommender): The loaded recommender; its large arrays are moved into shared memory.
+            processes (int): Number of worker processes.
+        """
+        global worker_recommender
+        context = multiprocessing.get_context('fork')
+        self.blocks = share_recommender(recommender)
+        self.jobs = context.Queue()
+        self.results = context.Queue()
+        self.futures = {}
+        self.job_ids = itertools.count()
+        self.lock = threading.Lock()
+        self.closed = False
+        worker_recommender = recommender
+        # Objects in the permanent generation are never scanned, so the workers do not copy their pages
+        gc.collect()
+        gc.freeze()
+        self.processes = [context.Process(target=worker_loop, args=(self.jobs, self.results), daemon=True)
+                          for _ in range(processes)]
+        for process in self.processes:
+            process.start()
+        # Started after forking, threads do not survive a fork
+        self.collector = threading.Thread(target=self.collect, daemon=True)
+        self.collector.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def pids(self):
+        return [process.pid for process in self.processes]
+
+    def submit(self, user_input, num_random_notes, seed=None):
+        """
+        Queues a prediction for the next idle worker.
+
+        Args:
+            user_input (str): The user's input describing a memory related to a scent.
+            num_random_notes (int): The number of random notes to be generated per note category.
+            seed (int): Seed for choosing the random notes, None for a different choice on every call.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the prediction of Recommender.predict() or raises its exception.
+        """
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("The worker pool is closed")
+            job_id = next(self.job_ids)
+            self.futures[job_id] = future
+        self.jobs.put((job_id, user_input, num_random_notes, seed))
+        return future
+
+    def predict(self, user_input, num_random_notes, seed=None):
+        """
+        Predicts notes in a worker process and waits for the result, see Recommender.predict().
+        """
+        return self.submit(user_input, num_random_notes, seed).result()
+
+    def collect(self):
+        """
+        Resolves futures from the result queue until close(), failing them all if a worker dies.
+        """
+        while True:
+            try:
+                result = self.results.get(timeout=1)
+            except queue.Empty:
+                if all(process.is_alive() for process in self.processes):
+                    continue
+                self.fail(RuntimeError("A worker process exited unexpectedly"))
+                return
+            if result is None:
+                return
+            job_id, prediction, error = result
+            with self.lock:
+                future = self.futures.pop(job_id)
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(prediction)
+
+    def fail(self, error):
+        with self.lock:
+            self.closed = True
+            futures, self.futures = self.futures, {}
+        for future in futures.values():
+            future.set_exception(error)
+
+    def close(self):
+        """
+        Lets the workers finish the queued jobs, stops them and releases the shared memory.
+        """
+        with self.lock:
+            if self.closed and not self.processes:
+                return
+            self.closed = True
+        for _ in self.processes:
+            self.jobs.put(None)
+        for process in self.processes:
+            process.join()
+        self.processes = []
+        self.results.put(None)
+        self.collector.join()
+        self.fail(RuntimeError("The worker pool is closed"))
+        gc.unfreeze()
+        # The recommender in this process may still use the blocks, so they are only unlinked;
+        # the memory is returned once the last mapping of it goes away
+        for block in self.blocks:
+            block.unlink()
+        self.blocks = []